@@ -0,0 +1,27 @@
+# backfill_result_values.py
+#
+# Parse numeric value/unit and compute abnormal/critical flags for existing Result rows.
+# Walks the table in primary-key chunks, committing each one, so it can be stopped and re-run.
+#
+#   python backfill_result_values.py [--chunk-size 1000] [--all]
+
+import argparse
+import time
+from run import app # Import your Flask app
+from services.reference_ranges import backfill_result_values
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backfill parsed values and flags on Result rows.")
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--all', action='store_true',
+                        help="Re-evaluate every row (e.g. after reference ranges change), not only unparsed ones")
+    args = parser.parse_args()
+
+    with app.app_context():
+        started = time.perf_counter()
+        total = 0
+        for updated, last_id in backfill_result_values(chunk_size=args.chunk_size, only_missing=not args.all):
+            total += updated
+            print(f"  ... {total} rows updated (last id {last_id})")
+        print(f"Backfill complete: {total} rows in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,96 @@
+# benchmarks/bench_hl7_ingest.py
+#
+# Messages/second and end-to-end latency of the HL7 result ingest pipeline,
+# both in file mode and over a local MLLP socket, against a throwaway SQLite database.
+# Usage: python benchmarks/bench_hl7_ingest.py [messages]
+
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+os.environ.setdefault('SECRET_KEY', 'bench')
+
+from run import app, db # noqa: E402
+from models.models import Patient, Admission # noqa: E402
+from services.hl7 import MLLP_END, MLLP_START, iter_file_messages # noqa: E402
+from services.result_ingest import result_pipeline # noqa: E402
+
+TESTS = [('2823-3', 'Potassium', 'mmol/L', 3.5, 5.1), ('2951-2', 'Sodium', 'mmol/L', 135, 145),
+         ('718-7', 'Hemoglobin', 'g/dL', 12, 17), ('2160-0', 'Creatinine', 'mg/dL', 0.6, 1.3)]
+
+
+def seed(patients):
+    for i in range(patients):
+        p = Patient(mrn=f"MRN{i:06d}", first_name='Test', last_name=f"P{i}", dob=date(1960, 1, 1), location_bed=f"ICU-{i}")
+        db.session.add(p)
+        db.session.flush()
+        db.session.add(Admission(patient_id=p.id, admission_date=datetime.utcnow() - timedelta(days=1)))
+    db.session.commit()
+
+
+def synthetic_message(n, patients, rng):
+    ts = (datetime(2026, 1, 1) + timedelta(minutes=n)).strftime('%Y%m%d%H%M%S')
+    segments = [
+        f"MSH|^~\\&|ANALYZER|LAB|MEDICARD|HMS|{ts}||ORU^R01|MSG{n:07d}|P|2.5",
+        f"PID|1||MRN{rng.randrange(patients):06d}^^^HOSP^MR||Test^Patient",
+        "PV1|1|I|ICU",
+        f"OBR|1||ACC{n}|80048^BMP|||{ts}"
+    ]
+    for k, (code, name, units, lo, hi) in enumerate(TESTS, start=1):
+        value = round(rng.uniform(lo * 0.8, hi * 1.2), 1)
+        flag = 'H' if value > hi else 'L' if value < lo else 'N'
+        segments.append(f"OBX|{k}|NM|{code}^{name}^LN||{value}|{units}|{lo}-{hi}|{flag}|||F|||{ts}")
+    return '\r'.join(segments)
+
+
+def bench_file_mode(texts):
+    started = time.perf_counter()
+    outcomes = result_pipeline.ingest_texts(iter_file_messages('\n'.join(texts).splitlines()))
+    elapsed = time.perf_counter() - started
+    accepted = sum(1 for o in outcomes if o["status"] == "AA")
+    print(f"File mode:  {accepted}/{len(texts)} messages in {elapsed:.2f}s -> {len(texts) / elapsed:,.0f} msg/s")
+
+
+def bench_mllp_mode(texts, port):
+    from ingest_hl7 import serve_mllp
+    threading.Thread(target=serve_mllp, args=('127.0.0.1', port), daemon=True).start()
+    time.sleep(0.3)
+    with socket.create_connection(('127.0.0.1', port)) as sock:
+        reader = sock.makefile('rb')
+        started = time.perf_counter()
+        # Pipelined sender so the writer thread sees real batches.
+        sender = threading.Thread(target=lambda: [sock.sendall(MLLP_START + t.encode() + MLLP_END) for t in texts])
+        sender.start()
+        acks = 0
+        buffer = b''
+        while acks < len(texts):
+            buffer += reader.read1(65536)
+            acks += buffer.count(MLLP_END)
+            buffer = buffer[buffer.rfind(MLLP_END) + len(MLLP_END):] if MLLP_END in buffer else buffer
+        elapsed = time.perf_counter() - started
+        sender.join()
+    print(f"MLLP mode:  {acks} ACKs in {elapsed:.2f}s -> {acks / elapsed:,.0f} msg/s")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rng = random.Random(7)
+    with app.app_context():
+        db.create_all()
+        seed(500)
+        texts = [synthetic_message(n, 500, rng) for n in range(count)]
+        bench_file_mode(texts)
+        print(f"  stats: {result_pipeline.stats.snapshot()}")
+        result_pipeline.stats.reset()
+    bench_mllp_mode(texts[:count // 4], 25750)
+    print(f"  stats: {result_pipeline.stats.snapshot()}")
+
+
+if __name__ == '__main__':
+    main()
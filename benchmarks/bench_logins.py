@@ -0,0 +1,96 @@
+# benchmarks/bench_logins.py
+#
+# Logins/second under concurrency: POST /api/auth/login from N client threads against a
+# throwaway SQLite database, with hashing in the bounded pool (services.passwords), next to
+# raw verification throughput on the request threads (the pre-pool behaviour).
+# Usage: python benchmarks/bench_logins.py [logins_per_level] [method]
+
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_db_dir = tempfile.mkdtemp(prefix='bench-logins-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ.setdefault('SECRET_KEY', 'bench')
+os.environ['READ_RECEIPT_FLUSH_SECONDS'] = '0'
+
+from werkzeug.security import check_password_hash, generate_password_hash # noqa: E402
+from run import app, db # noqa: E402
+from models.models import User # noqa: E402
+from services.passwords import password_hasher # noqa: E402
+
+CONCURRENCY = (1, 4, 16, 64)
+USERS = 64
+PASSWORD = 'correct horse battery'
+
+
+def seed(method):
+    password_hasher.method = method
+    with app.app_context():
+        db.create_all()
+        for i in range(USERS):
+            user = User(username=f"bench{i}", email=f"bench{i}@example.org", role='Nurse', is_active=True)
+            user.set_password(PASSWORD)
+            db.session.add(user)
+        db.session.commit()
+
+
+def run_level(concurrency, total, worker):
+    latencies, statuses = [], []
+    lock = threading.Lock()
+
+    def one(n):
+        started = time.perf_counter()
+        status = worker(n)
+        with lock:
+            latencies.append(time.perf_counter() - started)
+            statuses.append(status)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    ok = statuses.count(200)
+    return {"ok": ok, "busy": statuses.count(503), "rate": ok / elapsed,
+            "p50": statistics.median(latencies) * 1000, "p95": latencies[int(0.95 * (len(latencies) - 1))] * 1000}
+
+
+def endpoint_login(n):
+    client = app.test_client()
+    response = client.post('/api/auth/login', json={"email": f"bench{n % USERS}@example.org", "password": PASSWORD})
+    return response.status_code
+
+
+def main():
+    per_level = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    method = sys.argv[2] if len(sys.argv) > 2 else app.config['PASSWORD_HASH_METHOD']
+    seed(method)
+    stored = generate_password_hash(PASSWORD, method)
+    print(f"Hash method {method}; pool: {password_hasher.workers} workers, queue {password_hasher.max_queue}; "
+          f"{os.cpu_count()} CPUs; {per_level} logins per level")
+
+    print("\nVerification on request threads (no pool):")
+    for concurrency in CONCURRENCY:
+        r = run_level(concurrency, per_level, lambda n: 200 if check_password_hash(stored, PASSWORD) else 401)
+        print(f"  {concurrency:3d} threads: {r['rate']:8.1f} verifications/s   p50 {r['p50']:7.1f} ms   p95 {r['p95']:7.1f} ms")
+
+    print("\nPOST /api/auth/login (pooled hashing):")
+    for concurrency in CONCURRENCY:
+        r = run_level(concurrency, per_level, endpoint_login)
+        print(f"  {concurrency:3d} clients: {r['rate']:8.1f} logins/s   p50 {r['p50']:7.1f} ms   p95 {r['p95']:7.1f} ms"
+              f"   ok {r['ok']}  busy(503) {r['busy']}")
+
+    snapshot = password_hasher.snapshot()
+    print(f"\nHasher: verified {snapshot['verified']}, rejected {snapshot['rejected']}, timed out {snapshot['timed_out']}; "
+          f"queue wait p95 {snapshot['queue_wait_ms']['p95']} ms, hash p50 {snapshot['hash_ms']['p50']} ms")
+    password_hasher.shutdown()
+
+
+if __name__ == '__main__':
+    main()
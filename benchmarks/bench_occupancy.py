@@ -0,0 +1,73 @@
+# benchmarks/bench_occupancy.py
+#
+# Sweep-line occupancy engine vs. naive per-hour counting over a synthetic year of admissions.
+# Usage: python benchmarks/bench_occupancy.py [admissions_per_day]
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.occupancy import OccupancyTimeline # noqa: E402
+
+
+def synthetic_year(per_day, seed=42):
+    rng = random.Random(seed)
+    year_start = datetime(2025, 1, 1)
+    intervals = []
+    for day in range(365):
+        for _ in range(per_day):
+            start = year_start + timedelta(days=day, minutes=rng.randrange(24 * 60))
+            stay = timedelta(hours=rng.lognormvariate(4.0, 0.8)) # median ~2.3 days
+            end = start + stay if rng.random() > 0.02 else None # a few still admitted
+            intervals.append((start, end))
+    return year_start, intervals
+
+
+def naive_hourly(intervals, start, hours, now):
+    # Equivalent of one COUNT(*) per hour: scan every interval for every bucket.
+    out = []
+    for h in range(hours):
+        t = start + timedelta(hours=h)
+        out.append(sum(1 for s, e in intervals if s <= t < (e or now)))
+    return out
+
+
+def main():
+    per_day = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    year_start, intervals = synthetic_year(per_day)
+    now = year_start + timedelta(days=366)
+    print(f"Synthetic year: {len(intervals)} admissions ({per_day}/day)")
+
+    t0 = time.perf_counter()
+    timeline = OccupancyTimeline(intervals, now=now)
+    build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    buckets = timeline.histogram(year_start, year_start + timedelta(days=365), timedelta(hours=1))
+    year_hist = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(10000):
+        timeline.occupancy_at(year_start + timedelta(minutes=random.randrange(365 * 24 * 60)))
+    point = (time.perf_counter() - t0) / 10000
+
+    month_start = year_start + timedelta(days=300)
+    t0 = time.perf_counter()
+    naive = naive_hourly(intervals, month_start, 30 * 24, now)
+    naive_month = time.perf_counter() - t0
+
+    month = timeline.histogram(month_start, month_start + timedelta(days=30), timedelta(hours=1))
+    assert [b["occupied"] for b in month] == naive, "sweep line disagrees with naive count"
+
+    print(f"Build timeline:             {build * 1000:8.1f} ms")
+    print(f"Hourly histogram, 1 year:   {year_hist * 1000:8.1f} ms ({len(buckets)} buckets)")
+    print(f"Occupancy at instant:       {point * 1e6:8.2f} us")
+    print(f"Naive hourly, 1 month:      {naive_month * 1000:8.1f} ms ({len(naive)} buckets)")
+    print(f"Peak census over the year:  {timeline.peak(year_start, now)[0]}")
+
+
+if __name__ == '__main__':
+    main()
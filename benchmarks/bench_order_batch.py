@@ -0,0 +1,86 @@
+# benchmarks/bench_order_batch.py
+#
+# Placing a 40-item admission order set: 40 single POST /api/orders calls (one lookup, load
+# and commit each) vs. one POST /api/admissions/<id>/orders:batch, through the test client
+# against a throwaway SQLite database.
+# Usage: python benchmarks/bench_order_batch.py [rounds] [items]
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_db_dir = tempfile.mkdtemp(prefix='bench-orders-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ.setdefault('SECRET_KEY', 'bench')
+os.environ['READ_RECEIPT_FLUSH_SECONDS'] = '0'
+os.environ['DUPLICATE_ORDER_POLICY'] = 'off' # Every round places the same set
+
+from run import app, db # noqa: E402
+from models.models import Admission, Patient, User # noqa: E402
+
+PASSWORD = 'correct horse battery'
+ORDER_TYPES = ('Lab', 'Medication', 'Imaging', 'Procedure')
+
+
+def seed():
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.org', role='Doctor', is_active=True)
+        user.set_password(PASSWORD)
+        patient = Patient(mrn='MRN000001', first_name='Test', last_name='Bench', dob=date(1960, 1, 1))
+        db.session.add_all([user, patient])
+        db.session.flush()
+        admission = Admission(patient_id=patient.id, admission_date=datetime.utcnow())
+        db.session.add(admission)
+        db.session.commit()
+        return admission.id
+
+
+def order_set(items):
+    return [{"order_type": ORDER_TYPES[i % len(ORDER_TYPES)], "order_name": f"Admission order {i}",
+             "order_details": f"Item {i} of the admission set"} for i in range(items)]
+
+
+def place_singly(client, admission_id, orders):
+    for order in orders:
+        response = client.post('/api/orders', json=dict(order, admission_id=admission_id))
+        assert response.status_code == 201, response.get_json()
+
+
+def place_batch(client, admission_id, orders):
+    response = client.post(f'/api/admissions/{admission_id}/orders:batch', json={"orders": orders})
+    assert response.status_code == 201, response.get_json()
+
+
+def timed(rounds, place, client, admission_id, orders):
+    place(client, admission_id, orders) # Warm-up: first-request imports and caches
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        place(client, admission_id, orders)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {"p50": statistics.median(samples), "p95": samples[int(0.95 * (len(samples) - 1))], "max": samples[-1]}
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    items = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    admission_id = seed()
+    orders = order_set(items)
+    client = app.test_client()
+    response = client.post('/api/auth/login', json={"email": 'bench@example.org', "password": PASSWORD})
+    assert response.status_code == 200, response.get_json()
+    print(f"{items}-item order set, {rounds} rounds each (file-backed SQLite)")
+
+    for label, place in ((f"{items} x POST /orders", place_singly), ("1 x POST orders:batch", place_batch)):
+        r = timed(rounds, place, client, admission_id, orders)
+        print(f"  {label:24s} p50 {r['p50']:8.1f} ms   p95 {r['p95']:8.1f} ms   max {r['max']:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
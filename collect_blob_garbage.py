@@ -0,0 +1,24 @@
+# collect_blob_garbage.py
+#
+# Delete blob store objects (BLOB_STORE_PATH) that no Imaging row references: files written
+# for a commit that failed or rolled back, and derivatives replaced before they were stored.
+# Blobs younger than --min-age are kept, so it is safe to run (e.g. from cron) alongside the app.
+#
+#   python collect_blob_garbage.py [--min-age 3600]
+
+import argparse
+import time
+from run import app # Import your Flask app
+from services.imaging_files import collect_unreferenced_blobs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Delete unreferenced blobs from the content-addressed blob store.")
+    parser.add_argument('--min-age', type=int, default=3600, help="Only consider blobs stored at least this many seconds ago")
+    args = parser.parse_args()
+
+    with app.app_context():
+        started = time.perf_counter()
+        deleted, freed = collect_unreferenced_blobs(min_age=args.min_age)
+        print(f"Blob garbage collection complete: {deleted} blobs, {freed / 1e6:.1f} MB freed, "
+              f"in {time.perf_counter() - started:.1f}s")
@@ -10,7 +10,26 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-dev-key'
-    JWT_ACCESS_TOKEN_EXPIRES = 24 * 3600  # 24 hours
+    JWT_ACCESS_TOKEN_EXPIRES = int(os.environ.get('JWT_ACCESS_TOKEN_EXPIRES', 900))  # Access token lifetime (15 minutes); also bounds cross-process revocation delay
+    ANALYTICS_REFRESH_SECONDS = int(os.environ.get('ANALYTICS_REFRESH_SECONDS', 300))  # Admission analytics cache TTL
+    NOTIFICATION_WORKERS = int(os.environ.get('NOTIFICATION_WORKERS', 0))  # In-process critical notification delivery threads (0 = use notify_worker.py)
+    BLOB_STORE_BACKEND = os.environ.get('BLOB_STORE_BACKEND', 'local')  # Imaging file storage backend
+    BLOB_STORE_PATH = os.environ.get('BLOB_STORE_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'blobs')  # Root for the 'local' backend
+    UPLOAD_TMP_PATH = os.environ.get('UPLOAD_TMP_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'uploads')  # Chunk staging for resumable imaging uploads
+    UPLOAD_SESSION_TTL = int(os.environ.get('UPLOAD_SESSION_TTL', 24 * 3600))  # Idle seconds before an upload session is garbage collected
+    MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', 4 * 1024 ** 3))  # Largest file a chunked upload session may declare (413 above this)
+    MAX_OPEN_UPLOADS_PER_USER = int(os.environ.get('MAX_OPEN_UPLOADS_PER_USER', 8))  # Unfinished upload sessions one user may hold (429 beyond this)
+    PREVIEW_WORKERS = int(os.environ.get('PREVIEW_WORKERS', 0))  # In-process imaging preview decoder processes (0 = use preview_worker.py)
+    TEXT_SEARCH_BACKEND = os.environ.get('TEXT_SEARCH_BACKEND', 'auto')  # 'postgres' (GIN full-text), 'memory' (in-process BM25) or 'auto' (by database)
+    DUPLICATE_ORDER_POLICY = os.environ.get('DUPLICATE_ORDER_POLICY', 'warn')  # Same order for the same admission within the window: 'warn', 'block' (409) or 'off'
+    DUPLICATE_ORDER_WINDOW_MINUTES = int(os.environ.get('DUPLICATE_ORDER_WINDOW_MINUTES', 60))  # How far back a matching order counts as a duplicate
+    READ_RECEIPT_FLUSH_SECONDS = float(os.environ.get('READ_RECEIPT_FLUSH_SECONDS', 5))  # Consult read receipts are written in one batch this often (0 = write each immediately)
+    USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', 30))  # Max age of a cached login identity (bounds staleness across processes; 0 = no cache)
+    USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 4096))  # Login identities kept per process (LRU)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')  # werkzeug method with cost, e.g. 'scrypt:65536:8:1' or 'pbkdf2:sha256:1000000'; older hashes upgrade on login
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))  # Concurrent hashes per process (0 = min(4, CPUs))
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))  # Hashes allowed to wait for a worker before logins get 503
+    PASSWORD_HASH_TIMEOUT_SECONDS = float(os.environ.get('PASSWORD_HASH_TIMEOUT_SECONDS', 10))  # Max wait for a hash before 503
 
 class DevelopmentConfig(Config):
     """Development config."""
@@ -19,4 +19,18 @@ class Roles:
     IT_SUPPORT = 'ITSupport'
     HOUSEKEEPING = 'Housekeeping'
     MAINTENANCE = 'Maintenance'
-    SOCIAL_WORKER = 'SocialWorker'
\ No newline at end of file
+    SOCIAL_WORKER = 'SocialWorker'
+
+class Permissions:
+    # Finer-grained than roles; granted to roles in services.permissions.ROLE_PERMISSIONS
+    VIEW_METRICS = 'ViewMetrics' # Operational metrics/stats endpoints (no patient data)
+    REVOKE_TOKENS = 'RevokeTokens' # Revoke other users' access tokens
+    MANAGE_UPLOADS = 'ManageUploads' # Act on imaging upload sessions started by other users
+
+class OrderStatus:
+    PENDING = 'Pending'
+    PENDING_SIGNATURE = 'PendingSignature' # Awaiting the responsible attending's signature
+    SIGNED = 'Signed'
+    IN_PROGRESS = 'InProgress'
+    COMPLETED = 'Completed'
+    CANCELLED = 'Cancelled'
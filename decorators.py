@@ -2,11 +2,34 @@
 from functools import wraps
 from flask import abort
 from flask_login import current_user
+from services.permissions import permissions
+
+def _mask_required(required_mask, label):
+    """Decorator enforcing 'current_user's effective mask & required_mask' (one AND per request)."""
+    def wrapper(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # First check if user is authenticated (should be covered by @login_required too)
+            if not current_user.is_authenticated:
+                # If somehow @login_required wasn't used, block here
+                abort(401) # Unauthorized
+
+            # The effective mask (role bits + granted permission bits) is precomputed on the cached identity
+            if not permissions.mask_of(current_user) & required_mask:
+                print(f"Access Denied: User '{current_user.username}' role '{getattr(current_user, 'role', 'N/A')}' lacks {label}") # Server log
+                abort(403) # Forbidden - User is logged in, but doesn't have permission
+
+            # If user is authenticated and has the required role, proceed
+            return f(*args, **kwargs)
+        decorated_function.required_mask = required_mask # For services.permissions route_report
+        return decorated_function
+    return wrapper
 
 def roles_required(*roles):
     """
     Decorator factory that ensures the current user is logged in via Flask-Login
-    and has AT LEAST ONE of the specified roles.
+    and has AT LEAST ONE of the specified roles. Roles are compiled to a bitmask
+    here, once; users with several roles ('Doctor,Radiologist') pass if any matches.
 
     Example Usage:
     @app.route('/admin-only')
@@ -21,22 +44,11 @@ def roles_required(*roles):
     def clinical_view():
         return 'Clinical access granted.'
     """
-    def wrapper(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            # First check if user is authenticated (should be covered by @login_required too)
-            if not current_user.is_authenticated:
-                # If somehow @login_required wasn't used, block here
-                abort(401) # Unauthorized
+    return _mask_required(permissions.mask(roles), f"required roles {roles}")
 
-            # Check if user object has a 'role' attribute and if it's in the allowed list
-            # It's crucial your User model (models/models.py) has the 'role' column/attribute
-            if not hasattr(current_user, 'role') or current_user.role not in roles:
-                # If user doesn't have the role or role is not allowed, return Forbidden
-                print(f"Access Denied: User '{current_user.username}' role '{getattr(current_user, 'role', 'N/A')}' not in required roles {roles}") # Server log
-                abort(403) # Forbidden - User is logged in, but doesn't have permission
-
-            # If user is authenticated and has the required role, proceed
-            return f(*args, **kwargs)
-        return decorated_function
-    return wrapper
\ No newline at end of file
+def permission_required(*names):
+    """
+    Like roles_required, for constants.Permissions: passes if any of the user's roles
+    grants AT LEAST ONE of the permissions (see services.permissions.ROLE_PERMISSIONS).
+    """
+    return _mask_required(permissions.mask(names), f"required permissions {names}")
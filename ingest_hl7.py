@@ -0,0 +1,76 @@
+# ingest_hl7.py
+#
+# Feed HL7 v2 ORU^R01 lab results into the Result table.
+#
+#   python ingest_hl7.py results1.hl7 results2.hl7   # ingest files
+#   python ingest_hl7.py --listen 2575               # local MLLP listener (stand-in for an interface engine)
+#
+# Prints messages/second and end-to-end latency (parse -> commit) when done.
+
+import argparse
+import json
+import socketserver
+import time
+from run import app # Import your Flask app
+from services.hl7 import HL7ParseError, build_ack, iter_file_messages, iter_mllp_frames, parse_message
+from services.result_ingest import IngestWorker, result_pipeline
+
+
+def ingest_files(paths):
+    with app.app_context():
+        for path in paths:
+            started = time.perf_counter()
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                outcomes = result_pipeline.ingest_texts(iter_file_messages(f))
+            accepted = sum(1 for o in outcomes if o["status"] == "AA")
+            elapsed = time.perf_counter() - started
+            print(f"{path}: {accepted} accepted, {len(outcomes) - accepted} rejected "
+                  f"in {elapsed:.2f}s ({len(outcomes) / elapsed if elapsed else 0:.0f} msg/s)")
+
+
+def serve_mllp(host, port):
+    worker = IngestWorker(app, result_pipeline).start()
+
+    class MLLPHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for frame in iter_mllp_frames(self.rfile):
+                try:
+                    message = parse_message(frame.decode('utf-8', errors='replace'))
+                except HL7ParseError as e:
+                    self.wfile.write(build_ack('', 'AR', str(e)))
+                    continue
+                try:
+                    outcome = worker.submit(message).result(timeout=30)
+                    self.wfile.write(build_ack(message.control_id, outcome["status"], outcome.get("error", "")))
+                except Exception as e:
+                    self.wfile.write(build_ack(message.control_id, 'AE', str(e)))
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    with socketserver.ThreadingTCPServer((host, port), MLLPHandler) as server:
+        server.daemon_threads = True
+        print(f"MLLP listener on {host}:{port} (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            worker.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ingest HL7 v2 ORU lab results.")
+    parser.add_argument('files', nargs='*', help="HL7 files to ingest")
+    parser.add_argument('--listen', type=int, metavar='PORT', help="Run a local MLLP listener on PORT")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--batch-size', type=int, default=result_pipeline.batch_size)
+    args = parser.parse_args()
+
+    result_pipeline.batch_size = args.batch_size
+    if args.listen:
+        serve_mllp(args.host, args.listen)
+    elif args.files:
+        ingest_files(args.files)
+    else:
+        parser.error("Give HL7 files to ingest or --listen PORT")
+
+    print(json.dumps(result_pipeline.stats.snapshot(), indent=2))
@@ -0,0 +1,28 @@
+# migrate_imaging_blobs.py
+#
+# Move image bytes from the Imaging.image_file column into the blob store (BLOB_STORE_PATH).
+# Walks the table in primary-key chunks, committing each one, so it can be stopped and re-run.
+#
+#   python migrate_imaging_blobs.py [--chunk-size 50]
+
+import argparse
+import time
+from run import app # Import your Flask app
+from services.imaging_files import migrate_image_files
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Move Imaging.image_file blobs into the content-addressed blob store.")
+    parser.add_argument('--chunk-size', type=int, default=50, help="Rows per commit (one image is in memory at a time)")
+    args = parser.parse_args()
+
+    with app.app_context():
+        started = time.perf_counter()
+        rows = total_bytes = duplicates = 0
+        for moved, moved_bytes, deduplicated, last_id in migrate_image_files(chunk_size=args.chunk_size):
+            rows += moved
+            total_bytes += moved_bytes
+            duplicates += deduplicated
+            print(f"  ... {rows} images moved, {total_bytes / 1e6:.1f} MB (last id {last_id})")
+        print(f"Migration complete: {rows} images, {total_bytes / 1e6:.1f} MB, "
+              f"{duplicates} deduplicated, in {time.perf_counter() - started:.1f}s")
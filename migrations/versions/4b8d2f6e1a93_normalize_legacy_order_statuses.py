@@ -0,0 +1,54 @@
+"""Normalize legacy order statuses
+
+Revision ID: 4b8d2f6e1a93
+Revises: 1e7b9c4f6a20
+Create Date: 2026-10-20 11:02:17.415820
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b8d2f6e1a93'
+down_revision = '1e7b9c4f6a20'
+branch_labels = None
+depends_on = None
+
+# Free-text statuses written before the order state machine, by normalized spelling
+# (lower case, no spaces/dashes/underscores) -> constants.OrderStatus value
+LEGACY_STATUSES = {
+    'pending': 'Pending', 'new': 'Pending', 'ordered': 'Pending',
+    'pendingsignature': 'PendingSignature', 'unsigned': 'PendingSignature', 'awaitingsignature': 'PendingSignature',
+    'signed': 'Signed',
+    'inprogress': 'InProgress', 'active': 'InProgress', 'started': 'InProgress',
+    'completed': 'Completed', 'complete': 'Completed', 'done': 'Completed', 'resulted': 'Completed',
+    'cancelled': 'Cancelled', 'canceled': 'Cancelled', 'discontinued': 'Cancelled',
+}
+STATUSES = set(LEGACY_STATUSES.values())
+
+
+def _canonical(status):
+    key = ''.join(ch for ch in status.lower() if ch not in ' -_')
+    return LEGACY_STATUSES.get(key)
+
+
+def upgrade():
+    conn = op.get_bind()
+    # NULL was already logged as 'Pending' when the transition log was seeded
+    conn.execute(sa.text("UPDATE \"order\" SET status = 'Pending' WHERE status IS NULL"))
+    legacy = conn.execute(sa.text("SELECT DISTINCT status FROM \"order\"")).scalars().all()
+    for old in legacy:
+        new = _canonical(old)
+        if old in STATUSES or new is None:
+            continue # Already a state machine status, or unknown: check_transition lets it be closed
+        # Log the rename first so each order's history ends at its stored status
+        conn.execute(sa.text("INSERT INTO order_transition (order_id, from_status, to_status, at) "
+                             "SELECT id, :old, :new, CURRENT_TIMESTAMP FROM \"order\" WHERE status = :old"),
+                     {"old": old, "new": new})
+        conn.execute(sa.text("UPDATE \"order\" SET status = :new WHERE status = :old"), {"old": old, "new": new})
+
+
+def downgrade():
+    # The original spellings are kept in order_transition.from_status; statuses stay normalized
+    pass
@@ -3,9 +3,9 @@
 
 from extensions import db
 from datetime import date, datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from services.passwords import password_hasher # Bounded hashing pool (raises HasherBusy when saturated)
 from flask_login import UserMixin # Import UserMixin  
-from constants import Roles 
+from constants import OrderStatus, Roles 
 from sqlalchemy import Boolean, Integer, String, DateTime, ForeignKey, Text
 
 
@@ -22,14 +22,18 @@ class User(db.Model, UserMixin):
     is_active = db.Column(db.Boolean, default=True) # Used by Flask-Login
 
     def set_password(self, password):
-        """Hashes the password and stores it."""
-        self.password_hash = generate_password_hash(password)
+        """Hashes the password (configured PASSWORD_HASH_METHOD) and stores it."""
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
         """Checks if the provided password matches the stored hash."""
         if self.password_hash is None:
             return False
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """True if the stored hash predates the configured hash method/cost."""
+        return self.password_hash is not None and password_hasher.needs_rehash(self.password_hash)
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -66,8 +70,8 @@ class Admission(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     # *** IMPORTANT: ForeignKey updated to match Patient's tablename 'patients' ***
     patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False)
-    admission_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    discharge_date = db.Column(db.DateTime, nullable=True) # Nullable is correct
+    admission_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True) # Indexed for occupancy range scans
+    discharge_date = db.Column(db.DateTime, nullable=True, index=True) # Nullable is correct; indexed for active census lookups
 
     # Relationships (One-to-Many: One Admission -> Many Results/Imagings/Consults/Orders)
     results = db.relationship('Result', backref='admission', lazy='dynamic')
@@ -75,6 +79,10 @@ class Admission(db.Model):
     consults = db.relationship('Consult', backref='admission', lazy='dynamic')
     orders = db.relationship('Order', backref='admission', lazy='dynamic')
 
+    __table_args__ = (
+        db.Index('ix_admission_patient_active', 'patient_id', 'discharge_date'), # A patient's active admission (census misses)
+    )
+
     def __repr__(self):
         return f'<Admission id={self.id} patient_id={self.patient_id} date={self.admission_date}>'
 
@@ -88,6 +96,14 @@ class Result(db.Model):
     result_value = db.Column(db.String(100), nullable=False) # Consider Text for longer results
     result_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+    # --- Parsed value (filled from result_value at ingest / by backfill) ---
+    numeric_value = db.Column(db.Float, nullable=True) # e.g. 4.2 from '4.2 mmol/L'; NULL for non-numeric results
+    unit = db.Column(db.String(32), nullable=True) # e.g. 'mmol/L'
+    abnormal_flag = db.Column(db.String(2), nullable=True) # 'L', 'H', 'LL', 'HH' or 'N'; NULL if no reference range applied
+    is_abnormal = db.Column(Boolean, default=False, nullable=False)
+    is_delta_flagged = db.Column(Boolean, default=False, nullable=False) # Changed more than its delta-check rule allows
+    delta_prior_value = db.Column(db.Float, nullable=True) # Previous numeric value the delta check compared against
+
  # --- Fields needed for Dashboard Indicators ---
     is_critical = db.Column(Boolean, default=False, nullable=False) # Flag for critical results
     acknowledged_at = db.Column(db.DateTime, nullable=True) # Timestamp when acknowledged
@@ -96,20 +112,76 @@ class Result(db.Model):
     # Relationship for acknowledged_by (optional)
     acknowledged_by = db.relationship('User', foreign_keys=[acknowledged_by_id])
 
+    __table_args__ = (
+        db.Index('ix_result_test_name_numeric_value', 'test_name', 'numeric_value'), # Range queries per test
+        db.Index('ix_result_admission_date', 'admission_id', 'result_date', 'id'), # Flowsheet read and its watermark probe
+        # Critical indicators: only unacknowledged critical rows are indexed
+        db.Index('ix_result_unacked_critical', 'admission_id', 'result_date',
+                 postgresql_where=db.text("is_critical = true AND acknowledged_at IS NULL"),
+                 sqlite_where=db.text("is_critical = 1 AND acknowledged_at IS NULL")),
+    )
+
     def __repr__(self):
         return f'<Result id={self.id} test={self.test_name}>'
 
 
+# === Reference Range Model ===
+class ReferenceRange(db.Model):
+    __tablename__ = 'reference_range'
+    id = db.Column(db.Integer, primary_key=True)
+    test_name = db.Column(db.String(100), nullable=False) # Matched case-insensitively against Result.test_name
+    sex = db.Column(db.String(1), nullable=True) # 'M', 'F' or NULL for either
+    age_min_years = db.Column(db.Integer, nullable=False, default=0) # Inclusive
+    age_max_years = db.Column(db.Integer, nullable=True) # Exclusive; NULL for no upper bound
+    unit = db.Column(db.String(32), nullable=True) # Range only applies to results in this unit (if set)
+    low = db.Column(db.Float, nullable=True)
+    high = db.Column(db.Float, nullable=True)
+    critical_low = db.Column(db.Float, nullable=True)
+    critical_high = db.Column(db.Float, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_reference_range_lookup', 'test_name', 'sex', 'age_min_years'),
+    )
+
+    def __repr__(self):
+        return f'<ReferenceRange {self.test_name} sex={self.sex} age={self.age_min_years}-{self.age_max_years}>'
+
+
+# === Delta Check Rule Model ===
+class DeltaCheckRule(db.Model):
+    __tablename__ = 'delta_check_rule'
+    id = db.Column(db.Integer, primary_key=True)
+    test_name = db.Column(db.String(100), unique=True, nullable=False) # Matched case-insensitively against Result.test_name
+    max_abs_delta = db.Column(db.Float, nullable=True) # Flag if |new - prior| exceeds this (in the result's unit)
+    max_pct_delta = db.Column(db.Float, nullable=True) # Flag if |new - prior| / |prior| * 100 exceeds this
+    window_hours = db.Column(db.Integer, nullable=True) # Only compare against a prior result this recent; NULL for any
+
+    def __repr__(self):
+        return f'<DeltaCheckRule {self.test_name} abs={self.max_abs_delta} pct={self.max_pct_delta}>'
+
+
 # === Imaging Model ===
 class Imaging(db.Model):
     # No explicit tablename, defaults to 'imaging'
     id = db.Column(db.Integer, primary_key=True)
-    admission_id = db.Column(db.Integer, db.ForeignKey('admission.id'), nullable=False) # FK to Admission table
+    admission_id = db.Column(db.Integer, db.ForeignKey('admission.id'), nullable=False, index=True) # FK to Admission table
     image_type = db.Column(db.String(100), nullable=False) # e.g., 'X-Ray', 'CT', 'MRI'
     image_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    # Storing large files directly in DB isn't always ideal. Consider storing a path (String) instead.
-    image_file = db.Column(db.LargeBinary, nullable=True) # Making nullable if path is used later
-    image_report = db.Column(db.Text, nullable=True) # Added field for radiologist's report
+    # Pixels live in the blob store (services.blob_store), addressed by SHA-256; only metadata is kept here.
+    blob_digest = db.Column(db.String(64), nullable=True, index=True) # Hex SHA-256 of the image bytes
+    blob_size = db.Column(db.BigInteger, nullable=True) # Bytes
+    content_type = db.Column(db.String(100), nullable=True) # e.g. 'application/dicom', 'image/png'
+    # --- Derivatives (filled by services.previews) ---
+    preview_status = db.Column(db.String(16), nullable=True, index=True) # NULL (no file), 'pending', 'ready', 'failed', 'unsupported'
+    thumbnail_digest = db.Column(db.String(64), nullable=True) # Blob store digest of the small JPEG
+    preview_digest = db.Column(db.String(64), nullable=True) # Blob store digest of the larger JPEG
+    width = db.Column(db.Integer, nullable=True) # Pixels
+    height = db.Column(db.Integer, nullable=True)
+    frame_count = db.Column(db.Integer, nullable=True) # >1 for multi-frame DICOM / TIFF
+    # Legacy in-row storage; emptied by migrate_imaging_blobs.py, to be dropped once every row is migrated.
+    # Never loaded with the row: reading the attribute raises, so callers must select it explicitly.
+    image_file = db.deferred(db.Column(db.LargeBinary, nullable=True), raiseload=True)
+    image_report = db.Column(db.Text, nullable=True) # Added field for radiologist's report; searchable via services.text_search
 
 # --- Fields needed for Dashboard Indicators ---
     is_critical = db.Column(Boolean, default=False, nullable=False) # Flag for critical imaging results
@@ -119,27 +191,92 @@ class Imaging(db.Model):
     # Relationship for acknowledged_by (optional)
     acknowledged_by = db.relationship('User', foreign_keys=[acknowledged_by_id])
 
+    __table_args__ = (
+        # Critical indicators: only unacknowledged critical rows are indexed
+        db.Index('ix_imaging_unacked_critical', 'admission_id', 'image_date',
+                 postgresql_where=db.text("is_critical = true AND acknowledged_at IS NULL"),
+                 sqlite_where=db.text("is_critical = 1 AND acknowledged_at IS NULL")),
+    )
+
     def __repr__(self):
         return f'<Imaging id={self.id} type={self.image_type}>'
 
 
+# === Imaging Upload Session ===
+class ImagingUpload(db.Model):
+    __tablename__ = 'imaging_upload'
+    id = db.Column(db.String(32), primary_key=True) # Random hex token, used in upload URLs
+    admission_id = db.Column(db.Integer, db.ForeignKey('admission.id'), nullable=False)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True) # GC of abandoned sessions
+    status = db.Column(db.String(16), nullable=False, default='open') # 'open' or 'completing'
+
+    # --- Declared file ---
+    total_size = db.Column(db.BigInteger, nullable=False) # Bytes
+    chunk_size = db.Column(db.Integer, nullable=False) # Every chunk but the last is exactly this long
+    content_type = db.Column(db.String(100), nullable=True) # Sniffed on finalize if not given
+
+    # --- Imaging row created on finalize ---
+    image_type = db.Column(db.String(100), nullable=False)
+    image_date = db.Column(db.DateTime, nullable=True)
+    image_report = db.Column(db.Text, nullable=True)
+    is_critical = db.Column(Boolean, default=False, nullable=False)
+
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.total_size // self.chunk_size))
+
+    def __repr__(self):
+        return f'<ImagingUpload {self.id} admission={self.admission_id} size={self.total_size}>'
+
+
+# === Critical Notification Outbox ===
+class CriticalNotification(db.Model):
+    __tablename__ = 'critical_notification'
+    id = db.Column(db.Integer, primary_key=True)
+    source_type = db.Column(db.String(16), nullable=False) # 'result' or 'imaging'
+    source_id = db.Column(db.Integer, nullable=False) # Result.id / Imaging.id (no FK: the row outlives a deleted source)
+    admission_id = db.Column(db.Integer, db.ForeignKey('admission.id'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow) # Written in the source row's transaction
+
+    # --- Delivery state (maintained by services.notifications) ---
+    status = db.Column(db.String(16), nullable=False, default='pending') # 'pending', 'sending', 'delivered', 'coalesced', 'failed', 'undeliverable'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    recipient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True) # Attending at delivery time
+    delivered_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.String(255), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_critical_notification_due', 'status', 'next_attempt_at'), # Worker claim query
+    )
+
+    def __repr__(self):
+        return f'<CriticalNotification id={self.id} {self.source_type}={self.source_id} status={self.status}>'
+
+
 # === Consult Model ===
 class Consult(db.Model):
     # No explicit tablename, defaults to 'consult'
     id = db.Column(db.Integer, primary_key=True)
-    admission_id = db.Column(db.Integer, db.ForeignKey('admission.id'), nullable=False) # FK to Admission table
+    admission_id = db.Column(db.Integer, db.ForeignKey('admission.id'), nullable=False, index=True) # FK to Admission table
     consultant_name = db.Column(db.String(100), nullable=False) # Or link to User table? consultant_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     consult_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    consult_notes = db.Column(db.Text, nullable=False)
+    consult_notes = db.Column(db.Text, nullable=False) # Searchable via services.text_search
 
   # --- Fields needed for Dashboard Indicators ---
     # Consider replacing consultant_name with a foreign key
     assigned_physician_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True) # User assigned to read/action consult
     status = db.Column(db.String(50), default='Pending', nullable=False) # e.g., 'Pending', 'Completed', 'Cancelled'
-    read_at = db.Column(db.DateTime, nullable=True) # Timestamp when assigned physician read it
+    read_at = db.Column(db.DateTime, nullable=True) # Timestamp when assigned physician read it (written in batches by services.consults)
 
     # Relationship to assigned physician
     assigned_physician = db.relationship('User', foreign_keys=[assigned_physician_id])
+
+    __table_args__ = (
+        db.Index('ix_consult_inbox', 'assigned_physician_id', 'consult_date', 'id'), # Inbox keyset (cursor) order per physician
+    )
+
     def __repr__(self):
         return f'<Consult id={self.id} consultant={self.consultant_name}>'
 
@@ -153,17 +290,77 @@ class Order(db.Model):
     order_name = db.Column(db.String(100), nullable=False) # e.g., 'Complete Blood Count', 'Chest X-Ray', 'Aspirin 81mg'
     order_details = db.Column(db.Text, nullable=True) # e.g., dosage, frequency, reason
     order_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    status = db.Column(db.String(50), default='Pending') # e.g., 'Pending', 'Completed', 'Cancelled'
+    status = db.Column(db.String(50), default='Pending') # constants.OrderStatus; changes are checked and logged by services.order_states
 
   # --- Fields needed for Dashboard Indicators ---
     responsible_attending_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True) # User responsible for signing/actioning
+    signed_at = db.Column(db.DateTime, nullable=True) # Set when the attending signs (status PendingSignature -> Signed)
+    signed_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    # Hash of (admission, type, normalized name, key details); set by services.orders for duplicate checks
+    signature = db.Column(db.String(32), nullable=True)
 
     # Relationship to responsible attending
     responsible_attending = db.relationship('User', foreign_keys=[responsible_attending_id])
 
+    __table_args__ = (
+        # Pending-signature worklist: only unsigned rows are indexed, in keyset (cursor) order per attending
+        db.Index('ix_order_pending_signature', 'responsible_attending_id', 'order_date', 'id',
+                 postgresql_where=db.text(f"status = '{OrderStatus.PENDING_SIGNATURE}'"),
+                 sqlite_where=db.text(f"status = '{OrderStatus.PENDING_SIGNATURE}'")),
+        db.Index('ix_order_signature_date', 'signature', 'order_date'), # Duplicate check: one signature within a time window
+    )
 
     def __repr__(self):
         return f'<Order id={self.id} type={self.order_type} name={self.order_name}>'
+
+
+# === Order Status Transition Log (append-only) ===
+class OrderTransition(db.Model):
+    __tablename__ = 'order_transition'
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, nullable=False) # Order.id (no FK: the log outlives a deleted order)
+    from_status = db.Column(db.String(50), nullable=True) # NULL for the order's creation
+    to_status = db.Column(db.String(50), nullable=False)
+    at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True) # Time-in-state analytics scan by time
+    by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True) # Acting user, if known
+
+    __table_args__ = (
+        db.Index('ix_order_transition_order', 'order_id', 'at'), # One order's history in order
+    )
+
+    def __repr__(self):
+        return f'<OrderTransition order={self.order_id} {self.from_status}->{self.to_status} at={self.at}>'
+
+
+# === Order Set Templates ===
+class OrderSet(db.Model):
+    __tablename__ = 'order_set'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False) # e.g., 'Chest Pain Admission'
+    description = db.Column(db.Text, nullable=True)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Items are always needed with their set; loaded with one extra SELECT ... IN for a whole list
+    items = db.relationship('OrderSetItem', backref='order_set', order_by='OrderSetItem.position',
+                            cascade='all, delete-orphan', lazy='selectin')
+
+    def __repr__(self):
+        return f'<OrderSet id={self.id} name={self.name}>'
+
+
+class OrderSetItem(db.Model):
+    __tablename__ = 'order_set_item'
+    id = db.Column(db.Integer, primary_key=True)
+    order_set_id = db.Column(db.Integer, db.ForeignKey('order_set.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False, default=0) # Display/creation order within the set
+    # Copied onto each Order created from the set
+    order_type = db.Column(db.String(50), nullable=False)
+    order_name = db.Column(db.String(100), nullable=False)
+    order_details = db.Column(db.Text, nullable=True)
+
+    def __repr__(self):
+        return f'<OrderSetItem id={self.id} set={self.order_set_id} name={self.order_name}>'
     
 class VitalSign(db.Model):
     __tablename__ = 'vital_signs'
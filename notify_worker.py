@@ -0,0 +1,41 @@
+# notify_worker.py
+#
+# Drain the critical result notification outbox in a dedicated process.
+#
+#   python notify_worker.py [--workers 4] [--poll-interval 1.0] [--once]
+#
+# Alternatively set NOTIFICATION_WORKERS > 0 to run the dispatcher inside the web process.
+
+import argparse
+import json
+import time
+from run import app # Import your Flask app
+from services.notifications import notification_dispatcher
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Deliver queued critical result/imaging notifications.")
+    parser.add_argument('--workers', type=int, default=notification_dispatcher.workers)
+    parser.add_argument('--poll-interval', type=float, default=notification_dispatcher.poll_interval)
+    parser.add_argument('--once', action='store_true', help="Drain what is due now and exit")
+    args = parser.parse_args()
+
+    notification_dispatcher.workers = args.workers
+    notification_dispatcher.poll_interval = args.poll_interval
+    if args.once:
+        with app.app_context():
+            while notification_dispatcher.run_once():
+                pass
+    else:
+        notification_dispatcher.start(app)
+        print(f"Notification dispatcher running with {args.workers} delivery workers (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(60)
+                print(json.dumps(notification_dispatcher.stats.snapshot()))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            notification_dispatcher.stop()
+
+    print(json.dumps(notification_dispatcher.stats.snapshot(), indent=2))
@@ -0,0 +1,43 @@
+# preview_worker.py
+#
+# Build imaging thumbnails/previews (and read dimensions/frame counts) in a dedicated process.
+#
+#   python preview_worker.py [--workers 2] [--once]
+#
+# Alternatively set PREVIEW_WORKERS > 0 to run the pipeline inside the web process.
+
+import argparse
+import json
+import time
+
+
+if __name__ == '__main__':
+    # Imported here, not at module level: pool processes re-import this script and must not build the app
+    from run import app # Import your Flask app
+    from services.previews import preview_backlog, preview_pipeline
+
+    parser = argparse.ArgumentParser(description="Generate imaging previews for pending Imaging rows.")
+    parser.add_argument('--workers', type=int, default=preview_pipeline.workers, help="Decoder processes")
+    parser.add_argument('--once', action='store_true', help="Process what is pending now and exit")
+    args = parser.parse_args()
+
+    preview_pipeline.workers = args.workers
+    if args.once:
+        with app.app_context():
+            started = time.perf_counter()
+            processed = preview_pipeline.drain()
+            print(f"Processed {processed} imaging files in {time.perf_counter() - started:.1f}s")
+    else:
+        preview_pipeline.start(app)
+        print(f"Preview pipeline running with {args.workers} worker processes (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(60)
+                with app.app_context():
+                    print(json.dumps(dict(preview_pipeline.stats.snapshot(), queue=preview_backlog())))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            preview_pipeline.stop()
+
+    print(json.dumps(preview_pipeline.stats.snapshot(), indent=2))
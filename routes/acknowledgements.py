@@ -0,0 +1,51 @@
+# routes/acknowledgements.py
+
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from extensions import db
+from decorators import roles_required
+from constants import Roles
+from services.acknowledgements import ACKNOWLEDGEABLE, acknowledge
+
+acknowledgements_bp = Blueprint('acknowledgements', __name__)
+
+MAX_IDS_PER_KIND = 1000
+
+@acknowledgements_bp.route('/acknowledgements', methods=['POST'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT, Roles.NURSE) # Clinicians clearing critical flags
+def acknowledge_batch():
+    """
+    Acknowledge critical results and imaging in one request.
+    JSON body: {"results": [ids], "imaging": [ids]} (either key optional).
+    Items already acknowledged are left untouched; the response lists the ids that changed.
+    """
+    json_data = request.get_json()
+    if not isinstance(json_data, dict):
+        return jsonify({"error": "No input data provided"}), 400
+
+    requested = {}
+    for kind in ACKNOWLEDGEABLE:
+        ids = json_data.get(kind, [])
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return jsonify({"error": f"'{kind}' must be a list of integer IDs"}), 400
+        if len(ids) > MAX_IDS_PER_KIND:
+            return jsonify({"error": f"At most {MAX_IDS_PER_KIND} '{kind}' IDs per request"}), 400
+        requested[kind] = set(ids)
+    if not any(requested.values()):
+        return jsonify({"error": "No IDs to acknowledge"}), 400
+
+    try:
+        acknowledged = {
+            kind: acknowledge(model, requested[kind], current_user.id)
+            for kind, model in ACKNOWLEDGEABLE.items()
+        }
+        db.session.commit() # One commit, one cache invalidation per kind
+        return jsonify({
+            "acknowledged": acknowledged,
+            "unchanged": {kind: sorted(requested[kind] - set(acknowledged[kind])) for kind in ACKNOWLEDGEABLE}
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error acknowledging items: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
@@ -6,6 +6,7 @@ from extensions import db                       # Import db instance
 from schemas import admission_schema, admissions_schema # Import Admission schemas
 from marshmallow import ValidationError # type: ignore
 from sqlalchemy import or_ # type: ignore # Keep for potential search later
+from services.admission_detail import CHILD_COLLECTIONS, fetch_includes
 
 # Define blueprint
 admissions_bp = Blueprint('admissions', __name__) # Different name from patients_bp
@@ -84,12 +85,33 @@ def get_admissions():
 
 @admissions_bp.route('/admissions/<int:admission_id>', methods=['GET'])
 def get_admission_detail(admission_id):
-    """Get details for a single admission by its ID."""
+    """
+    Get details for a single admission by its ID.
+    Query Params:
+        include (str): Comma-separated child collections to embed:
+                       results, orders, consults, imaging, vitals.
+        limit (int): Most recent N items per included collection (default: 20, max: 100).
+    """
+    include_param = request.args.get('include', '', type=str)
+    includes = [name.strip() for name in include_param.split(',') if name.strip()]
+    unknown = [name for name in includes if name not in CHILD_COLLECTIONS]
+    if unknown:
+        return jsonify({"error": f"Unknown include(s): {unknown}. Allowed: {sorted(CHILD_COLLECTIONS)}."}), 400
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    if limit <= 0:
+        return jsonify({"error": "Invalid 'limit' parameter. Must be a positive integer."}), 400
+
     try:
         admission = Admission.query.get_or_404(
             admission_id, description=f"Admission with ID {admission_id} not found."
         )
         result = admission_schema.dump(admission)
+
+        # One windowed query per requested collection; image bytes are never selected.
+        if includes:
+            for name, by_admission in fetch_includes([admission_id], includes, limit).items():
+                result[name] = dict(by_admission[admission_id], limit=limit)
+
         return jsonify(result), 200
     except Exception as e:
         print(f"Database error fetching admission {admission_id}: {e}")
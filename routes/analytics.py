@@ -0,0 +1,75 @@
+# routes/analytics.py
+
+from flask import Blueprint, request, jsonify, current_app
+from flask_login import login_required
+from datetime import datetime
+from decorators import roles_required
+from constants import Roles
+from services.analytics import get_admission_analytics, get_order_time_in_state, GROUP_BY_OPTIONS
+
+analytics_bp = Blueprint('analytics', __name__)
+
+@analytics_bp.route('/analytics/admissions', methods=['GET'])
+@login_required
+@roles_required(Roles.ADMIN) # Administration reporting
+def admission_analytics():
+    """
+    Length-of-stay distribution and weekly admission/discharge throughput.
+    Results are cached for ANALYTICS_REFRESH_SECONDS.
+    Query Params:
+        group_by (str): 'unit', 'attending' or 'week' (default: 'unit').
+        start (str): ISO 8601; only admissions on/after this time.
+        end (str): ISO 8601; only admissions before this time.
+        refresh (int): 1 to bypass the cache.
+    """
+    group_by = request.args.get('group_by', 'unit')
+    if group_by not in GROUP_BY_OPTIONS:
+        return jsonify({"error": f"Invalid 'group_by'. Must be one of {list(GROUP_BY_OPTIONS)}."}), 400
+    try:
+        start_str = request.args.get('start')
+        end_str = request.args.get('end')
+        start = datetime.fromisoformat(start_str) if start_str else None
+        end = datetime.fromisoformat(end_str) if end_str else None
+    except ValueError:
+        return jsonify({"error": "Invalid date format for 'start' or 'end'. Use ISO 8601 format (YYYY-MM-DDTHH:MM:SS)."}), 400
+
+    try:
+        max_age = current_app.config.get('ANALYTICS_REFRESH_SECONDS', 300)
+        payload = get_admission_analytics(
+            group_by=group_by, start=start, end=end, max_age=max_age,
+            refresh=request.args.get('refresh', 0, type=int) == 1
+        )
+        return jsonify(dict(payload, refresh_seconds=max_age)), 200
+    except Exception as e:
+        print(f"Error computing admission analytics: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+@analytics_bp.route('/analytics/orders/time-in-state', methods=['GET'])
+@login_required
+@roles_required(Roles.ADMIN)
+def order_time_in_state():
+    """
+    p50/p90 hours orders spend in each status, per order type and unit, from the order transition log.
+    Results are cached for ANALYTICS_REFRESH_SECONDS.
+    Query Params:
+        start (str): ISO 8601; only states entered on/after this time.
+        end (str): ISO 8601; only states entered before this time.
+        refresh (int): 1 to bypass the cache.
+    """
+    try:
+        start_str = request.args.get('start')
+        end_str = request.args.get('end')
+        start = datetime.fromisoformat(start_str) if start_str else None
+        end = datetime.fromisoformat(end_str) if end_str else None
+    except ValueError:
+        return jsonify({"error": "Invalid date format for 'start' or 'end'. Use ISO 8601 format (YYYY-MM-DDTHH:MM:SS)."}), 400
+
+    try:
+        max_age = current_app.config.get('ANALYTICS_REFRESH_SECONDS', 300)
+        payload = get_order_time_in_state(start=start, end=end, max_age=max_age,
+                                          refresh=request.args.get('refresh', 0, type=int) == 1)
+        return jsonify(dict(payload, refresh_seconds=max_age)), 200
+    except Exception as e:
+        print(f"Error computing order time-in-state: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
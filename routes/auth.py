@@ -1,12 +1,22 @@
 # routes/auth.py (Fully Restored)
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
 from models.models import User  # Import User model
 from extensions import db       # Import db instance
 from schemas import user_schema # <<<=== RESTORE SCHEMA IMPORT
 from marshmallow import ValidationError
+import time
 from datetime import datetime   # For updating last_login
+from constants import Permissions, Roles
+from decorators import permission_required, roles_required
+from services.identity import user_identities
+from services.passwords import HasherBusy, password_hasher
+from services.permissions import permissions
+from services.tokens import TokenIdentity, access_tokens
+
+BUSY_RETRY_AFTER = 2 # Seconds clients wait before retrying when the hashing pool is saturated
+REVOKE_TOKENS = permissions.mask([Permissions.REVOKE_TOKENS])
 
 # Define blueprint
 auth_bp = Blueprint('auth', __name__)
@@ -42,7 +52,10 @@ def register():
          return jsonify({"errors": {"password": ["Password is required."]}}), 400
 
     # Hash the password using the model's method
-    new_user.set_password(raw_password)
+    try:
+        new_user.set_password(raw_password)
+    except HasherBusy:
+        return jsonify({"error": "Server busy, please retry"}), 503, {"Retry-After": str(BUSY_RETRY_AFTER)}
     # Set role if not provided (or use schema default if configured)
     if not new_user.role:
         new_user.role = json_data.get('role', 'User') # Default role
@@ -78,7 +91,14 @@ def login():
 
     user = User.query.filter_by(email=email).first()
 
-    if user and user.check_password(password):
+    stored_hash = user.password_hash if user else None
+    db.session.rollback() # End the read transaction so no pooled DB connection is held while hashing
+    try:
+        valid = stored_hash is not None and password_hasher.verify(stored_hash, password) # Bounded hashing pool
+    except HasherBusy:
+        return jsonify({"error": "Login service busy, please retry"}), 503, {"Retry-After": str(BUSY_RETRY_AFTER)}
+
+    if valid:
         if not user.is_active:
             return jsonify({"error": "User account is inactive"}), 401
 
@@ -86,6 +106,13 @@ def login():
 
         try: # Update last_login timestamp
             user.last_login = datetime.utcnow()
+            if user.password_needs_rehash():
+                # Hash method/cost changed since this password was stored: upgrade it while we have the plaintext
+                try:
+                    user.set_password(password)
+                    password_hasher.stats.count('rehashed')
+                except HasherBusy:
+                    pass # Still valid; upgraded on a later login
             db.session.commit()
         except Exception as e:
             db.session.rollback()
@@ -122,10 +149,116 @@ def status():
     print("--- Entering status() function ---")
     if current_user.is_authenticated:
         # === RESTORE SCHEMA USAGE ===
+        # current_user is a cached identity snapshot; the full profile comes from the User row
         return jsonify({
             "is_logged_in": True,
-            "user": user_schema.dump(current_user) # Use schema dump
+            "user": user_schema.dump(db.session.get(User, current_user.id)) # Use schema dump
             }), 200
         # === END SCHEMA USAGE RESTORE ===
     else:
-        return jsonify({"is_logged_in": False}), 200
\ No newline at end of file
+        return jsonify({"is_logged_in": False}), 200
+
+
+# --- Login Identity Cache Metrics ---
+@auth_bp.route('/user-cache/metrics', methods=['GET'])
+@login_required
+@permission_required(Permissions.VIEW_METRICS)
+def user_cache_metrics():
+    """Hit/miss counts and user queries saved per second by the user loader cache (this process)."""
+    return jsonify(user_identities.snapshot()), 200
+
+
+# --- Password Hashing Metrics ---
+@auth_bp.route('/password-hashing/metrics', methods=['GET'])
+@login_required
+@permission_required(Permissions.VIEW_METRICS)
+def password_hashing_metrics():
+    """Hash/verify counts, rejections under load and queue/hash timings for this process."""
+    return jsonify(password_hasher.snapshot()), 200
+
+
+
+# --- Access Tokens (machine clients) ---
+@auth_bp.route('/tokens', methods=['POST'])
+def issue_token():
+    """
+    Exchange credentials for a short-lived Bearer access token (monitor gateways, lab interfaces).
+    JSON body: {"email", "password"}. Send the token as 'Authorization: Bearer <token>'.
+    """
+    json_data = request.get_json(silent=True)
+    if not json_data: return jsonify({"error": "No input data provided"}), 400
+    email = json_data.get('email')
+    password = json_data.get('password')
+    if not email or not password: return jsonify({"error": "Missing email or password"}), 400
+
+    user = User.query.filter_by(email=email).first()
+    stored_hash = user.password_hash if user else None
+    db.session.rollback() # Don't hold a pooled DB connection while hashing
+    try:
+        valid = stored_hash is not None and password_hasher.verify(stored_hash, password)
+    except HasherBusy:
+        return jsonify({"error": "Login service busy, please retry"}), 503, {"Retry-After": str(BUSY_RETRY_AFTER)}
+    if not valid:
+        return jsonify({"error": "Invalid email or password"}), 401
+    if not user.is_active:
+        return jsonify({"error": "User account is inactive"}), 401
+
+    token, claims = access_tokens.issue(user)
+    return jsonify({
+        "access_token": token, "token_type": "Bearer", "expires_in": access_tokens.ttl,
+        "token_id": claims["jti"], "role": claims["role"]
+    }), 200
+
+
+@auth_bp.route('/tokens/revoke', methods=['POST'])
+@login_required
+def revoke_token():
+    """
+    Revoke access tokens.
+    Empty body: the token this request was authenticated with.
+    {"token_id": jti} or {"user_id": id} (RevokeTokens permission): one token, or every token issued to a user so far.
+    """
+    json_data = request.get_json(silent=True) or {}
+    token_id, user_id = json_data.get('token_id'), json_data.get('user_id')
+    if token_id is None and user_id is None:
+        if not isinstance(current_user, TokenIdentity):
+            return jsonify({"error": "Give token_id or user_id, or authenticate with the token to revoke"}), 400
+        access_tokens.revocations.revoke(current_user.token_id, current_user.expires_at)
+        return jsonify({"message": "Token revoked", "token_id": current_user.token_id}), 200
+
+    if not permissions.allows(current_user, REVOKE_TOKENS):
+        return jsonify({"error": "Revoking other tokens requires the RevokeTokens permission"}), 403
+    if token_id is not None:
+        # Expiry unknown here: keep the entry for the longest possible token lifetime
+        access_tokens.revocations.revoke(str(token_id), time.time() + access_tokens.ttl)
+    if user_id is not None:
+        if not isinstance(user_id, int) or isinstance(user_id, bool):
+            return jsonify({"error": "'user_id' must be an integer"}), 400
+        access_tokens.revocations.revoke_user([user_id])
+    return jsonify({"message": "Revoked", "token_id": token_id, "user_id": user_id}), 200
+
+
+@auth_bp.route('/tokens/metrics', methods=['GET'])
+@login_required
+@permission_required(Permissions.VIEW_METRICS)
+def token_metrics():
+    """Issued/verified/rejected token counts and revocation list size for this process."""
+    return jsonify(access_tokens.snapshot()), 200
+
+
+
+# --- Route Permission Report ---
+@auth_bp.route('/permissions/report', methods=['GET'])
+@login_required
+@roles_required(Roles.ADMIN)
+def permission_report():
+    """
+    Every API route with the roles/permissions it requires (compiled bitmasks) and the roles
+    that pass, plus each role's granted permissions. Routes with no role check list None.
+    """
+    routes = permissions.route_report(current_app)
+    return jsonify({
+        "roles": {role: permissions.names(permissions.effective_mask(role))[1] for role in permissions.roles},
+        "routes": routes,
+        "unchecked_routes": sorted({r["rule"] for r in routes if r["required_roles"] is None and r["rule"].startswith('/api/')})
+    }), 200
@@ -0,0 +1,36 @@
+# routes/census.py
+
+from flask import Blueprint, request, jsonify
+from flask_login import login_required
+from decorators import roles_required
+from constants import Roles
+from services.census import census
+
+census_bp = Blueprint('census', __name__)
+
+@census_bp.route('/census', methods=['GET'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT, Roles.NURSE) # Example roles for viewing census
+def get_census():
+    """
+    Current in-house census from the in-memory index.
+    Query Params:
+        unit (str): Unit key, e.g. 'ICU' (derived from Patient.location_bed).
+        attending_id (int): Attending physician user ID.
+    """
+    try:
+        unit = request.args.get('unit', None, type=str)
+        attending_id = request.args.get('attending_id', None, type=int)
+
+        entries = census.entries(unit=unit, attending_id=attending_id)
+        entries.sort(key=lambda e: e.admission_id)
+
+        return jsonify({
+            "total_active": len(census),
+            "matched": len(entries),
+            "by_unit": census.counts_by_unit(),
+            "admissions": [e.to_dict() for e in entries]
+        }), 200
+    except Exception as e:
+        print(f"Error reading census: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
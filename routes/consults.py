@@ -1,16 +1,20 @@
 # routes/consults.py (Corrected)
 
 from flask import Blueprint, request, jsonify
-from flask_login import login_required # Import login_required
+from flask_login import login_required, current_user # Import login_required
 from sqlalchemy import or_
 from extensions import db
 from models.models import Consult, Patient, User # Import Patient/User for FK checks
 # Ensure ConsultSchema is defined correctly in schemas.py
 from schemas import consult_schema, consults_schema
-from decorators import roles_required
-from constants import Roles
+from decorators import permission_required, roles_required
+from constants import Permissions, Roles
 from marshmallow import ValidationError
 from datetime import datetime # Import if using DateTime fields like read_at
+from services.consults import consult_inbox, read_receipts, unread_consult_count
+from services.orders import decode_cursor
+
+MAX_INBOX_PAGE = 200
 
 consults_bp = Blueprint('consults', __name__)
 
@@ -66,11 +70,11 @@ def get_consults():
         if status_filter:
              query = query.filter_by(status=status_filter)
 
-        query = query.order_by(Consult.created_at.desc()) # Order by creation time
+        query = query.order_by(Consult.consult_date.desc(), Consult.id.desc()) # Newest first
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
         consults_on_page = pagination.items
 
-        result_list = consults_schema.dump(consults_on_page)
+        result_list = read_receipts.apply(consults_schema.dump(consults_on_page))
 
         response = {
             "results": result_list, "page": pagination.page, "per_page": pagination.per_page,
@@ -83,18 +87,67 @@ def get_consults():
         # Standardized error response
         return jsonify({"error": "An internal server error occurred"}), 500
 
+@consults_bp.route('/consults/inbox', methods=['GET'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT)
+def get_consult_inbox():
+    """
+    Consults assigned to the current user, newest first.
+    Query Params:
+        status (str): Only consults with this status (e.g. 'Pending', 'Completed').
+        unread (str): 'true' for consults not yet opened, 'false' for opened ones.
+        limit (int): Items per page (default: 50, max: 200).
+        cursor (str): 'next_cursor' from the previous page.
+    """
+    limit = request.args.get('limit', 50, type=int)
+    if limit <= 0:
+        return jsonify({"error": "Invalid 'limit'. Must be a positive integer."}), 400
+    unread = request.args.get('unread')
+    if unread is not None:
+        if unread.lower() not in ('true', 'false'):
+            return jsonify({"error": "Invalid 'unread'. Use 'true' or 'false'."}), 400
+        unread = unread.lower() == 'true'
+    cursor = request.args.get('cursor')
+    try:
+        cursor = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({"error": "Invalid 'cursor'"}), 400
+
+    try:
+        rows, next_cursor = consult_inbox(current_user.id, request.args.get('status'), unread,
+                                          min(limit, MAX_INBOX_PAGE), cursor)
+        for row in rows:
+            row["consult_date"] = row["consult_date"].isoformat()
+            row["read_at"] = row["read_at"].isoformat() if row["read_at"] else None
+        return jsonify({
+            "results": rows, "next_cursor": next_cursor,
+            "total_unread": unread_consult_count(current_user.id)
+        }), 200
+    except Exception as e:
+        print(f"Error fetching consult inbox: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+@consults_bp.route('/consults/read-receipts/metrics', methods=['GET'])
+@login_required
+@permission_required(Permissions.VIEW_METRICS)
+def get_read_receipt_metrics():
+    """Buffered/written read receipt counts for this process."""
+    return jsonify(read_receipts.snapshot()), 200
+
 @consults_bp.route('/consults/<int:consult_id>', methods=['GET'])
 @login_required
 @roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT, Roles.NURSE) # Example roles
 def get_consult_detail(consult_id):
-     """Get details for a single consult."""
+     """Get details for a single consult. The assigned physician opening it records a read receipt."""
      # Add logic here to check if current_user should be allowed to see THIS consult
      try:
           consult = Consult.query.get_or_404(consult_id)
           # Check permissions based on consult details if needed
           # if consult.assigned_physician_id != current_user.id and current_user.role not in [Roles.ADMIN]:
           #     abort(403)
-          return consult_schema.dump(consult), 200
+          if consult.assigned_physician_id == current_user.id and consult.read_at is None:
+               read_receipts.mark_read(consult.id) # Buffered; written with the next batch
+          return read_receipts.apply([consult_schema.dump(consult)])[0], 200
      except Exception as e:
           print(f"Error fetching consult {consult_id}: {e}")
           return jsonify({"error": "An internal server error occurred"}), 500
@@ -10,6 +10,9 @@ from sqlalchemy.orm import joinedload # Import eager loading helpers
 from extensions import db
 # Import all relevant models
 from models.models import Patient, Result, Imaging, Consult, Order, User, Admission, VitalSign
+from services.census import census
+from services.consults import patients_with_unread_consult
+from services.indicators import indicator_cache
 
 # Define the dashboard blueprint
 dashboard_bp = Blueprint('dashboard', __name__)
@@ -52,6 +55,12 @@ def patient_list():
                 .distinct()\
                 .subquery()
             query = query.join(subq, Patient.id == subq.c.patient_id)
+        elif status == 'active':
+            # Currently admitted patients, served from the in-memory census (no admission join)
+            query = query.filter(Patient.id.in_(census.active_patient_ids()))
+        elif status == 'my_patients':
+            # Currently admitted patients where the current user is the attending
+            query = query.filter(Patient.id.in_(census.patient_ids(attending_id=user_id)))
 
         # --- Apply Sorting ---
         if sort_by == 'name_asc':
@@ -80,44 +89,15 @@ def patient_list():
         if patient_ids_on_page:
             time_window = datetime.utcnow() - timedelta(hours=48) # Configurable?
 
-            # Query for patient IDs with unacknowledged critical labs
-            # *** FIXED: Select Admission.patient_id and explicit join ***
-            stmt_lab = select(distinct(Admission.patient_id)).select_from(Result)\
-                .join(Admission, Result.admission_id == Admission.id)\
-                .where(
-                    Admission.patient_id.in_(patient_ids_on_page),
-                    Result.is_critical == True,
-                    Result.acknowledged_at.is_(None),
-                    Result.result_date > time_window
-                )
-            crit_lab_query = db.session.execute(stmt_lab).scalars().all()
-            indicator_patient_ids["critical_lab"] = set(crit_lab_query)
+            # Critical lab/imaging indicators come from the shared cache, rebuilt once per write batch
+            indicator_patient_ids["critical_lab"] = indicator_cache.patients_with_critical(
+                'lab', patient_ids_on_page, time_window)
+            indicator_patient_ids["critical_imaging"] = indicator_cache.patients_with_critical(
+                'imaging', patient_ids_on_page, time_window)
 
-            # Query for patient IDs with unacknowledged critical imaging
-            # *** FIXED: Select Admission.patient_id and explicit join ***
-            stmt_img = select(distinct(Admission.patient_id)).select_from(Imaging)\
-                .join(Admission, Imaging.admission_id == Admission.id)\
-                .where(
-                    Admission.patient_id.in_(patient_ids_on_page),
-                    Imaging.is_critical == True,
-                    Imaging.acknowledged_at.is_(None),
-                    Imaging.image_date > time_window
-                )
-            crit_img_query = db.session.execute(stmt_img).scalars().all()
-            indicator_patient_ids["critical_imaging"] = set(crit_img_query)
-
-            # Query for patient IDs with unread completed consults for the current user
-            # *** FIXED: Select Admission.patient_id and explicit join ***
-            stmt_consult = select(distinct(Admission.patient_id)).select_from(Consult)\
-                .join(Admission, Consult.admission_id == Admission.id)\
-                .where(
-                    Admission.patient_id.in_(patient_ids_on_page),
-                    Consult.assigned_physician_id == user_id,
-                    Consult.status == 'Completed',
-                    Consult.read_at.is_(None)
-                )
-            unread_consult_query = db.session.execute(stmt_consult).scalars().all()
-            indicator_patient_ids["unread_consult"] = set(unread_consult_query)
+            # Patient IDs with unread completed consults for the current user; read receipts
+            # still buffered in memory count as read, matching the consult inbox
+            indicator_patient_ids["unread_consult"] = patients_with_unread_consult(user_id, patient_ids_on_page)
 
             # Query for patient IDs with pending orders for the current user
             # *** FIXED: Select Admission.patient_id and explicit join ***
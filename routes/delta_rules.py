@@ -0,0 +1,71 @@
+# routes/delta_rules.py
+
+from flask import Blueprint, request, jsonify
+from flask_login import login_required
+from extensions import db
+from models.models import DeltaCheckRule
+from schemas import delta_check_rule_schema, delta_check_rules_schema
+from decorators import roles_required
+from constants import Roles
+from marshmallow import ValidationError
+
+delta_rules_bp = Blueprint('delta_rules', __name__)
+
+@delta_rules_bp.route('/delta-rules', methods=['GET'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT, Roles.NURSE, Roles.LAB_TECH)
+def get_delta_rules():
+    """List delta-check rules."""
+    try:
+        rules = DeltaCheckRule.query.order_by(DeltaCheckRule.test_name).all()
+        return jsonify({"results": delta_check_rules_schema.dump(rules)}), 200
+    except Exception as e:
+        print(f"Error listing delta-check rules: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+@delta_rules_bp.route('/delta-rules', methods=['POST'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.LAB_TECH)
+def create_delta_rule():
+    """
+    Create a delta-check rule for one test. At least one of max_abs_delta / max_pct_delta is required.
+    Applies to results ingested after commit.
+    """
+    json_data = request.get_json()
+    if not json_data:
+        return jsonify({"error": "No input data provided"}), 400
+    if json_data.get('max_abs_delta') is None and json_data.get('max_pct_delta') is None:
+        return jsonify({"error": "Give max_abs_delta and/or max_pct_delta"}), 400
+    try:
+        new_rule = delta_check_rule_schema.load(json_data, session=db.session)
+        if DeltaCheckRule.query.filter(DeltaCheckRule.test_name.ilike(new_rule.test_name.strip())).first():
+            return jsonify({"error": f"A delta-check rule for '{new_rule.test_name}' already exists"}), 409
+        db.session.add(new_rule)
+        db.session.commit()
+        return jsonify({
+            "message": "Delta-check rule created successfully",
+            "delta_rule": delta_check_rule_schema.dump(new_rule)
+        }), 201
+    except ValidationError as err:
+        return jsonify({"errors": err.messages}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating delta-check rule: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+@delta_rules_bp.route('/delta-rules/<int:rule_id>', methods=['DELETE'])
+@login_required
+@roles_required(Roles.ADMIN)
+def delete_delta_rule(rule_id):
+    """Delete a delta-check rule."""
+    try:
+        rule = DeltaCheckRule.query.get_or_404(rule_id)
+        db.session.delete(rule)
+        db.session.commit()
+        return '', 204
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error deleting delta-check rule {rule_id}: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
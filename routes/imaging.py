@@ -1,15 +1,25 @@
 # routes/imaging.py (Corrected)
 
+import base64
+import binascii
 from flask import Blueprint, request, jsonify
-from flask_login import login_required # Import login_required
-from sqlalchemy import or_
+from datetime import datetime
+from flask_login import login_required, current_user # Import login_required
+from math import ceil
+from sqlalchemy import func, or_, select
 from extensions import db
-from models.models import Imaging, Patient # Import Patient for FK check
+from models.models import Imaging, ImagingUpload, Patient, Admission # Import Admission for FK check
 # Ensure ImagingSchema is defined correctly in schemas.py
 from schemas import imaging_schema, imagings_schema
-from decorators import roles_required
-from constants import Roles
+from decorators import permission_required, roles_required
+from constants import Permissions, Roles
+from services.permissions import permissions
 from marshmallow import ValidationError
+from services.blob_store import blob_store
+from services.blob_store import BlobNotFound
+from services.imaging_files import attach_blob, blob_response, file_response
+from services.previews import DERIVATIVE_SIZES, preview_backlog, preview_pipeline
+from services.imaging_uploads import UploadError, upload_manager
 
 imaging_bp = Blueprint('imaging', __name__)
 
@@ -17,17 +27,31 @@ imaging_bp = Blueprint('imaging', __name__)
 @login_required
 @roles_required(Roles.ADMIN, Roles.RADIOLOGIST, Roles.LAB_TECH) # Example: Roles allowed to add imaging results
 def create_imaging():
-    """Create a new imaging record."""
+    """
+    Create a new imaging record.
+    An optional base64 'image_file' (with optional 'content_type') is written to the blob store;
+    only its digest, size and content type are stored on the row.
+    """
     json_data = request.get_json()
     if not json_data:
         return jsonify({"error": "No input data provided"}), 400
 
     try:
-        # Optional: Check if patient_id exists
-        if 'patient_id' not in json_data or not Patient.query.get(json_data['patient_id']):
-             return jsonify({"error": "Valid patient_id is required and must exist"}), 400
+        if 'admission_id' not in json_data or not db.session.get(Admission, json_data['admission_id']):
+             return jsonify({"error": "Valid admission_id is required and must exist"}), 400
+
+        json_data = dict(json_data)
+        encoded = json_data.pop('image_file', None)
+        content_type = json_data.pop('content_type', None)
+        if encoded is not None:
+            try:
+                data = base64.b64decode(encoded, validate=True)
+            except (binascii.Error, TypeError, ValueError):
+                return jsonify({"errors": {"image_file": ["Not valid base64 data."]}}), 400
 
         new_imaging = imaging_schema.load(json_data, session=db.session)
+        if encoded is not None:
+            attach_blob(new_imaging, blob_store.put_bytes(data, content_type))
         db.session.add(new_imaging)
         db.session.commit()
 
@@ -43,21 +67,258 @@ def create_imaging():
         # Standardized error response
         return jsonify({"error": "An internal server error occurred"}), 500
 
+@imaging_bp.route('/imaging/<int:imaging_id>/file', methods=['GET'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT, Roles.NURSE, Roles.RADIOLOGIST)
+def download_imaging_file(imaging_id):
+    """
+    Stream an imaging file. Supports Range requests (resumable/partial viewing) and
+    If-None-Match against the content digest (ETag).
+    """
+    imaging = Imaging.query.get_or_404(imaging_id)
+    try:
+        response = file_response(imaging)
+    except (BlobNotFound, FileNotFoundError):
+        print(f"Blob {imaging.blob_digest} for imaging {imaging_id} is missing from the blob store")
+        return jsonify({"error": "Image file is missing from storage"}), 404
+    if response is None:
+        return jsonify({"error": "No file stored for this imaging record"}), 404
+    return response
+
+@imaging_bp.route('/imaging/<int:imaging_id>/preview', methods=['GET'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT, Roles.NURSE, Roles.RADIOLOGIST)
+def get_imaging_preview(imaging_id):
+    """
+    Downscaled JPEG of an imaging file for list/dashboard views.
+    Query Params:
+        size (str): 'thumbnail' (default, 128px) or 'preview' (512px).
+    Returns 202 while the preview is still being generated.
+    """
+    size = request.args.get('size', 'thumbnail', type=str)
+    if size not in dict(DERIVATIVE_SIZES):
+        return jsonify({"error": f"Invalid 'size'. Options: {', '.join(dict(DERIVATIVE_SIZES))}"}), 400
+    row = db.session.execute(
+        select(Imaging.preview_status, getattr(Imaging, f"{size}_digest")).where(Imaging.id == imaging_id)
+    ).first()
+    if row is None:
+        return jsonify({"error": "Imaging record not found"}), 404
+    status, digest = row
+    if status == 'pending':
+        return jsonify({"status": status}), 202
+    if digest is None:
+        return jsonify({"error": "No preview available", "status": status}), 404
+    try:
+        return blob_response(digest, 'image/jpeg', f"imaging-{imaging_id}-{size}.jpg")
+    except (BlobNotFound, FileNotFoundError):
+        return jsonify({"error": "Preview is missing from storage"}), 404
+
+
+@imaging_bp.route('/imaging/previews/metrics', methods=['GET'])
+@login_required
+@permission_required(Permissions.VIEW_METRICS)
+def get_preview_metrics():
+    """Preview pipeline queue depth (pending rows) and per-stage timings from this process's pipeline."""
+    try:
+        return jsonify({"queue": preview_backlog(), "pipeline": preview_pipeline.stats.snapshot()}), 200
+    except Exception as e:
+        print(f"Error reading preview metrics: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+# --- Resumable uploads: initiate -> PUT chunks -> complete ---
+
+MANAGE_UPLOADS = permissions.mask([Permissions.MANAGE_UPLOADS])
+
+def _upload_for_current_user(upload_id):
+    upload = db.session.get(ImagingUpload, upload_id)
+    if upload is None:
+        return None, (jsonify({"error": "Upload session not found or expired"}), 404)
+    if upload.created_by_id != current_user.id and not permissions.allows(current_user, MANAGE_UPLOADS):
+        return None, (jsonify({"error": "Upload session belongs to another user"}), 403)
+    return upload, None
+
+
+def _upload_status(upload):
+    return {
+        "upload_id": upload.id,
+        "status": upload.status,
+        "total_size": upload.total_size,
+        "chunk_size": upload.chunk_size,
+        "total_chunks": upload.total_chunks,
+        "received_chunks": upload_manager.received_chunks(upload)
+    }
+
+
+@imaging_bp.route('/imaging/uploads', methods=['POST'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.RADIOLOGIST, Roles.LAB_TECH)
+def initiate_imaging_upload():
+    """
+    Start a chunked upload. JSON body: admission_id, image_type, total_size (bytes), and optionally
+    chunk_size, content_type, image_date (ISO 8601), image_report, is_critical.
+    Then PUT each chunk (0-based) to /imaging/uploads/<upload_id>/chunks/<n>.
+    413 if total_size is above MAX_UPLOAD_SIZE; 429 if the user already holds
+    MAX_OPEN_UPLOADS_PER_USER unfinished sessions.
+    """
+    json_data = request.get_json()
+    if not json_data:
+        return jsonify({"error": "No input data provided"}), 400
+    if 'admission_id' not in json_data or not db.session.get(Admission, json_data['admission_id']):
+        return jsonify({"error": "Valid admission_id is required and must exist"}), 400
+    if not json_data.get('image_type'):
+        return jsonify({"error": "image_type is required"}), 400
+    try:
+        image_date = datetime.fromisoformat(json_data['image_date']) if json_data.get('image_date') else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "image_date must be an ISO 8601 datetime"}), 400
+
+    try:
+        upload = upload_manager.initiate(
+            user_id=current_user.id,
+            admission_id=json_data['admission_id'],
+            total_size=json_data.get('total_size'),
+            chunk_size=json_data.get('chunk_size'),
+            content_type=json_data.get('content_type'),
+            image_type=json_data['image_type'],
+            image_date=image_date,
+            image_report=json_data.get('image_report'),
+            is_critical=json_data.get('is_critical', False)
+        )
+        return jsonify(_upload_status(upload)), 201
+    except UploadError as e:
+        return jsonify({"error": e.message}), e.status
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error initiating imaging upload: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+@imaging_bp.route('/imaging/uploads/<upload_id>', methods=['GET'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.RADIOLOGIST, Roles.LAB_TECH)
+def get_imaging_upload(upload_id):
+    """Session status, including which chunks have been received (for resuming)."""
+    upload, error = _upload_for_current_user(upload_id)
+    if error:
+        return error
+    return jsonify(_upload_status(upload)), 200
+
+
+@imaging_bp.route('/imaging/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.RADIOLOGIST, Roles.LAB_TECH)
+def put_imaging_upload_chunk(upload_id, index):
+    """Upload one chunk as the raw request body. Chunks may be sent in parallel and re-sent."""
+    upload, error = _upload_for_current_user(upload_id)
+    if error:
+        return error
+    try:
+        sha256 = upload_manager.write_chunk(upload, index, request.stream)
+        return jsonify({"upload_id": upload.id, "chunk": index, "sha256": sha256}), 200
+    except UploadError as e:
+        return jsonify({"error": e.message}), e.status
+    except Exception as e:
+        print(f"Error writing chunk {index} of upload {upload_id}: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+@imaging_bp.route('/imaging/uploads/<upload_id>/complete', methods=['POST'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.RADIOLOGIST, Roles.LAB_TECH)
+def complete_imaging_upload(upload_id):
+    """Finalize with JSON {"sha256": "<hex digest of the whole file>"}; creates the Imaging record."""
+    upload, error = _upload_for_current_user(upload_id)
+    if error:
+        return error
+    json_data = request.get_json(silent=True) or {}
+    try:
+        imaging = upload_manager.finalize(upload, json_data.get('sha256'))
+        return jsonify({
+            "message": "Imaging record created successfully",
+            "imaging": imaging_schema.dump(imaging)
+        }), 201
+    except UploadError as e:
+        return jsonify({"error": e.message}), e.status
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error finalizing imaging upload {upload_id}: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+@imaging_bp.route('/imaging/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.RADIOLOGIST, Roles.LAB_TECH)
+def abort_imaging_upload(upload_id):
+    """Abandon an upload session and discard its chunks."""
+    upload, error = _upload_for_current_user(upload_id)
+    if error:
+        return error
+    try:
+        upload_manager.abort(upload)
+        return '', 204
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error aborting imaging upload {upload_id}: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
 @imaging_bp.route('/imaging', methods=['GET'])
 @login_required
 @roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT, Roles.NURSE, Roles.RADIOLOGIST) # Example: Roles allowed to view list
 def get_imagings():
-    """Get a list of imaging records (add pagination/filtering later)."""
+    """
+    Paginated list of imaging records, newest first. Rows carry metadata only: the
+    legacy image_file column is deferred on the model and never selected here, so a
+    page costs the same regardless of image size (files come from /imaging/<id>/file).
+    Query Params:
+        page (int): Page number (default: 1).
+        per_page (int): Items per page (default: 20, max: 100).
+        admission_id (int): Only this admission.
+        patient_id (int): Only this patient's admissions.
+        image_type (str): Exact type, e.g. 'CT'.
+        is_critical (str): 'true' or 'false'.
+    """
     try:
-        # Basic version - add pagination/filtering like in patients.py later
         page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
-        patient_id_filter = request.args.get('patient_id', None, type=int)
-        # Add search later if needed
+        per_page = min(request.args.get('per_page', 20, type=int), 100)
+        if page <= 0 or per_page <= 0:
+            raise ValueError("Page and per_page must be positive integers.")
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid 'page' or 'per_page' parameter. Must be positive integers."}), 400
+
+    admission_id_filter = request.args.get('admission_id', None, type=int)
+    patient_id_filter = request.args.get('patient_id', None, type=int)
+    image_type_filter = request.args.get('image_type', None, type=str)
+    critical_filter = request.args.get('is_critical', None, type=str)
+    if critical_filter is not None and critical_filter.lower() not in ('true', 'false'):
+        return jsonify({"error": "Invalid 'is_critical'. Use 'true' or 'false'."}), 400
 
-        query = Imaging.query
+    try:
+        filters = []
+        if admission_id_filter:
+            filters.append(Imaging.admission_id == admission_id_filter)
         if patient_id_filter:
-            query = query.filter_by(Patient)
+            filters.append(Imaging.admission_id.in_(
+                select(Admission.id).where(Admission.patient_id == patient_id_filter)))
+        if image_type_filter:
+            filters.append(Imaging.image_type == image_type_filter)
+        if critical_filter is not None:
+            filters.append(Imaging.is_critical.is_(critical_filter.lower() == 'true'))
+
+        # Counted on the id alone: query.paginate() would count over a subquery listing every mapped column
+        total = db.session.execute(select(func.count(Imaging.id)).where(*filters)).scalar()
+        imagings_on_page = db.session.execute(
+            select(Imaging).where(*filters)
+            .order_by(Imaging.image_date.desc(), Imaging.id.desc())
+            .limit(per_page).offset((page - 1) * per_page)
+        ).scalars().all()
+
+        response = {
+            "results": imagings_schema.dump(imagings_on_page), "page": page, "per_page": per_page,
+            "total_pages": ceil(total / per_page), "total_items": total
+        }
+        return jsonify(response), 200
+
     except Exception as e:
         print(f"Error fetching imaging records: {e}")
-        return jsonify({"error": "An internal server error occurred"}), 500
\ No newline at end of file
+        return jsonify({"error": "An internal server error occurred"}), 500
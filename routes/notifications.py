@@ -0,0 +1,26 @@
+# routes/notifications.py
+
+from flask import Blueprint, jsonify
+from flask_login import login_required
+from decorators import permission_required
+from constants import Permissions
+from services.notifications import notification_dispatcher, outbox_backlog
+
+notifications_bp = Blueprint('notifications', __name__)
+
+@notifications_bp.route('/notifications/metrics', methods=['GET'])
+@login_required
+@permission_required(Permissions.VIEW_METRICS)
+def get_notification_metrics():
+    """
+    Critical-notification outbox health: backlog and oldest undelivered age from the table,
+    plus delivery counters, outbox lag and delivery latency from this process's dispatcher.
+    """
+    try:
+        return jsonify({
+            "outbox": outbox_backlog(),
+            "dispatcher": notification_dispatcher.stats.snapshot()
+        }), 200
+    except Exception as e:
+        print(f"Error reading notification metrics: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
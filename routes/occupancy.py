@@ -0,0 +1,78 @@
+# routes/occupancy.py
+
+from flask import Blueprint, request, jsonify
+from flask_login import login_required
+from datetime import datetime, timedelta
+from decorators import roles_required
+from constants import Roles
+from services.occupancy import load_intervals, timelines_by_unit, STEP_SIZES
+
+occupancy_bp = Blueprint('occupancy', __name__)
+
+MAX_BUCKETS = 24 * 366 # One year of hourly buckets
+
+@occupancy_bp.route('/occupancy', methods=['GET'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.NURSE) # Example roles for bed management
+def get_occupancy():
+    """
+    Bed occupancy per unit over a time range, computed with a sweep line over admission intervals.
+    Query Params:
+        start (str): ISO 8601 range start (default: 30 days ago).
+        end (str): ISO 8601 range end (default: now).
+        step (str): Bucket width: 'hour', 'day' or 'week' (default: 'hour').
+        unit (str): Restrict to one unit, e.g. 'ICU'.
+        at (str): ISO 8601 instant; if given, only occupancy at that instant is returned.
+    """
+    now = datetime.utcnow()
+    try:
+        at_str = request.args.get('at')
+        at = datetime.fromisoformat(at_str) if at_str else None
+        end_str = request.args.get('end')
+        end = datetime.fromisoformat(end_str) if end_str else now
+        start_str = request.args.get('start')
+        start = datetime.fromisoformat(start_str) if start_str else end - timedelta(days=30)
+    except ValueError:
+        return jsonify({"error": "Invalid date format for 'start', 'end' or 'at'. Use ISO 8601 format (YYYY-MM-DDTHH:MM:SS)."}), 400
+
+    step_name = request.args.get('step', 'hour')
+    if step_name not in STEP_SIZES:
+        return jsonify({"error": f"Invalid 'step'. Must be one of {sorted(STEP_SIZES)}."}), 400
+    step = STEP_SIZES[step_name]
+    unit = request.args.get('unit', None, type=str)
+
+    if at is not None:
+        start, end = at, at + timedelta(microseconds=1)
+    elif start >= end:
+        return jsonify({"error": "'start' must be before 'end'."}), 400
+    elif (end - start) / step > MAX_BUCKETS:
+        return jsonify({"error": f"Range too large: at most {MAX_BUCKETS} buckets per request."}), 400
+
+    try:
+        timelines = timelines_by_unit(load_intervals(start, end, unit=unit), now=now)
+
+        if at is not None:
+            return jsonify({
+                "at": at.isoformat(),
+                "occupancy": {u: t.occupancy_at(at) for u, t in timelines.items()}
+            }), 200
+
+        units = {}
+        for unit_name, timeline in timelines.items():
+            peak, peak_at = timeline.peak(start, end)
+            units[unit_name] = {
+                "peak": peak,
+                "peak_at": peak_at.isoformat(),
+                "buckets": [
+                    {"start": b["start"].isoformat(), "occupied": b["occupied"], "peak": b["peak"]}
+                    for b in timeline.histogram(start, end, step)
+                ]
+            }
+        return jsonify({
+            "start": start.isoformat(), "end": end.isoformat(), "step": step_name,
+            "units": units
+        }), 200
+
+    except Exception as e:
+        print(f"Error computing occupancy: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
@@ -0,0 +1,92 @@
+# routes/order_sets.py
+
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models.models import OrderSet
+from schemas import order_set_schema, order_sets_schema
+from decorators import roles_required
+from constants import Roles
+from marshmallow import ValidationError
+
+order_sets_bp = Blueprint('order_sets', __name__)
+
+@order_sets_bp.route('/order-sets', methods=['GET'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT, Roles.NURSE, Roles.PHARMACIST)
+def get_order_sets():
+    """List order set templates with their items (apply one via POST /api/admissions/<id>/orders:batch)."""
+    try:
+        order_sets = OrderSet.query.order_by(OrderSet.name).all()
+        return jsonify({"results": order_sets_schema.dump(order_sets)}), 200
+    except Exception as e:
+        print(f"Error listing order sets: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+@order_sets_bp.route('/order-sets/<int:order_set_id>', methods=['GET'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT, Roles.NURSE, Roles.PHARMACIST)
+def get_order_set(order_set_id):
+    """Get one order set template."""
+    order_set = OrderSet.query.get_or_404(order_set_id)
+    return jsonify(order_set_schema.dump(order_set)), 200
+
+
+@order_sets_bp.route('/order-sets', methods=['POST'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.DOCTOR)
+def create_order_set():
+    """
+    Create an order set template.
+    Body: name, description (optional), items: [{order_type, order_name, order_details}] in order.
+    """
+    json_data = request.get_json()
+    if not json_data:
+        return jsonify({"error": "No input data provided"}), 400
+    try:
+        order_set = order_set_schema.load(json_data, session=db.session)
+        if not order_set.items:
+            return jsonify({"errors": {"items": ["At least one item is required."]}}), 400
+        order_set.name = order_set.name.strip()
+        # Case-insensitive exact match (ilike would treat % and _ in names as wildcards)
+        if OrderSet.query.filter(func.lower(OrderSet.name) == order_set.name.lower()).first():
+            return jsonify({"error": f"An order set named '{order_set.name}' already exists"}), 409
+        for position, item in enumerate(order_set.items):
+            item.position = position
+        order_set.created_by_id = current_user.id
+        db.session.add(order_set)
+        db.session.commit()
+        return jsonify({
+            "message": "Order set created successfully",
+            "order_set": order_set_schema.dump(order_set)
+        }), 201
+    except ValidationError as err:
+        db.session.rollback()
+        return jsonify({"errors": err.messages}), 400
+    except IntegrityError:
+        # A concurrent create of the same name won the unique constraint
+        db.session.rollback()
+        return jsonify({"error": f"An order set named '{json_data.get('name')}' already exists"}), 409
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating order set: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+@order_sets_bp.route('/order-sets/<int:order_set_id>', methods=['DELETE'])
+@login_required
+@roles_required(Roles.ADMIN)
+def delete_order_set(order_set_id):
+    """Delete an order set template (orders already created from it are unaffected)."""
+    try:
+        order_set = OrderSet.query.get_or_404(order_set_id)
+        db.session.delete(order_set)
+        db.session.commit()
+        return '', 204
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error deleting order set {order_set_id}: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
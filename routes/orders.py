@@ -1,18 +1,33 @@
 # routes/orders.py (Corrected)
 
-from flask import Blueprint, request, jsonify
-from flask_login import login_required # Import login_required
+from flask import Blueprint, current_app, request, jsonify
+from flask_login import login_required, current_user # Import login_required
 from sqlalchemy import or_
 from extensions import db
-from models.models import Order, Patient, User # Import Patient/User for FK checks
+from models.models import Admission, Order, OrderSet, User # Import Admission/User for FK checks
 # Ensure OrderSchema is defined correctly in schemas.py
 from schemas import order_schema, orders_schema
 from decorators import roles_required
-from constants import Roles
+from constants import OrderStatus, Roles
 from marshmallow import ValidationError
+from services.order_states import InvalidTransition, check_transition, set_actor
+from services.orders import (DUPLICATE_POLICIES, MAX_BATCH_ORDERS, check_duplicates, create_order_batch, decode_cursor,
+                             order_set_items, pending_signature_count, pending_signature_worklist, sign_orders,
+                             validate_order_batch)
+
+MAX_WORKLIST_PAGE = 200
+MAX_SIGN_IDS = 500
 
 orders_bp = Blueprint('orders', __name__)
 
+def _duplicate_check(admission_id, rows):
+    """(policy, duplicates) for rows about to be created; unknown policies fall back to 'warn'."""
+    policy = current_app.config.get('DUPLICATE_ORDER_POLICY', 'warn')
+    policy = policy if policy in DUPLICATE_POLICIES else 'warn'
+    if policy == 'off':
+        return policy, []
+    return policy, check_duplicates(admission_id, rows, current_app.config.get('DUPLICATE_ORDER_WINDOW_MINUTES', 60))
+
 @orders_bp.route('/orders', methods=['POST'])
 @login_required
 @roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT) # Example: Roles allowed to create orders
@@ -23,30 +38,171 @@ def create_order():
         return jsonify({"error": "No input data provided"}), 400
 
     try:
-        # Optional: Check related records exist
-        if 'patient_id' not in json_data or not Patient.query.get(json_data['patient_id']):
-             return jsonify({"error": "Valid patient_id is required and must exist"}), 400
-        if 'ordering_physician_id' in json_data and json_data['ordering_physician_id'] is not None:
-             if not User.query.get(json_data['ordering_physician_id']):
-                  return jsonify({"error": "ordering_physician_id does not refer to an existing user"}), 400
-        # Add check for responsible_attending_id if needed
+        # Orders are placed against an admission, not directly against a patient
+        if 'admission_id' not in json_data or not db.session.get(Admission, json_data['admission_id']):
+             return jsonify({"error": "Valid admission_id is required and must exist"}), 400
+        if json_data.get('responsible_attending_id') is not None:
+             if not db.session.get(User, json_data['responsible_attending_id']):
+                  return jsonify({"error": "responsible_attending_id does not refer to an existing user"}), 400
 
         new_order = order_schema.load(json_data, session=db.session)
+        check_transition(None, new_order.status or OrderStatus.PENDING)
+        policy, duplicates = _duplicate_check(new_order.admission_id, [{
+            "order_type": new_order.order_type, "order_name": new_order.order_name,
+            "order_details": new_order.order_details}])
+        if duplicates and policy == 'block':
+            return jsonify({"error": "A matching order was placed for this admission recently",
+                            "duplicate_of": duplicates[0]["duplicate_of"]}), 409
+        set_actor(db.session, current_user.id)
         db.session.add(new_order)
         db.session.commit()
 
-        return jsonify({
+        response = {
             "message": "Order created successfully",
             "order": order_schema.dump(new_order)
-        }), 201
+        }
+        if duplicates:
+            response["warnings"] = [{"message": "Possible duplicate order", "duplicate_of": duplicates[0]["duplicate_of"]}]
+        return jsonify(response), 201
     except ValidationError as err:
         return jsonify({"errors": err.messages}), 400
+    except InvalidTransition as err:
+        db.session.rollback()
+        return jsonify({"error": err.message}), 400
     except Exception as e:
         db.session.rollback()
         print(f"Error creating order: {e}")
         # Standardized error response
         return jsonify({"error": "An internal server error occurred"}), 500
 
+@orders_bp.route('/admissions/<int:admission_id>/orders:batch', methods=['POST'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT)
+def create_orders_batch(admission_id):
+    """
+    Create many orders for one admission at once, e.g. an admission order set.
+    Body:
+        order_set_id (int, optional): Expand this template's items first.
+        orders (list, optional): Further orders (Order fields, without admission_id).
+        responsible_attending_id (int, optional): Default for orders that don't set one.
+    Every order is validated before anything is written. If any fails, none are created
+    and the response (400) lists each order's errors; otherwise all are inserted in one
+    transaction (201) and each order's new id is returned in request order.
+    Orders matching a recent order for the admission, or an earlier one in the same
+    request, are flagged per DUPLICATE_ORDER_POLICY: listed under 'warnings' ('warn'),
+    or the whole batch is rejected with 409 ('block').
+    """
+    json_data = request.get_json()
+    if not json_data:
+        return jsonify({"error": "No input data provided"}), 400
+    orders = json_data.get('orders', [])
+    if not isinstance(orders, list):
+        return jsonify({"error": "'orders' must be a list"}), 400
+
+    try:
+        if not db.session.get(Admission, admission_id):
+            return jsonify({"error": "Admission not found"}), 404
+        items = []
+        order_set_id = json_data.get('order_set_id')
+        if order_set_id is not None:
+            order_set = db.session.get(OrderSet, order_set_id)
+            if not order_set:
+                return jsonify({"error": "order_set_id does not refer to an existing order set"}), 400
+            items.extend(order_set_items(order_set))
+        items.extend(orders)
+        if not items:
+            return jsonify({"error": "Give order_set_id and/or a non-empty 'orders' list"}), 400
+        if len(items) > MAX_BATCH_ORDERS:
+            return jsonify({"error": f"At most {MAX_BATCH_ORDERS} orders per batch"}), 400
+
+        defaults = {}
+        if json_data.get('responsible_attending_id') is not None:
+            defaults['responsible_attending_id'] = json_data['responsible_attending_id']
+        rows, errors = validate_order_batch(items, defaults)
+        if errors:
+            results = [{"index": i, "status": "rejected", "errors": errors[i]} if i in errors
+                       else {"index": i, "status": "not_created"} for i in range(len(items))]
+            return jsonify({"error": f"{len(errors)} of {len(items)} orders are invalid; none were created",
+                            "results": results}), 400
+
+        policy, duplicates = _duplicate_check(admission_id, rows)
+        if duplicates and policy == 'block':
+            return jsonify({"error": f"{len(duplicates)} of {len(items)} orders duplicate recent or repeated orders; "
+                                     "none were created",
+                            "duplicates": duplicates}), 409
+
+        ids = create_order_batch(admission_id, rows, created_by_id=current_user.id)
+        db.session.commit()
+        response = {
+            "message": f"{len(ids)} orders created successfully",
+            "results": [{"index": i, "status": "created", "id": order_id, "order_name": row['order_name']}
+                        for i, (order_id, row) in enumerate(zip(ids, rows))]
+        }
+        if duplicates:
+            response["warnings"] = duplicates
+        return jsonify(response), 201
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating order batch for admission {admission_id}: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+@orders_bp.route('/orders/worklist', methods=['GET'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.DOCTOR)
+def get_signature_worklist():
+    """
+    Orders awaiting the current user's signature, oldest first.
+    Query Params:
+        limit (int): Items per page (default: 50, max: 200).
+        cursor (str): 'next_cursor' from the previous page.
+    """
+    limit = request.args.get('limit', 50, type=int)
+    if limit <= 0:
+        return jsonify({"error": "Invalid 'limit'. Must be a positive integer."}), 400
+    cursor = request.args.get('cursor')
+    try:
+        cursor = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({"error": "Invalid 'cursor'"}), 400
+
+    try:
+        rows, next_cursor = pending_signature_worklist(current_user.id, min(limit, MAX_WORKLIST_PAGE), cursor)
+        for row in rows:
+            row["order_date"] = row["order_date"].isoformat()
+        return jsonify({
+            "results": rows, "next_cursor": next_cursor,
+            "total_pending": pending_signature_count(current_user.id)
+        }), 200
+    except Exception as e:
+        print(f"Error fetching signature worklist: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+@orders_bp.route('/orders/sign', methods=['POST'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.DOCTOR)
+def sign_orders_batch():
+    """
+    Sign many orders in one UPDATE. JSON body: {"order_ids": [ids]}.
+    Only orders still awaiting the current user's signature change; the rest are listed as unchanged.
+    """
+    json_data = request.get_json()
+    if not isinstance(json_data, dict):
+        return jsonify({"error": "No input data provided"}), 400
+    ids = json_data.get('order_ids')
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify({"error": "'order_ids' must be a non-empty list of integer IDs"}), 400
+    if len(ids) > MAX_SIGN_IDS:
+        return jsonify({"error": f"At most {MAX_SIGN_IDS} order IDs per request"}), 400
+
+    try:
+        signed = sign_orders(set(ids), current_user.id)
+        db.session.commit()
+        return jsonify({"signed": signed, "unchanged": sorted(set(ids) - set(signed))}), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error signing orders: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
 @orders_bp.route('/orders', methods=['GET'])
 @login_required
 @roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT, Roles.NURSE, Roles.PHARMACIST) # Example: Roles allowed to view orders
@@ -63,7 +219,7 @@ def get_orders():
         if patient_id_filter:
             query = query.filter_by(patient_id=patient_id_filter)
 
-        query = query.order_by(Order.created_at.desc()) # Order by creation time
+        query = query.order_by(Order.order_date.desc(), Order.id.desc()) # Newest first
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
         orders_on_page = pagination.items
 
@@ -96,12 +252,26 @@ def get_order_detail(order_id):
 @login_required
 @roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT) # Example: Roles allowed to update orders (e.g., change status)
 def update_order(order_id):
-    """Update an existing order."""
+    """
+    Update an existing order.
+    A 'status' change must be allowed by the order state machine (services.order_states);
+    otherwise 409 with the allowed next states. Every change is recorded in the transition log.
+    Signing is not a plain status change: PendingSignature -> Signed goes through POST /orders/sign.
+    """
     try:
         order = Order.query.get_or_404(order_id)
         json_data = request.get_json()
         if not json_data:
             return jsonify({"error": "No input data provided"}), 400
+        if 'status' in json_data and json_data['status'] != order.status:
+            if json_data['status'] == OrderStatus.SIGNED:
+                # Only the responsible attending may sign, and signing stamps signed_at/signed_by_id
+                return jsonify({"error": "Orders are signed with POST /api/orders/sign by their responsible attending"}), 409
+            try:
+                check_transition(order.status, json_data['status'], order.id)
+            except InvalidTransition as err:
+                return jsonify({"error": err.message}), 409
+        set_actor(db.session, current_user.id)
 
         try:
             # Use schema load for validation and partial update
@@ -0,0 +1,68 @@
+# routes/reference_ranges.py
+
+from flask import Blueprint, request, jsonify
+from flask_login import login_required
+from extensions import db
+from models.models import ReferenceRange
+from schemas import reference_range_schema, reference_ranges_schema
+from decorators import roles_required
+from constants import Roles
+from marshmallow import ValidationError
+
+reference_ranges_bp = Blueprint('reference_ranges', __name__)
+
+@reference_ranges_bp.route('/reference-ranges', methods=['GET'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT, Roles.NURSE, Roles.LAB_TECH)
+def get_reference_ranges():
+    """List reference ranges, optionally for one test (?test_name=)."""
+    try:
+        query = ReferenceRange.query
+        test_name = request.args.get('test_name', None, type=str)
+        if test_name:
+            query = query.filter(ReferenceRange.test_name.ilike(test_name))
+        query = query.order_by(ReferenceRange.test_name, ReferenceRange.sex, ReferenceRange.age_min_years)
+        return jsonify({"results": reference_ranges_schema.dump(query.all())}), 200
+    except Exception as e:
+        print(f"Error listing reference ranges: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+@reference_ranges_bp.route('/reference-ranges', methods=['POST'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.LAB_TECH)
+def create_reference_range():
+    """Create a reference range. Applies to results ingested after commit; run the backfill for older rows."""
+    json_data = request.get_json()
+    if not json_data:
+        return jsonify({"error": "No input data provided"}), 400
+    try:
+        new_range = reference_range_schema.load(json_data, session=db.session)
+        db.session.add(new_range)
+        db.session.commit()
+        return jsonify({
+            "message": "Reference range created successfully",
+            "reference_range": reference_range_schema.dump(new_range)
+        }), 201
+    except ValidationError as err:
+        return jsonify({"errors": err.messages}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating reference range: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+@reference_ranges_bp.route('/reference-ranges/<int:range_id>', methods=['DELETE'])
+@login_required
+@roles_required(Roles.ADMIN)
+def delete_reference_range(range_id):
+    """Delete a reference range."""
+    try:
+        rng = ReferenceRange.query.get_or_404(range_id)
+        db.session.delete(rng)
+        db.session.commit()
+        return '', 204
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error deleting reference range {range_id}: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
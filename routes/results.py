@@ -4,12 +4,17 @@ from flask import Blueprint, request, jsonify
 from flask_login import login_required # Import login_required
 from sqlalchemy import or_
 from extensions import db
-from models.models import Result, Patient # Import Patient if checking patient_id exists
+from models.models import Result, Admission # Import Admission to check admission_id exists
 # Ensure ResultSchema is defined correctly in schemas.py
 from schemas import result_schema, results_schema
 from decorators import roles_required
 from constants import Roles
 from marshmallow import ValidationError
+from services.hl7 import iter_file_messages
+from services.result_ingest import result_pipeline
+from services.reference_ranges import annotate_result
+from services.delta_checks import delta_check_result
+from services.flowsheet import flowsheet_cache, BUCKETS
 
 results_bp = Blueprint('results', __name__)
 
@@ -23,11 +28,14 @@ def handle_results_post():
         return jsonify({"error": "No input data provided"}), 400
 
     try:
-        # Optional: Check if patient_id exists
-        if 'patient_id' not in json_data or not Patient.query.get(json_data['patient_id']):
-             return jsonify({"error": "Valid patient_id is required and must exist"}), 400
+        # Results are filed against an admission, not directly against a patient
+        if 'admission_id' not in json_data or not db.session.get(Admission, json_data['admission_id']):
+             return jsonify({"error": "Valid admission_id is required and must exist"}), 400
 
         new_result = result_schema.load(json_data, session=db.session)
+        # Parse numeric value/unit and flag against reference ranges
+        annotate_result(new_result, client_critical=json_data.get('is_critical'))
+        delta_check_result(new_result) # Flag a change since the previous value of the same test
         db.session.add(new_result)
         db.session.commit()
 
@@ -44,6 +52,40 @@ def handle_results_post():
         return jsonify({"error": "An internal server error occurred"}), 500
 
 
+@results_bp.route('/results/hl7', methods=['POST'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.LAB_TECH) # Lab interfaces / analyzers
+def ingest_hl7_results():
+    """
+    Ingest a batch of HL7 v2 ORU^R01 messages (text/plain body, one MSH per message,
+    optional MLLP framing). Observations are filed against the patient's active admission.
+    """
+    body = request.get_data(as_text=True)
+    if not body or not body.strip():
+        return jsonify({"error": "No input data provided"}), 400
+
+    try:
+        outcomes = result_pipeline.ingest_texts(iter_file_messages(body.splitlines()))
+        accepted = [o for o in outcomes if o["status"] == "AA"]
+        return jsonify({
+            "message": f"Ingested {len(accepted)} of {len(outcomes)} messages",
+            "results_inserted": sum(o["results"] for o in accepted),
+            "rejected": [o for o in outcomes if o["status"] != "AA"]
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error ingesting HL7 results: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+@results_bp.route('/results/ingest-stats', methods=['GET'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.LAB_TECH)
+def get_ingest_stats():
+    """Throughput and end-to-end latency of the HL7 result ingest pipeline."""
+    return jsonify(result_pipeline.stats.snapshot()), 200
+
+
 @results_bp.route('/results', methods=['GET'])
 @login_required
 @roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT, Roles.NURSE, Roles.LAB_TECH) # Example roles for viewing results
@@ -77,6 +119,28 @@ def handle_results_get():
         return jsonify({"error": "An internal server error occurred"}), 500
 
 
+@results_bp.route('/admissions/<int:admission_id>/flowsheet', methods=['GET'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT, Roles.NURSE, Roles.LAB_TECH)
+def get_flowsheet(admission_id):
+    """
+    Cumulative lab flowsheet: tests x timepoints grid with the latest value per cell.
+    Cached per admission and invalidated when the admission's results change.
+    Query Params:
+        bucket (str): 'none' (one column per result time, default) or 'day'.
+    """
+    bucket = request.args.get('bucket', 'none')
+    if bucket not in BUCKETS:
+        return jsonify({"error": f"Invalid 'bucket'. Must be one of {list(BUCKETS)}."}), 400
+    if not db.session.get(Admission, admission_id):
+        return jsonify({"error": f"Admission with id {admission_id} not found."}), 404
+    try:
+        return jsonify(flowsheet_cache.get(admission_id, bucket)), 200
+    except Exception as e:
+        print(f"Error building flowsheet for admission {admission_id}: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
 @results_bp.route('/results/<int:result_id>', methods=['GET'])
 @login_required
 @roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT, Roles.NURSE, Roles.LAB_TECH) # Example roles
@@ -109,6 +173,10 @@ def modify_result_put(result_id):
         except ValidationError as err:
              return jsonify({"errors": err.messages}), 400
 
+        if 'result_value' in json_data or 'test_name' in json_data:
+             # Only an is_critical sent in this request overrides the computed flag, not the stored one
+             annotate_result(updated_result, client_critical=json_data.get('is_critical'))
+
         db.session.commit()
         return jsonify({
             "message": "Result updated successfully",
@@ -0,0 +1,68 @@
+# routes/search.py
+
+import time
+from flask import Blueprint, request, jsonify
+from flask_login import login_required
+from datetime import datetime
+from decorators import permission_required, roles_required
+from constants import Permissions, Roles
+from services.text_search import KINDS, text_search
+
+search_bp = Blueprint('search', __name__)
+
+MAX_LIMIT = 100
+
+@search_bp.route('/search', methods=['GET'])
+@login_required
+@roles_required(Roles.ADMIN, Roles.DOCTOR, Roles.RESIDENT, Roles.NURSE, Roles.RADIOLOGIST)
+def search_clinical_text():
+    """
+    Ranked full-text search over radiology reports and consult notes.
+    Every word must match (plural forms included); results carry a highlighted snippet
+    (HTML: the document text escaped, matches wrapped in <b></b>).
+    Query Params:
+        q (str): Search words, e.g. 'pulmonary embolism'.
+        kind (str): Comma-separated subset of 'imaging', 'consult' (default: both).
+        patient_id (int): Only this patient's documents.
+        admission_id (int): Only this admission's documents.
+        start (str): ISO 8601; documents dated on/after this time.
+        end (str): ISO 8601; documents dated on/before this time.
+        limit (int): Max results (default: 20, max: 100).
+    """
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({"error": "Query parameter 'q' is required"}), 400
+    kinds = tuple(k.strip() for k in request.args.get('kind', ','.join(KINDS)).split(',') if k.strip())
+    if not kinds or any(k not in KINDS for k in kinds):
+        return jsonify({"error": f"Invalid 'kind'. Options: {', '.join(KINDS)}"}), 400
+    limit = request.args.get('limit', 20, type=int)
+    if limit <= 0:
+        return jsonify({"error": "Invalid 'limit'. Must be a positive integer."}), 400
+    try:
+        start_str = request.args.get('start')
+        end_str = request.args.get('end')
+        start = datetime.fromisoformat(start_str) if start_str else None
+        end = datetime.fromisoformat(end_str) if end_str else None
+    except ValueError:
+        return jsonify({"error": "Invalid date format for 'start' or 'end'. Use ISO 8601 format (YYYY-MM-DDTHH:MM:SS)."}), 400
+
+    try:
+        started = time.perf_counter()
+        results = text_search.search(
+            query, kinds=kinds, limit=min(limit, MAX_LIMIT), start=start, end=end,
+            patient_id=request.args.get('patient_id', None, type=int),
+            admission_id=request.args.get('admission_id', None, type=int)
+        )
+        return jsonify({"results": results, "took_ms": round((time.perf_counter() - started) * 1000, 2),
+                        "backend": text_search.backend}), 200
+    except Exception as e:
+        print(f"Error searching clinical text: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+@search_bp.route('/search/stats', methods=['GET'])
+@login_required
+@permission_required(Permissions.VIEW_METRICS)
+def search_stats():
+    """Search backend in use and, for the in-process index, its size and build history."""
+    return jsonify(text_search.stats()), 200
@@ -1,6 +1,8 @@
 # run.py 
 import os
-from flask import Flask, jsonify
+from multiprocessing import parent_process
+from flask import Flask, flash, jsonify, redirect, request
+from flask_login import login_url
 from dotenv import load_dotenv
 from extensions import db, migrate, ma, login_manager, bcrypt # Correct single import
 from sqlalchemy import text
@@ -40,6 +42,28 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['ANALYTICS_REFRESH_SECONDS'] = int(os.environ.get('ANALYTICS_REFRESH_SECONDS', 300))
+app.config['CENSUS_REFRESH_SECONDS'] = float(os.environ.get('CENSUS_REFRESH_SECONDS', 60))
+app.config['NOTIFICATION_WORKERS'] = int(os.environ.get('NOTIFICATION_WORKERS', 0))
+app.config['BLOB_STORE_BACKEND'] = os.environ.get('BLOB_STORE_BACKEND', 'local')
+app.config['BLOB_STORE_PATH'] = os.environ.get('BLOB_STORE_PATH') or os.path.join(app.instance_path, 'blobs')
+app.config['UPLOAD_TMP_PATH'] = os.environ.get('UPLOAD_TMP_PATH') or os.path.join(app.instance_path, 'uploads')
+app.config['UPLOAD_SESSION_TTL'] = int(os.environ.get('UPLOAD_SESSION_TTL', 24 * 3600))
+app.config['MAX_UPLOAD_SIZE'] = int(os.environ.get('MAX_UPLOAD_SIZE', 4 * 1024 ** 3))
+app.config['MAX_OPEN_UPLOADS_PER_USER'] = int(os.environ.get('MAX_OPEN_UPLOADS_PER_USER', 8))
+app.config['PREVIEW_WORKERS'] = int(os.environ.get('PREVIEW_WORKERS', 0))
+app.config['TEXT_SEARCH_BACKEND'] = os.environ.get('TEXT_SEARCH_BACKEND', 'auto')
+app.config['DUPLICATE_ORDER_POLICY'] = os.environ.get('DUPLICATE_ORDER_POLICY', 'warn')
+app.config['DUPLICATE_ORDER_WINDOW_MINUTES'] = int(os.environ.get('DUPLICATE_ORDER_WINDOW_MINUTES', 60))
+app.config['READ_RECEIPT_FLUSH_SECONDS'] = float(os.environ.get('READ_RECEIPT_FLUSH_SECONDS', 5))
+app.config['USER_CACHE_TTL_SECONDS'] = float(os.environ.get('USER_CACHE_TTL_SECONDS', 30))
+app.config['USER_CACHE_MAX_ENTRIES'] = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 4096))
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))
+app.config['PASSWORD_HASH_TIMEOUT_SECONDS'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT_SECONDS', 10))
+app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY') # Falls back to SECRET_KEY
+app.config['JWT_ACCESS_TOKEN_EXPIRES'] = int(os.environ.get('JWT_ACCESS_TOKEN_EXPIRES', 900))
 
 
 # Error checking for config (Good practice!)
@@ -57,6 +81,56 @@ bcrypt.init_app(app)
 login_manager.init_app(app)
 
 
+# --- Blob Store (imaging files) ---
+from services.blob_store import blob_store
+blob_store.init_app(app)
+# Chunked upload sessions stage their chunks under UPLOAD_TMP_PATH until finalized.
+from services.imaging_uploads import upload_manager
+upload_manager.init_app(app)
+
+
+# --- Password Hashing ---
+# Hashes/verifications run in a bounded thread pool; saturated logins get 503 + Retry-After.
+from services.passwords import password_hasher
+password_hasher.init_app(app)
+
+
+# --- In-memory Services ---
+# Census of active admissions; rebuilt here and every CENSUS_REFRESH_SECONDS, kept current on Admission/Patient commits.
+from services.census import census
+census.init_app(app)
+# Reference ranges for result flagging; reloaded lazily after ReferenceRange commits.
+from services.reference_ranges import reference_ranges
+reference_ranges.init_app(app)
+# Delta-check rules for result ingest; reloaded lazily after DeltaCheckRule commits.
+from services.delta_checks import delta_rules
+delta_rules.init_app(app)
+# Report/consult note search: Postgres full-text indexes, or an in-process index kept current on commit.
+from services.text_search import text_search
+text_search.init_app(app)
+
+
+# --- Background Workers ---
+# Started only in the main process, never in pool children that re-import this module.
+is_main_process = parent_process() is None
+# Critical result notifications: outbox rows are written on commit; deliver in-process only if enabled
+# (otherwise run notify_worker.py).
+from services.notifications import notification_dispatcher
+if app.config['NOTIFICATION_WORKERS'] > 0 and is_main_process:
+    notification_dispatcher.workers = app.config['NOTIFICATION_WORKERS']
+    notification_dispatcher.start(app)
+# Imaging thumbnails/previews: decoded in a process pool; in-process only if enabled (otherwise run preview_worker.py).
+from services.previews import preview_pipeline
+if app.config['PREVIEW_WORKERS'] > 0 and is_main_process:
+    preview_pipeline.workers = app.config['PREVIEW_WORKERS']
+    preview_pipeline.start(app)
+# Consult read receipts: buffered and written in batches every few seconds (and at exit); 0 writes each one immediately.
+from services.consults import read_receipts
+if app.config['READ_RECEIPT_FLUSH_SECONDS'] > 0 and is_main_process:
+    read_receipts.flush_interval = app.config['READ_RECEIPT_FLUSH_SECONDS']
+    read_receipts.start(app)
+
+
 # --- Configure Flask-Login ---
 login_manager.login_view = 'auth.login'
 login_manager.login_message_category = 'info'
@@ -64,19 +138,49 @@ login_manager.login_message = 'Please log in to access this page.'
 
 
 # --- User Loader for Flask-Login ---
+# Identity snapshots (id, username, role, is_active) are cached per process and dropped when a User commit changes them.
+from services.identity import user_identities
+user_identities.ttl = app.config['USER_CACHE_TTL_SECONDS']
+user_identities.max_entries = app.config['USER_CACHE_MAX_ENTRIES']
+
+# Machine clients send 'Authorization: Bearer <token>' instead of a session cookie (see services.tokens).
+from services.tokens import access_tokens
+access_tokens.init_app(app)
+
 @login_manager.user_loader
 def load_user(user_id):
-    """Flask-Login hook to load a User object given the user ID stored in the session."""
+    """
+    Flask-Login hook to load the user given the user ID stored in the session.
+    Returns a cached, detached UserIdentity (not a User row), so most requests run no user query.
+    """
     # Ensure models were imported before trying to query
     if not models_imported:
          return None
     try:
-        return User.query.get(int(user_id))
+        return user_identities.get(int(user_id))
     except Exception as e:
         print(f"Error loading user {user_id}: {e}")
         return None
 
 
+@login_manager.request_loader
+def load_user_from_request(request):
+    """
+    Flask-Login hook for requests without a session user: a valid access token in the
+    Authorization header becomes a TokenIdentity built from its claims (no DB lookup).
+    """
+    return access_tokens.identity_from_header(request.headers.get('Authorization'))
+
+
+@login_manager.unauthorized_handler
+def unauthorized():
+    """Token clients get a JSON 401; browser sessions keep Flask-Login's redirect to the login view."""
+    if request.headers.get('Authorization', '').startswith('Bearer '):
+        return jsonify({"error": "Invalid, expired or revoked access token"}), 401
+    flash(login_manager.login_message, login_manager.login_message_category)
+    return redirect(login_url(login_manager.login_view, next_url=request.url))
+
+
 # --- Define Basic Routes ---
 @app.route('/')
 def index():
@@ -102,6 +206,15 @@ try:
     from routes.consults import consults_bp   # Correct import
     from routes.dashboard import dashboard_bp  # Correct import
     from routes.vitals import vitals_bp
+    from routes.census import census_bp
+    from routes.occupancy import occupancy_bp
+    from routes.analytics import analytics_bp
+    from routes.reference_ranges import reference_ranges_bp
+    from routes.acknowledgements import acknowledgements_bp
+    from routes.notifications import notifications_bp
+    from routes.delta_rules import delta_rules_bp
+    from routes.search import search_bp
+    from routes.order_sets import order_sets_bp
 
     # Register your blueprints here
     app.register_blueprint(patients_bp, url_prefix='/api')
@@ -113,6 +226,15 @@ try:
     app.register_blueprint(consults_bp, url_prefix='/api')  # Register with /api prefix
     app.register_blueprint(dashboard_bp, url_prefix='/api')
     app.register_blueprint(vitals_bp, url_prefix='/api')     
+    app.register_blueprint(census_bp, url_prefix='/api')
+    app.register_blueprint(occupancy_bp, url_prefix='/api')
+    app.register_blueprint(analytics_bp, url_prefix='/api')
+    app.register_blueprint(reference_ranges_bp, url_prefix='/api')
+    app.register_blueprint(acknowledgements_bp, url_prefix='/api')
+    app.register_blueprint(notifications_bp, url_prefix='/api')
+    app.register_blueprint(delta_rules_bp, url_prefix='/api')
+    app.register_blueprint(search_bp, url_prefix='/api')
+    app.register_blueprint(order_sets_bp, url_prefix='/api')
 
     # Update print statement to include all registered BPs
     print("Successfully registered blueprints: patients_bp, admissions_bp, auth_bp, results_bp, imaging_bp, orders_bp, consults_bp")
@@ -3,7 +3,7 @@
 
 from extensions import ma, db   # Import Marshmallow and DB instances
 # Import ALL models used in this file
-from models.models import User, Patient, Admission, Result, Imaging, Consult, Order, VitalSign
+from models.models import User, Patient, Admission, Result, Imaging, Consult, Order, OrderSet, OrderSetItem, VitalSign, ReferenceRange, DeltaCheckRule
 from marshmallow import fields  # Import fields for explicit field definition
 
 
@@ -79,12 +79,40 @@ results_schema = ResultSchema(many=True)
 
 
 
+class ReferenceRangeSchema(ma.SQLAlchemyAutoSchema):
+    class Meta:
+        model = ReferenceRange  # Link to the ReferenceRange model
+        load_instance = True
+        sqla_session = db.session
+
+
+# Create instances used in routes
+reference_range_schema = ReferenceRangeSchema()
+reference_ranges_schema = ReferenceRangeSchema(many=True)
+
+
+class DeltaCheckRuleSchema(ma.SQLAlchemyAutoSchema):
+    class Meta:
+        model = DeltaCheckRule  # Link to the DeltaCheckRule model
+        load_instance = True
+        sqla_session = db.session
+
+
+delta_check_rule_schema = DeltaCheckRuleSchema()
+delta_check_rules_schema = DeltaCheckRuleSchema(many=True)
+
+
+
+
 class ImagingSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = Imaging         # Link to the Imaging model
         load_instance = True
         sqla_session = db.session
         include_fk = True       # Includes patient_id
+        exclude = ('image_file',)  # Bytes live in the blob store; fetch via /api/imaging/<id>/file
+        dump_only = ('blob_digest', 'blob_size', 'content_type',  # Set by the server when a file is stored
+                     'preview_status', 'thumbnail_digest', 'preview_digest', 'width', 'height', 'frame_count')
 
 
 # Create instances used in routes
@@ -115,11 +143,37 @@ class OrderSchema(ma.SQLAlchemyAutoSchema):
         load_instance = True
         sqla_session = db.session
         include_fk = True       # Includes patient_id, responsible_attending_id
+        dump_only = ('signature', 'signed_at', 'signed_by_id')  # Computed on save / set only by POST /orders/sign
 
 
 # Create instances used in routes
 order_schema = OrderSchema()
 orders_schema = OrderSchema(many=True)
+# Batch creation validates plain dicts (no instances) so all rows can go out in one INSERT
+order_batch_item_schema = OrderSchema(load_instance=False, exclude=('id', 'admission_id'))
+
+
+class OrderSetItemSchema(ma.SQLAlchemyAutoSchema):
+    class Meta:
+        model = OrderSetItem
+        load_instance = True
+        sqla_session = db.session
+        exclude = ('id', 'position')  # Position follows list order
+
+
+class OrderSetSchema(ma.SQLAlchemyAutoSchema):
+    class Meta:
+        model = OrderSet
+        load_instance = True
+        sqla_session = db.session
+        include_fk = True
+        dump_only = ('created_by_id', 'created_at')
+
+    items = ma.Nested(OrderSetItemSchema, many=True, required=True)
+
+
+order_set_schema = OrderSetSchema()
+order_sets_schema = OrderSetSchema(many=True)
 
 
 class VitalSignSchema(ma.SQLAlchemyAutoSchema):
@@ -0,0 +1,42 @@
+# services/acknowledgements.py
+
+from datetime import datetime
+from sqlalchemy import select, update
+from extensions import db
+from models.models import Imaging, Result
+from services.model_events import mark_touched
+
+ACKNOWLEDGEABLE = {
+    'results': Result,
+    'imaging': Imaging
+}
+
+
+def acknowledge(model, ids, user_id, now=None):
+    """
+    Stamp acknowledged_at/acknowledged_by_id on every still-unacknowledged row in 'ids'
+    with one set-based UPDATE. Returns the ids that changed; the caller commits.
+    """
+    if not ids:
+        return []
+    now = now or datetime.utcnow()
+    stmt = update(model)\
+        .where(model.id.in_(ids), model.acknowledged_at.is_(None))\
+        .values(acknowledged_at=now, acknowledged_by_id=user_id)\
+        .execution_options(synchronize_session=False, track_touched=False)
+
+    if db.engine.dialect.update_returning:
+        rows = db.session.execute(stmt.returning(model.id, model.admission_id)).all()
+    else:
+        # No UPDATE ... RETURNING: lock the candidate rows first, then update exactly those.
+        rows = db.session.execute(
+            select(model.id, model.admission_id)
+            .where(model.id.in_(ids), model.acknowledged_at.is_(None))
+            .with_for_update()
+        ).all()
+        if rows:
+            db.session.execute(stmt.where(model.id.in_([r[0] for r in rows])))
+
+    # Report scope explicitly so caches invalidate per admission, once per commit.
+    mark_touched(db.session, model, {admission_id for _, admission_id in rows})
+    return sorted(r[0] for r in rows)
@@ -0,0 +1,59 @@
+# services/admission_detail.py
+
+from sqlalchemy import select, func
+from extensions import db
+from models.models import Result, Order, Consult, Imaging, VitalSign
+from services.serializers import projected_columns, compile_row_serializer
+
+
+class ChildCollection:
+    """A child table of Admission that can be fetched top-N per admission."""
+    __slots__ = ('model', 'order_column', 'columns', 'serialize')
+
+    def __init__(self, model, order_column):
+        self.model = model
+        self.order_column = order_column
+        # Binary columns (Imaging.image_file) are never part of the projection.
+        self.columns = projected_columns(model)
+        self.serialize = compile_row_serializer(self.columns)
+
+
+CHILD_COLLECTIONS = {
+    'results': ChildCollection(Result, Result.result_date),
+    'orders': ChildCollection(Order, Order.order_date),
+    'consults': ChildCollection(Consult, Consult.consult_date),
+    'imaging': ChildCollection(Imaging, Imaging.image_date),
+    'vitals': ChildCollection(VitalSign, VitalSign.timestamp)
+}
+
+
+def fetch_top_n(collection, admission_ids, limit):
+    """
+    Most recent 'limit' rows per admission for one child collection, in a single windowed query.
+    Returns {admission_id: {"items": [...], "total": n}}.
+    """
+    model = collection.model
+    partition = model.admission_id
+    ranked = select(
+        *collection.columns,
+        func.row_number().over(
+            partition_by=partition,
+            order_by=(collection.order_column.desc(), model.id.desc())
+        ).label('rn'),
+        func.count().over(partition_by=partition).label('total')
+    ).where(model.admission_id.in_(admission_ids)).subquery()
+
+    stmt = select(ranked).where(ranked.c.rn <= limit).order_by(ranked.c.admission_id, ranked.c.rn)
+
+    out = {adm_id: {"items": [], "total": 0} for adm_id in admission_ids}
+    serialize = collection.serialize
+    for row in db.session.execute(stmt):
+        bucket = out[row.admission_id]
+        bucket["items"].append(serialize(row))
+        bucket["total"] = row.total
+    return out
+
+
+def fetch_includes(admission_ids, includes, limit):
+    """Run fetch_top_n for each requested collection: one query per collection, not per admission."""
+    return {name: fetch_top_n(CHILD_COLLECTIONS[name], admission_ids, limit) for name in includes}
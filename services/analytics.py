@@ -0,0 +1,298 @@
+# services/analytics.py
+
+import threading
+import time
+from datetime import datetime, timezone
+import numpy as np
+from sqlalchemy import select
+from extensions import db
+from models.models import Admission, Order, OrderTransition, Patient
+from services.census import unit_from_location
+
+SECONDS_PER_HOUR = 3600.0
+SECONDS_PER_WEEK = 7 * 24 * 3600
+MONDAY_OFFSET = 3 * 24 * 3600 # Unix epoch is a Thursday; shift so weeks start on Monday
+LOS_PERCENTILES = (25, 50, 75, 90, 95)
+LOS_BIN_EDGES_HOURS = (0, 24, 48, 72, 96, 120, 168, 336, 720, np.inf)
+GROUP_BY_OPTIONS = ('unit', 'attending', 'week')
+TIME_IN_STATE_PERCENTILES = (50, 90)
+
+
+class AdmissionArrays:
+    """Column arrays for a set of admissions. Times are epoch seconds; open stays have NaN discharge."""
+    __slots__ = ('admit', 'discharge', 'unit_codes', 'unit_labels', 'attending')
+
+    def __init__(self, admit, discharge, unit_codes, unit_labels, attending):
+        self.admit = admit
+        self.discharge = discharge
+        self.unit_codes = unit_codes
+        self.unit_labels = unit_labels
+        self.attending = attending
+
+    def __len__(self):
+        return len(self.admit)
+
+
+def _epoch_seconds(values):
+    """datetime/None list -> float64 epoch seconds with NaN for None (naive datetimes are UTC)."""
+    stamps = np.array(values, dtype='datetime64[us]')
+    out = stamps.astype(np.int64).astype(np.float64) / 1e6
+    out[np.isnat(stamps)] = np.nan
+    return out
+
+
+def load_admission_arrays(start=None, end=None, chunk_size=5000):
+    """
+    Stream (admission_date, discharge_date, location_bed, attending_id) in chunks into NumPy arrays.
+    Only these four columns are selected; rows are never materialized as ORM objects.
+    """
+    stmt = select(Admission.admission_date, Admission.discharge_date,
+                  Patient.location_bed, Patient.attending_id)\
+        .join(Patient, Admission.patient_id == Patient.id)
+    if start:
+        stmt = stmt.where(Admission.admission_date >= start)
+    if end:
+        stmt = stmt.where(Admission.admission_date < end)
+
+    admit_parts, discharge_parts, unit_parts, attending_parts = [], [], [], []
+    result = db.session.execute(stmt.execution_options(yield_per=chunk_size))
+    for chunk in result.partitions():
+        adm, dis, loc, att = zip(*chunk)
+        admit_parts.append(_epoch_seconds(adm))
+        discharge_parts.append(_epoch_seconds(dis))
+        unit_parts.extend(unit_from_location(l) or 'UNASSIGNED' for l in loc)
+        attending_parts.append(np.array([a if a is not None else -1 for a in att], dtype=np.int64))
+
+    if not admit_parts:
+        empty = np.empty(0, dtype=np.float64)
+        return AdmissionArrays(empty, empty, np.empty(0, dtype=np.int64), [], np.empty(0, dtype=np.int64))
+
+    unit_labels, unit_codes = np.unique(np.array(unit_parts, dtype=object), return_inverse=True)
+    return AdmissionArrays(
+        np.concatenate(admit_parts), np.concatenate(discharge_parts),
+        unit_codes.astype(np.int64), [str(u) for u in unit_labels],
+        np.concatenate(attending_parts)
+    )
+
+
+# --- Vectorized grouped statistics ---
+def grouped_percentiles(keys, values, percentiles=LOS_PERCENTILES):
+    """
+    Per-group percentiles with linear interpolation (same as np.percentile's default),
+    computed for all groups at once from one lexsort instead of a Python loop per group.
+    Returns (group_keys, counts, means, matrix[group, percentile]).
+    """
+    if len(values) == 0:
+        return np.empty(0, dtype=keys.dtype), np.empty(0, dtype=np.int64), np.empty(0), np.empty((0, len(percentiles)))
+    order = np.lexsort((values, keys))
+    k, v = keys[order], values[order]
+    group_keys, starts, counts = np.unique(k, return_index=True, return_counts=True)
+    pos = starts[:, None] + (np.asarray(percentiles, dtype=np.float64) / 100.0)[None, :] * (counts[:, None] - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.ceil(pos).astype(np.int64)
+    matrix = v[lo] + (v[hi] - v[lo]) * (pos - lo)
+    sums = np.add.reduceat(v, starts)
+    return group_keys, counts, sums / counts, matrix
+
+
+def grouped_histogram(keys, values, edges=LOS_BIN_EDGES_HOURS):
+    """Per-group histogram counts as one bincount over (group, bin) pairs."""
+    group_keys, group_idx = np.unique(keys, return_inverse=True)
+    nbins = len(edges) - 1
+    bins = np.clip(np.searchsorted(np.asarray(edges), values, side='right') - 1, 0, nbins - 1)
+    flat = np.bincount(group_idx * nbins + bins, minlength=len(group_keys) * nbins)
+    return group_keys, flat.reshape(len(group_keys), nbins)
+
+
+def week_index(epoch_seconds):
+    return np.floor((epoch_seconds + MONDAY_OFFSET) / SECONDS_PER_WEEK).astype(np.int64)
+
+
+def week_start_iso(week):
+    return datetime.fromtimestamp(int(week) * SECONDS_PER_WEEK - MONDAY_OFFSET, tz=timezone.utc).date().isoformat()
+
+
+def weekly_throughput(keys, admit, discharge):
+    """Admissions and discharges per (group, week) as dense matrices over the covered week range."""
+    adm_weeks = week_index(admit)
+    discharged = ~np.isnan(discharge)
+    dis_weeks = week_index(discharge[discharged])
+    if len(adm_weeks) == 0:
+        return np.empty(0, dtype=keys.dtype), np.empty(0, dtype=np.int64), np.empty((0, 0)), np.empty((0, 0))
+    first = adm_weeks.min()
+    last = max(adm_weeks.max(), dis_weeks.max() if len(dis_weeks) else first)
+    nweeks = int(last - first + 1)
+    group_keys, group_idx = np.unique(keys, return_inverse=True)
+    ngroups = len(group_keys)
+    admissions = np.bincount(group_idx * nweeks + (adm_weeks - first),
+                             minlength=ngroups * nweeks).reshape(ngroups, nweeks)
+    discharges = np.bincount(group_idx[discharged] * nweeks + (dis_weeks - first),
+                             minlength=ngroups * nweeks).reshape(ngroups, nweeks)
+    return group_keys, np.arange(first, last + 1), admissions, discharges
+
+
+def compute_admission_analytics(arrays, group_by='unit'):
+    """LOS percentiles/histograms and weekly throughput for the chosen grouping."""
+    if group_by == 'unit':
+        keys = arrays.unit_codes
+        label = lambda k: arrays.unit_labels[k]
+    elif group_by == 'attending':
+        keys = arrays.attending
+        label = lambda k: None if k < 0 else int(k)
+    else: # 'week' of admission
+        keys = week_index(arrays.admit)
+        label = week_start_iso
+
+    discharged = ~np.isnan(arrays.discharge)
+    los_hours = (arrays.discharge[discharged] - arrays.admit[discharged]) / SECONDS_PER_HOUR
+    los_keys = keys[discharged]
+
+    group_keys, counts, means, pct = grouped_percentiles(los_keys, los_hours)
+    _, hist = grouped_histogram(los_keys, los_hours)
+    los_groups = []
+    for i, key in enumerate(group_keys):
+        los_groups.append({
+            "key": label(key),
+            "count": int(counts[i]),
+            "mean_hours": round(float(means[i]), 2),
+            "percentiles_hours": {f"p{p}": round(float(pct[i, j]), 2) for j, p in enumerate(LOS_PERCENTILES)},
+            "histogram": hist[i].tolist()
+        })
+
+    tp_keys, weeks, admissions, discharges = weekly_throughput(
+        keys if group_by != 'week' else np.zeros(len(keys), dtype=np.int64),
+        arrays.admit, arrays.discharge
+    )
+    throughput = [
+        {
+            "key": label(key) if group_by != 'week' else "all",
+            "admissions": admissions[i].tolist(),
+            "discharges": discharges[i].tolist()
+        }
+        for i, key in enumerate(tp_keys)
+    ]
+
+    return {
+        "group_by": group_by,
+        "total_admissions": int(len(arrays)),
+        "discharged": int(discharged.sum()),
+        "length_of_stay": {
+            "bin_edges_hours": [e if np.isfinite(e) else None for e in LOS_BIN_EDGES_HOURS],
+            "groups": los_groups
+        },
+        "throughput": {
+            "weeks": [week_start_iso(w) for w in weeks],
+            "groups": throughput
+        }
+    }
+
+
+# --- Order time-in-state (from the order_transition log) ---
+def load_transition_arrays(start=None, end=None, chunk_size=5000):
+    """
+    Stream the transition log, ordered by (order_id, at), into arrays:
+    (order_ids, states, entered_at, order_types, units). Only transitions entered at/after
+    'start' are read (the indexed 'at' column); 'end' bounds entry times and is applied after
+    exits are matched, so a state entered before 'end' still gets its exit.
+    The unit is the patient's current location.
+    """
+    stmt = select(OrderTransition.order_id, OrderTransition.to_status, OrderTransition.at,
+                  Order.order_type, Patient.location_bed)\
+        .join(Order, OrderTransition.order_id == Order.id)\
+        .join(Admission, Order.admission_id == Admission.id)\
+        .join(Patient, Admission.patient_id == Patient.id)\
+        .order_by(OrderTransition.order_id, OrderTransition.at, OrderTransition.id)
+    if start:
+        stmt = stmt.where(OrderTransition.at >= start)
+
+    ids, states, at, types, units = [], [], [], [], []
+    result = db.session.execute(stmt.execution_options(yield_per=chunk_size))
+    for chunk in result.partitions():
+        i, s, a, t, loc = zip(*chunk)
+        ids.append(np.array(i, dtype=np.int64))
+        at.append(_epoch_seconds(a))
+        states.extend(s)
+        types.extend(t)
+        units.extend(unit_from_location(l) or 'UNASSIGNED' for l in loc)
+    if not ids:
+        return (np.empty(0, dtype=np.int64), np.empty(0, dtype=object), np.empty(0),
+                np.empty(0, dtype=object), np.empty(0, dtype=object))
+    return (np.concatenate(ids), np.array(states, dtype=object), np.concatenate(at),
+            np.array(types, dtype=object), np.array(units, dtype=object))
+
+
+def compute_time_in_state(order_ids, states, entered_at, order_types, units, end=None):
+    """
+    Hours spent in each state, per (order type, unit, state): a state's duration is the gap
+    to the same order's next transition. States not yet left are counted as 'open' only.
+    Durations are grouped and summarized in one pass with grouped_percentiles.
+    """
+    n = len(order_ids)
+    exited_at = np.full(n, np.nan)
+    if n > 1:
+        same_order = order_ids[1:] == order_ids[:-1]
+        exited_at[:-1][same_order] = entered_at[1:][same_order]
+    in_window = np.ones(n, dtype=bool) if end is None else entered_at < _epoch_seconds([end])[0]
+    closed = in_window & ~np.isnan(exited_at)
+
+    type_labels, type_codes = np.unique(order_types, return_inverse=True)
+    unit_labels, unit_codes = np.unique(units, return_inverse=True)
+    state_labels, state_codes = np.unique(states, return_inverse=True)
+    n_units, n_states = len(unit_labels), len(state_labels)
+    keys = (type_codes.astype(np.int64) * n_units + unit_codes) * n_states + state_codes
+
+    hours = (exited_at[closed] - entered_at[closed]) / SECONDS_PER_HOUR
+    group_keys, counts, means, pct = grouped_percentiles(keys[closed], hours, TIME_IN_STATE_PERCENTILES)
+    open_keys, open_counts = np.unique(keys[in_window & np.isnan(exited_at)], return_counts=True)
+    open_by_key = dict(zip(open_keys.tolist(), open_counts.tolist()))
+
+    groups = []
+    for i, key in enumerate(group_keys):
+        key = int(key)
+        groups.append({
+            "order_type": str(type_labels[key // (n_units * n_states)]),
+            "unit": str(unit_labels[(key // n_states) % n_units]),
+            "state": str(state_labels[key % n_states]),
+            "count": int(counts[i]),
+            "open": open_by_key.get(key, 0),
+            "mean_hours": round(float(means[i]), 2),
+            "percentiles_hours": {f"p{p}": round(float(pct[i, j]), 2) for j, p in enumerate(TIME_IN_STATE_PERCENTILES)}
+        })
+    return {"transitions": int(n), "completed_stays": int(closed.sum()), "groups": groups}
+
+
+# --- Cached access ---
+_cache = {}
+_cache_lock = threading.Lock()
+_CACHE_MAX_ENTRIES = 64
+
+
+def get_admission_analytics(group_by='unit', start=None, end=None, max_age=300, refresh=False):
+    """Return cached analytics for (group_by, start, end), recomputing when older than max_age seconds."""
+    key = (group_by, start, end)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and not refresh and time.monotonic() - cached[0] < max_age:
+            return cached[1]
+        # Compute under the lock so concurrent requests for a stale entry don't all hit the database.
+        payload = compute_admission_analytics(load_admission_arrays(start, end), group_by=group_by)
+        payload["generated_at"] = datetime.utcnow().isoformat()
+        if len(_cache) >= _CACHE_MAX_ENTRIES:
+            _cache.pop(min(_cache, key=lambda k: _cache[k][0]))
+        _cache[key] = (time.monotonic(), payload)
+        return payload
+
+
+def get_order_time_in_state(start=None, end=None, max_age=300, refresh=False):
+    """Cached compute_time_in_state for (start, end); shares the analytics cache and its TTL."""
+    key = ('order_time_in_state', start, end)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and not refresh and time.monotonic() - cached[0] < max_age:
+            return cached[1]
+        payload = compute_time_in_state(*load_transition_arrays(start, end), end=end)
+        payload["generated_at"] = datetime.utcnow().isoformat()
+        if len(_cache) >= _CACHE_MAX_ENTRIES:
+            _cache.pop(min(_cache, key=lambda k: _cache[k][0]))
+        _cache[key] = (time.monotonic(), payload)
+        return payload
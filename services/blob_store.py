@@ -0,0 +1,220 @@
+# services/blob_store.py
+
+import abc
+import hashlib
+import io
+import os
+import tempfile
+import time
+
+CHUNK_SIZE = 1024 * 1024 # 1 MiB read/write unit for streaming copies
+DEFAULT_CONTENT_TYPE = 'application/octet-stream'
+
+
+class BlobNotFound(Exception):
+    """No blob is stored under the requested digest."""
+
+
+def sniff_content_type(head):
+    """Best-effort MIME type from the first bytes of an image file (needs >= 132 bytes for DICOM)."""
+    if len(head) >= 132 and head[128:132] == b'DICM':
+        return 'application/dicom'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith((b'II*\x00', b'MM\x00*')):
+        return 'image/tiff'
+    if head.startswith(b'%PDF'):
+        return 'application/pdf'
+    return DEFAULT_CONTENT_TYPE
+
+
+class StoredBlob:
+    """Result of a put: the content address plus what the caller records on its row."""
+    __slots__ = ('digest', 'size', 'content_type', 'created')
+
+    def __init__(self, digest, size, content_type, created):
+        self.digest = digest
+        self.size = size
+        self.content_type = content_type
+        self.created = created # False when identical content was already stored (deduplicated)
+
+
+class BlobStore(abc.ABC):
+    """
+    Content-addressed object storage interface. Objects are immutable and keyed by
+    the lowercase hex SHA-256 of their bytes, so identical uploads share one object.
+    """
+
+    @abc.abstractmethod
+    def put_stream(self, stream, content_type=None):
+        """Store everything read from a binary stream. Returns a StoredBlob."""
+
+    def put_bytes(self, data, content_type=None):
+        return self.put_stream(io.BytesIO(data), content_type)
+
+    @abc.abstractmethod
+    def open(self, digest):
+        """Binary file object positioned at the start of the blob. Raises BlobNotFound."""
+
+    @abc.abstractmethod
+    def size(self, digest):
+        """Size in bytes. Raises BlobNotFound."""
+
+    @abc.abstractmethod
+    def exists(self, digest):
+        """True if a blob is stored under 'digest'."""
+
+    @abc.abstractmethod
+    def delete(self, digest):
+        """Remove a blob; a missing one is not an error."""
+
+    @abc.abstractmethod
+    def iter_blobs(self):
+        """Yield (digest, stored_at) for every blob, stored_at in epoch seconds (for garbage collection)."""
+
+    def purge_incomplete(self, older_than):
+        """Remove partial writes abandoned more than 'older_than' seconds ago. Returns how many."""
+        return 0
+
+    def local_path(self, digest):
+        """Filesystem path of the blob if it lives on local disk (enables sendfile/mmap), else None."""
+        return None
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Blobs under root/ab/cd/<digest>. Writes stream into root/tmp while hashing, then
+    os.replace into place, so readers never see a partial object and a crash leaves
+    only a temp file behind.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.tmp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['BLOB_STORE_PATH'])
+
+    def _path(self, digest):
+        if len(digest) != 64 or not all(c in '0123456789abcdef' for c in digest):
+            raise BlobNotFound(digest)
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def new_temp_file(self):
+        """Open a temp file inside the store (same filesystem, so commit_file is a rename)."""
+        return tempfile.NamedTemporaryFile(dir=self.tmp_dir, delete=False)
+
+    def commit_file(self, temp_path, digest, size, content_type):
+        """Move a fully written temp file into place under its digest."""
+        path = self._path(digest)
+        if os.path.exists(path):
+            os.unlink(temp_path)
+            os.utime(path) # Fresh again: garbage collection spares it until the new reference commits
+            return StoredBlob(digest, size, content_type, created=False)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        return StoredBlob(digest, size, content_type, created=True)
+
+    def put_stream(self, stream, content_type=None):
+        sha = hashlib.sha256()
+        size = 0
+        head = b''
+        tmp = self.new_temp_file()
+        try:
+            with tmp:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if len(head) < 132:
+                        head += chunk[:132 - len(head)]
+                    sha.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            return self.commit_file(tmp.name, sha.hexdigest(), size, content_type or sniff_content_type(head))
+        except BaseException:
+            if os.path.exists(tmp.name):
+                os.unlink(tmp.name)
+            raise
+
+    def open(self, digest):
+        try:
+            return open(self._path(digest), 'rb')
+        except FileNotFoundError:
+            raise BlobNotFound(digest)
+
+    def size(self, digest):
+        try:
+            return os.path.getsize(self._path(digest))
+        except FileNotFoundError:
+            raise BlobNotFound(digest)
+
+    def exists(self, digest):
+        try:
+            return os.path.exists(self._path(digest))
+        except BlobNotFound:
+            return False
+
+    def delete(self, digest):
+        try:
+            os.unlink(self._path(digest))
+        except FileNotFoundError:
+            pass
+
+    def iter_blobs(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if dirpath == self.root:
+                dirnames[:] = [d for d in dirnames if d != 'tmp']
+            for name in filenames:
+                if len(name) == 64:
+                    try:
+                        yield name, os.path.getmtime(os.path.join(dirpath, name))
+                    except FileNotFoundError: # Deleted while walking
+                        continue
+
+    def purge_incomplete(self, older_than):
+        cutoff, removed = time.time() - older_than, 0
+        for entry in os.scandir(self.tmp_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+    def local_path(self, digest):
+        return self._path(digest)
+
+
+BACKENDS = {
+    'local': LocalBlobStore
+}
+
+
+class BlobStoreExtension:
+    """App-configured blob store: BLOB_STORE_BACKEND picks the backend from BACKENDS; calls are delegated to it."""
+
+    def __init__(self):
+        self.backend = None
+
+    def init_app(self, app):
+        name = app.config.get('BLOB_STORE_BACKEND', 'local')
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown BLOB_STORE_BACKEND '{name}'. Options: {', '.join(BACKENDS)}")
+        self.backend = BACKENDS[name].from_config(app.config)
+        app.extensions['blob_store'] = self
+
+    def __getattr__(self, name):
+        if self.backend is None:
+            raise RuntimeError("Blob store is not configured; call blob_store.init_app(app)")
+        return getattr(self.backend, name)
+
+
+blob_store = BlobStoreExtension()
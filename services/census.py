@@ -0,0 +1,256 @@
+# services/census.py
+
+import threading
+import time
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from extensions import db
+from models.models import Admission, Patient
+from services.model_events import committed_changes, discard_changes, transaction_changes
+
+CHANGES_KEY = 'census_changes'
+
+
+def unit_from_location(location_bed):
+    """Derive the unit key from a 'UNIT-BED' style location string (e.g. 'ICU-12' -> 'ICU')."""
+    if not location_bed:
+        return None
+    unit = location_bed.strip().replace(' ', '-').split('-', 1)[0]
+    return unit.upper() or None
+
+
+class CensusEntry:
+    """One active admission. Slots keep each entry to a handful of pointers."""
+    __slots__ = ('admission_id', 'patient_id', 'admission_date', 'unit', 'attending_id')
+
+    def __init__(self, admission_id, patient_id, admission_date, unit, attending_id):
+        self.admission_id = admission_id
+        self.patient_id = patient_id
+        self.admission_date = admission_date
+        self.unit = unit
+        self.attending_id = attending_id
+
+    def to_dict(self):
+        return {
+            "admission_id": self.admission_id,
+            "patient_id": self.patient_id,
+            "admission_date": self.admission_date.isoformat() if self.admission_date else None,
+            "unit": self.unit,
+            "attending_id": self.attending_id
+        }
+
+
+class Census:
+    """
+    In-process index of active admissions (discharge_date IS NULL).
+
+    Rebuilt from one projected query at startup and kept current by applying
+    committed Admission/Patient changes from SQLAlchemy session events, so
+    routes can answer "who is in the hospital" without joining admission.
+    A bulk UPDATE/DELETE of either model marks the index for a rebuild, and it is
+    rebuilt every refresh_interval seconds regardless, which bounds how long
+    admissions committed by other processes (web workers, ingest_hl7.py) are missing.
+    """
+
+    def __init__(self, refresh_interval=60.0):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._loaded_at = 0.0
+        self.rebuilds = 0
+        self._by_admission = {}   # admission_id -> CensusEntry
+        self._by_patient = {}     # patient_id -> set(admission_id)
+        self._by_unit = {}        # unit -> set(admission_id)
+        self._by_attending = {}   # attending_id -> set(admission_id)
+
+    # --- Setup ---
+    def init_app(self, app):
+        self.refresh_interval = app.config.get('CENSUS_REFRESH_SECONDS', self.refresh_interval)
+        event.listen(Session, 'after_flush', _collect_changes)
+        event.listen(Session, 'do_orm_execute', _collect_bulk)
+        event.listen(Session, 'after_commit', self._apply_changes)
+        event.listen(Session, 'after_soft_rollback', _discard_changes)
+        app.extensions['census'] = self
+        with app.app_context():
+            try:
+                self.rebuild()
+                print(f"Census loaded: {len(self._by_admission)} active admissions.")
+            except Exception as e:
+                # Tables may not exist yet (e.g. before 'flask db upgrade'); load lazily on first use.
+                db.session.rollback()
+                print(f"WARNING: Could not build census at startup. Error: {e}")
+
+    def rebuild(self):
+        """Reload the active admission set from the database."""
+        stmt = select(
+            Admission.id, Admission.patient_id, Admission.admission_date,
+            Patient.location_bed, Patient.attending_id
+        ).join(Patient, Admission.patient_id == Patient.id)\
+         .where(Admission.discharge_date.is_(None))
+        rows = db.session.execute(stmt).all()
+        with self._lock:
+            self._by_admission.clear()
+            self._by_patient.clear()
+            self._by_unit.clear()
+            self._by_attending.clear()
+            for adm_id, patient_id, adm_date, location_bed, attending_id in rows:
+                self._add(CensusEntry(adm_id, patient_id, adm_date,
+                                      unit_from_location(location_bed), attending_id))
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+            self.rebuilds += 1
+
+    def _ensure_loaded(self):
+        if not self._loaded or (self.refresh_interval > 0
+                                and time.monotonic() - self._loaded_at > self.refresh_interval):
+            self.rebuild()
+
+    # --- Index maintenance (caller holds the lock) ---
+    def _add(self, entry):
+        self._by_admission[entry.admission_id] = entry
+        self._by_patient.setdefault(entry.patient_id, set()).add(entry.admission_id)
+        if entry.unit is not None:
+            self._by_unit.setdefault(entry.unit, set()).add(entry.admission_id)
+        if entry.attending_id is not None:
+            self._by_attending.setdefault(entry.attending_id, set()).add(entry.admission_id)
+
+    def _remove(self, admission_id):
+        entry = self._by_admission.pop(admission_id, None)
+        if entry is None:
+            return None
+        for index, key in ((self._by_patient, entry.patient_id),
+                           (self._by_unit, entry.unit),
+                           (self._by_attending, entry.attending_id)):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(admission_id)
+                if not ids:
+                    del index[key]
+        return entry
+
+    def _apply_changes(self, session):
+        records = committed_changes(session, CHANGES_KEY)
+        if not records or not self._loaded:
+            return
+        with self._lock:
+            for admissions, patients, bulk in records:
+                if bulk:
+                    # Rows changed by a bulk statement are unknown; reload on next use
+                    self._loaded = False
+                    return
+                for adm_id, (deleted, active, patient_id, adm_date, location_bed, attending_id) in admissions.items():
+                    self._remove(adm_id)
+                    if not deleted and active:
+                        self._add(CensusEntry(adm_id, patient_id, adm_date,
+                                              unit_from_location(location_bed), attending_id))
+                for patient_id, (location_bed, attending_id) in patients.items():
+                    unit = unit_from_location(location_bed)
+                    for adm_id in list(self._by_patient.get(patient_id, ())):
+                        entry = self._remove(adm_id)
+                        entry.unit = unit
+                        entry.attending_id = attending_id
+                        self._add(entry)
+
+    # --- Lookups ---
+    def active_admission_ids(self):
+        with self._lock:
+            self._ensure_loaded()
+            return set(self._by_admission)
+
+    def active_patient_ids(self):
+        with self._lock:
+            self._ensure_loaded()
+            return set(self._by_patient)
+
+    def is_active(self, admission_id):
+        with self._lock:
+            self._ensure_loaded()
+            return admission_id in self._by_admission
+
+    def active_admission_for_patient(self, patient_id):
+        """Most recent active admission for a patient, or None."""
+        with self._lock:
+            self._ensure_loaded()
+            ids = self._by_patient.get(patient_id)
+            if not ids:
+                return None
+            return max(ids, key=lambda i: (self._by_admission[i].admission_date, i))
+
+    def admission_patient(self, admission_id):
+        """Patient of an active admission, or None if the admission is not active."""
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._by_admission.get(admission_id)
+            return entry.patient_id if entry else None
+
+    def entries(self, unit=None, attending_id=None):
+        """Active census entries, optionally narrowed by unit and/or attending."""
+        with self._lock:
+            self._ensure_loaded()
+            if unit is None and attending_id is None:
+                ids = self._by_admission.keys()
+            else:
+                ids = None
+                if unit is not None:
+                    ids = self._by_unit.get(unit.upper(), set())
+                if attending_id is not None:
+                    by_att = self._by_attending.get(attending_id, set())
+                    ids = by_att if ids is None else ids & by_att
+            return [self._by_admission[i] for i in ids]
+
+    def patient_ids(self, unit=None, attending_id=None):
+        return {e.patient_id for e in self.entries(unit=unit, attending_id=attending_id)}
+
+    def counts_by_unit(self):
+        with self._lock:
+            self._ensure_loaded()
+            return {unit: len(ids) for unit, ids in self._by_unit.items()}
+
+    def counts_by_attending(self):
+        with self._lock:
+            self._ensure_loaded()
+            return {att: len(ids) for att, ids in self._by_attending.items()}
+
+    def __len__(self):
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._by_admission)
+
+
+# --- Session event hooks ---
+def _collect_changes(session, flush_context):
+    """Snapshot Admission/Patient state touched by this flush; applied only after commit."""
+    admissions, patients, bulk = transaction_changes(session, CHANGES_KEY, _new_changes)
+    for obj in session.new | session.dirty:
+        if isinstance(obj, Admission) and obj.id is not None:
+            patient = session.get(Patient, obj.patient_id) if obj.patient_id else None
+            admissions[obj.id] = (
+                False, obj.discharge_date is None, obj.patient_id, obj.admission_date,
+                patient.location_bed if patient else None,
+                patient.attending_id if patient else None
+            )
+        elif isinstance(obj, Patient) and obj.id is not None:
+            patients[obj.id] = (obj.location_bed, obj.attending_id)
+    for obj in session.deleted:
+        if isinstance(obj, Admission):
+            admissions[obj.id] = (True, False, obj.patient_id, None, None, None)
+
+
+def _collect_bulk(orm_execute_state):
+    """Bulk INSERT/UPDATE/DELETE of Admission or Patient bypasses the flush; rebuild after commit."""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (Admission, Patient):
+        transaction_changes(orm_execute_state.session, CHANGES_KEY, _new_changes)[2] = True
+
+
+def _new_changes():
+    return [{}, {}, False] # admissions, patients, bulk statement seen
+
+
+def _discard_changes(session, previous_transaction):
+    discard_changes(session, CHANGES_KEY, previous_transaction)
+
+
+census = Census()
@@ -0,0 +1,209 @@
+# services/consults.py
+
+import atexit
+import threading
+from datetime import datetime
+from sqlalchemy import bindparam, func, or_, select, tuple_
+from extensions import db
+from models.models import Admission, Consult, Patient
+from services.orders import encode_cursor
+
+
+class ReadReceiptBuffer:
+    """
+    Consult read receipts (Consult.read_at), held in memory and written in batches.
+
+    Opening a consult records the first read time here instead of issuing its own
+    UPDATE; a flush writes every buffered receipt with one executemany UPDATE that
+    never overwrites an existing read_at. Readers (inbox, dashboard indicator) treat
+    a buffered receipt as read, including while its flush is in progress, so they
+    agree with each other before and after the write. Receipts are flushed every
+    flush_interval seconds by a background thread and on shutdown; when the thread
+    is not running, mark_read returns only once its receipt is written (waiting out
+    a flush already in progress on another thread).
+    The buffer is per process: other web workers see a receipt once it is flushed.
+    """
+
+    def __init__(self, flush_interval=5.0):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flushed = threading.Condition(self._lock) # Notified whenever a flush ends
+        self._pending = {} # consult_id -> read_at (first read wins)
+        self._flushing = {} # Batch being written; still counts as read until committed
+        self._thread = None
+        self._stopping = threading.Event()
+        self.buffered = 0
+        self.repeated = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    def mark_read(self, consult_id, now=None):
+        """Record that the assigned physician opened 'consult_id'. Returns the read time that will be stored."""
+        now = now or datetime.utcnow()
+        with self._lock:
+            read_at = self._flushing.get(consult_id) or self._pending.get(consult_id)
+            if read_at is None:
+                read_at = self._pending[consult_id] = now
+                self.buffered += 1
+            else:
+                self.repeated += 1
+        if self._thread is None:
+            self._write_now(consult_id)
+        return read_at
+
+    def _write_now(self, consult_id):
+        # flush() returns 0 while another flush is running: wait for that one to end, then try
+        # again until this receipt is neither buffered nor in flight (a failed flush re-buffers it)
+        while True:
+            self.flush()
+            with self._lock:
+                if consult_id not in self._pending and consult_id not in self._flushing:
+                    return
+                if self._flushing:
+                    self._flushed.wait()
+
+    def read_at(self, consult_id):
+        """Buffered (not yet written) read time for 'consult_id', or None."""
+        with self._lock:
+            return self._flushing.get(consult_id) or self._pending.get(consult_id)
+
+    def pending_ids(self):
+        with self._lock:
+            return set(self._pending) | set(self._flushing)
+
+    def apply(self, consults):
+        """Fill in buffered read times on dumped consult dicts whose read_at is still empty."""
+        with self._lock:
+            buffered = {**self._pending, **self._flushing}
+        for consult in consults:
+            if consult.get('read_at') is None and consult.get('id') in buffered:
+                consult['read_at'] = buffered[consult['id']].isoformat()
+        return consults
+
+    def flush(self):
+        """Write every buffered receipt in one executemany UPDATE on its own transaction. Needs an app context."""
+        with self._lock:
+            if self._flushing or not self._pending: # A flush is running; new receipts go out with the next one
+                return 0
+            batch, self._pending, self._flushing = self._pending, {}, self._pending
+        table = Consult.__table__
+        stmt = table.update()\
+            .where(table.c.id == bindparam('b_id'), table.c.read_at.is_(None))\
+            .values(read_at=bindparam('b_read_at'))
+        try:
+            # Own connection: independent of (and never committing) the request's session
+            with db.engine.begin() as conn:
+                conn.execute(stmt, [{"b_id": consult_id, "b_read_at": read_at} for consult_id, read_at in batch.items()])
+        except Exception:
+            with self._lock:
+                for consult_id, read_at in batch.items():
+                    self._pending[consult_id] = min(read_at, self._pending.get(consult_id, read_at))
+                self._flushing = {}
+                self.failed_flushes += 1
+                self._flushed.notify_all()
+            raise
+        with self._lock:
+            self._flushing = {}
+            self.written += len(batch)
+            self.flushes += 1
+            self._flushed.notify_all()
+        return len(batch)
+
+    def snapshot(self):
+        with self._lock:
+            return {"pending": len(self._pending) + len(self._flushing), "buffered": self.buffered,
+                    "repeated": self.repeated, "written": self.written, "flushes": self.flushes,
+                    "failed_flushes": self.failed_flushes, "flush_interval_seconds": self.flush_interval}
+
+    # --- Background operation ---
+
+    def start(self, app):
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, args=(app,), name='consult-read-receipts', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        """Stop the flush thread; whatever is still buffered is written first."""
+        self._stopping.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, app):
+        with app.app_context():
+            while not self._stopping.wait(self.flush_interval):
+                self._flush_logged()
+            self._flush_logged()
+
+    def _flush_logged(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Error flushing consult read receipts: {e}")
+
+
+read_receipts = ReadReceiptBuffer()
+
+
+def _unread():
+    """WHERE criteria for consults with no stored and no buffered read receipt."""
+    criteria = [Consult.read_at.is_(None)]
+    pending = read_receipts.pending_ids()
+    if pending:
+        criteria.append(Consult.id.notin_(pending))
+    return criteria
+
+
+def consult_inbox(physician_id, status=None, unread=None, limit=50, cursor=None):
+    """
+    One page of consults assigned to 'physician_id', newest first, with patient context.
+    Keyset pagination on (consult_date, id) walks ix_consult_inbox.
+    unread=True/False restricts to consults without/with a read receipt (buffered ones count as read).
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    stmt = select(
+        Consult.id, Consult.admission_id, Consult.consultant_name, Consult.consult_date, Consult.status,
+        Consult.read_at, Admission.patient_id, Patient.mrn, Patient.first_name, Patient.last_name, Patient.location_bed
+    ).join(Admission, Consult.admission_id == Admission.id)\
+        .join(Patient, Admission.patient_id == Patient.id)\
+        .where(Consult.assigned_physician_id == physician_id)\
+        .order_by(Consult.consult_date.desc(), Consult.id.desc())\
+        .limit(limit + 1)
+    if status:
+        stmt = stmt.where(Consult.status == status)
+    if unread is True:
+        stmt = stmt.where(*_unread())
+    elif unread is False:
+        pending = read_receipts.pending_ids()
+        stmt = stmt.where(or_(Consult.read_at.isnot(None), Consult.id.in_(pending)) if pending
+                          else Consult.read_at.isnot(None))
+    if cursor is not None:
+        stmt = stmt.where(tuple_(Consult.consult_date, Consult.id) < tuple_(*cursor))
+    rows = [dict(row._mapping) for row in db.session.execute(stmt)]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["consult_date"], rows[-1]["id"])
+    for row in rows:
+        row["read_at"] = row["read_at"] or read_receipts.read_at(row["id"])
+        row["unread"] = row["read_at"] is None
+    return rows, next_cursor
+
+
+def unread_consult_count(physician_id):
+    return db.session.execute(
+        select(func.count()).select_from(Consult)
+        .where(Consult.assigned_physician_id == physician_id, *_unread())
+    ).scalar()
+
+
+def patients_with_unread_consult(physician_id, patient_ids):
+    """Subset of patient_ids with a completed consult for 'physician_id' that has no read receipt (dashboard indicator)."""
+    stmt = select(Admission.patient_id).distinct().select_from(Consult)\
+        .join(Admission, Consult.admission_id == Admission.id)\
+        .where(Admission.patient_id.in_(patient_ids), Consult.assigned_physician_id == physician_id,
+               Consult.status == 'Completed', *_unread())
+    return set(db.session.execute(stmt).scalars())
@@ -0,0 +1,230 @@
+# services/delta_checks.py
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from extensions import db
+from models.models import DeltaCheckRule, Result
+from services.flowsheet import result_watermarks
+from services.model_events import ALL_ADMISSIONS, on_committed
+
+NO_PRIOR = () # Cached marker: the (admission, test) pair has no numeric result yet
+
+
+def test_key(test_name):
+    return (test_name or '').strip().lower()
+
+
+class DeltaRuleIndex:
+    """
+    In-memory copy of the delta_check_rule table: test key -> (max_abs_delta, max_pct_delta, window_seconds).
+    Reloaded lazily after any committed DeltaCheckRule change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rules = None
+
+    def init_app(self, app):
+        event.listen(Session, 'after_flush', _note_rule_changes)
+        event.listen(Session, 'after_commit', self._after_commit)
+        app.extensions['delta_rules'] = self
+
+    def _after_commit(self, session):
+        if session.info.pop('delta_rules_changed', False):
+            self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            self._rules = None
+
+    def rules(self):
+        with self._lock:
+            if self._rules is None:
+                stmt = select(DeltaCheckRule.test_name, DeltaCheckRule.max_abs_delta,
+                              DeltaCheckRule.max_pct_delta, DeltaCheckRule.window_hours)
+                self._rules = {
+                    test_key(name): (abs_delta, pct_delta, window * 3600.0 if window is not None else None)
+                    for name, abs_delta, pct_delta, window in db.session.execute(stmt)
+                    if abs_delta is not None or pct_delta is not None
+                }
+            return self._rules
+
+
+class LastValueCache:
+    """
+    Bounded LRU of the latest numeric result per (admission_id, test key): (result_date, value, unit),
+    or NO_PRIOR. Misses for a whole ingest batch are loaded with one windowed query. Entries for an
+    admission are dropped after any commit that writes its results; a per-admission generation
+    keeps a load that raced with such a commit from being stored. Each entry also records its
+    admission's result watermark (count, max id), re-read for the whole batch in one grouped
+    query, so results committed by another process turn cached priors into misses.
+    """
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # (admission_id, test key) -> (prior, admission watermark)
+        self._generations = {}
+        self._global_generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.loads = 0
+
+    def _generation(self, admission_id):
+        return (self._global_generation, self._generations.get(admission_id, 0))
+
+    def _load(self, keys):
+        name = func.lower(func.trim(Result.test_name))
+        ranked = select(
+            Result.admission_id, name.label('test_key'), Result.result_date, Result.numeric_value, Result.unit,
+            func.row_number().over(
+                partition_by=(Result.admission_id, name),
+                order_by=(Result.result_date.desc(), Result.id.desc())
+            ).label('rn')
+        ).where(
+            Result.admission_id.in_({a for a, _ in keys}),
+            name.in_({t for _, t in keys}),
+            Result.numeric_value.isnot(None)
+        ).subquery()
+        stmt = select(ranked.c.admission_id, ranked.c.test_key, ranked.c.result_date,
+                      ranked.c.numeric_value, ranked.c.unit).where(ranked.c.rn == 1)
+        found = {(a, t): (date, value, unit) for a, t, date, value, unit in db.session.execute(stmt)}
+        return {key: found.get(key, NO_PRIOR) for key in keys}
+
+    def warm(self, keys):
+        """Prior values for every (admission_id, test key) in 'keys'; at most one query for all misses."""
+        out, missing = {}, []
+        # Read before loading: a result committed during the load leaves an entry behind its data, never ahead
+        watermarks = result_watermarks({a for a, _ in keys})
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] != watermarks[key[0]]:
+                    del self._entries[key]
+                    self.stale += 1
+                    entry = None
+                if entry is None:
+                    missing.append(key)
+                else:
+                    self._entries.move_to_end(key)
+                    out[key] = entry[0]
+            self.hits += len(out)
+            self.misses += len(missing)
+            generations = {a: self._generation(a) for a, _ in missing}
+        if missing:
+            loaded = self._load(missing)
+            out.update(loaded)
+            with self._lock:
+                self.loads += 1
+                for key, entry in loaded.items():
+                    if self._generation(key[0]) == generations[key[0]]:
+                        self._entries[key] = (entry, watermarks[key[0]])
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return out
+
+    def invalidate(self, admission_ids):
+        with self._lock:
+            if admission_ids is ALL_ADMISSIONS:
+                self._global_generation += 1
+                self._entries.clear()
+                return
+            for admission_id in admission_ids:
+                self._generations[admission_id] = self._generations.get(admission_id, 0) + 1
+            for key in [k for k in self._entries if k[0] in admission_ids]:
+                del self._entries[key]
+
+
+def _epoch_seconds(values):
+    return np.array(values, dtype='datetime64[us]').astype(np.int64).astype(np.float64) / 1e6
+
+
+def apply_delta_checks(rows):
+    """
+    Delta-check a batch of Result insert mappings (after annotate_rows) in place.
+
+    Rows with a numeric value and a rule are ordered by (admission, test, time) so each
+    row's predecessor is the previous row of its group; the first row of each group is
+    compared with the cached latest stored value. Limits are then tested across the
+    whole batch as arrays. Sets is_delta_flagged and delta_prior_value on every row and
+    returns the number flagged.
+    """
+    for row in rows:
+        row["is_delta_flagged"] = False
+        row["delta_prior_value"] = None
+    rules = delta_rules.rules()
+    if not rules:
+        return 0
+    checked = [(row["admission_id"], test_key(row["test_name"]), row["result_date"], i)
+               for i, row in enumerate(rows)
+               if row.get("numeric_value") is not None and test_key(row["test_name"]) in rules]
+    if not checked:
+        return 0
+    checked.sort()
+    priors = last_values.warm({(a, t) for a, t, _, _ in checked})
+
+    n = len(checked)
+    index = [i for _, _, _, i in checked]
+    values = np.array([rows[i]["numeric_value"] for i in index], dtype=np.float64)
+    dates = _epoch_seconds([date for _, _, date, _ in checked])
+    units = [(rows[i].get("unit") or '').lower() for i in index]
+
+    # Predecessor within the batch, then patch group starts from the cache
+    prior_value = np.full(n, np.nan)
+    prior_date = np.full(n, np.nan)
+    prior_unit = [''] * n
+    prior_value[1:], prior_date[1:], prior_unit[1:] = values[:-1], dates[:-1], units[:-1]
+    for j in range(n):
+        key = checked[j][:2]
+        if j == 0 or key != checked[j - 1][:2]:
+            cached = priors.get(key, NO_PRIOR)
+            if cached is NO_PRIOR or cached[0] > checked[j][2]: # Nothing earlier on record
+                prior_value[j] = prior_date[j] = np.nan
+            else:
+                prior_value[j], prior_date[j] = cached[1], _epoch_seconds([cached[0]])[0]
+                prior_unit[j] = (cached[2] or '').lower()
+
+    limits = np.array([rules[t][:2] for _, t, _, _ in checked], dtype=np.float64) # None -> nan
+    windows = np.array([rules[t][2] for _, t, _, _ in checked], dtype=np.float64)
+    comparable = np.array([not (u and p and u != p) for u, p in zip(units, prior_unit)]) & ~np.isnan(prior_value)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        delta = np.abs(values - prior_value)
+        pct = delta / np.abs(prior_value) * 100.0
+        tripped = (delta > limits[:, 0]) | (pct > limits[:, 1]) # NaN limits never trip
+        recent = np.isnan(windows) | ((dates - prior_date) <= windows)
+    flagged = tripped & recent & comparable
+
+    for j in np.flatnonzero(comparable & recent):
+        rows[index[j]]["delta_prior_value"] = float(prior_value[j])
+    for j in np.flatnonzero(flagged):
+        rows[index[j]]["is_delta_flagged"] = True
+    return int(flagged.sum())
+
+
+def delta_check_result(result):
+    """apply_delta_checks for a single Result instance before commit (after annotate_result)."""
+    row = {"admission_id": result.admission_id, "test_name": result.test_name,
+           "result_date": result.result_date or datetime.utcnow(), # Column default not applied until flush
+           "numeric_value": result.numeric_value, "unit": result.unit}
+    apply_delta_checks([row])
+    result.is_delta_flagged = row["is_delta_flagged"]
+    result.delta_prior_value = row["delta_prior_value"]
+    return result
+
+
+def _note_rule_changes(session, flush_context):
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, DeltaCheckRule):
+            session.info['delta_rules_changed'] = True
+            return
+
+
+delta_rules = DeltaRuleIndex()
+last_values = LastValueCache()
+on_committed(Result, last_values.invalidate)
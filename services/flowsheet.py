@@ -0,0 +1,136 @@
+# services/flowsheet.py
+
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import func, select
+from extensions import db
+from models.models import Result
+from services.model_events import ALL_ADMISSIONS, on_committed
+
+BUCKETS = ('none', 'day')
+
+
+def build_flowsheet(admission_id, bucket='none'):
+    """
+    Pivot an admission's results into a tests x timepoints grid.
+
+    Results are read once, oldest first, projecting only the columns the grid needs.
+    With bucket='day' timepoints are calendar days; in either mode a cell holds the
+    latest value for that test at that timepoint.
+    """
+    stmt = select(Result.test_name, Result.result_date, Result.result_value,
+                  Result.numeric_value, Result.unit, Result.abnormal_flag, Result.is_critical)\
+        .where(Result.admission_id == admission_id)\
+        .order_by(Result.result_date, Result.id)
+
+    tests, timepoints = {}, {}
+    cells = {} # (test_idx, time_idx) -> row; later rows overwrite earlier ones
+    for test_name, result_date, raw, numeric, unit, flag, critical in db.session.execute(stmt):
+        point = result_date.date() if bucket == 'day' else result_date
+        t = tests.setdefault(test_name, len(tests))
+        p = timepoints.setdefault(point, len(timepoints))
+        cells[(t, p)] = (raw, numeric, unit, flag, critical)
+
+    # Rows arrive in time order, so timepoint indices are already sorted; order tests by name.
+    test_order = sorted(tests, key=str.lower)
+    row_of = {tests[name]: i for i, name in enumerate(test_order)}
+    width = len(timepoints)
+    values = [[None] * width for _ in test_order]
+    flags = [[None] * width for _ in test_order]
+    units = [None] * len(test_order)
+    for (t, p), (raw, numeric, unit, flag, critical) in cells.items():
+        r = row_of[t]
+        values[r][p] = numeric if numeric is not None else raw
+        flags[r][p] = 'C' if critical and flag not in ('LL', 'HH') else flag
+        units[r] = units[r] or unit
+
+    return {
+        "admission_id": admission_id,
+        "bucket": bucket,
+        "tests": test_order,
+        "units": units,
+        "timepoints": [tp.isoformat() for tp in timepoints],
+        "values": values,
+        "flags": flags
+    }
+
+
+def result_watermark(admission_id):
+    """(row count, max id) of an admission's results; changes whenever any process inserts or deletes one."""
+    return tuple(db.session.execute(
+        select(func.count(), func.max(Result.id)).where(Result.admission_id == admission_id)
+    ).one())
+
+
+def result_watermarks(admission_ids):
+    """result_watermark for many admissions in one grouped query: admission_id -> (count, max id)."""
+    stmt = select(Result.admission_id, func.count(), func.max(Result.id))\
+        .where(Result.admission_id.in_(admission_ids))\
+        .group_by(Result.admission_id)
+    found = {admission_id: (count, max_id) for admission_id, count, max_id in db.session.execute(stmt)}
+    return {admission_id: found.get(admission_id, (0, None)) for admission_id in admission_ids}
+
+
+class FlowsheetCache:
+    """
+    Bounded LRU of built flowsheets keyed by (admission_id, bucket).
+    Entries for an admission are dropped when its results change; a per-admission
+    generation counter keeps a build that raced with a write from being stored.
+    Commits made by other processes (ingest_hl7.py, other web workers) are caught by
+    comparing each entry with the admission's result watermark, an index-only probe,
+    before serving it; max_age bounds how long an in-place edit elsewhere goes unseen.
+    """
+
+    def __init__(self, max_entries=512, max_age=300.0):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries = OrderedDict() # key -> (sheet, watermark, built_at)
+        self._generations = {}
+        self._global_generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def _generation(self, admission_id):
+        return (self._global_generation, self._generations.get(admission_id, 0))
+
+    def get(self, admission_id, bucket='none'):
+        key = (admission_id, bucket)
+        # Read before building: a result inserted during the build leaves the entry behind its data, never ahead
+        watermark = result_watermark(admission_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] == watermark and now - entry[2] <= self.max_age:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+                self.stale += 1
+            self.misses += 1
+            generation = self._generation(admission_id)
+        sheet = build_flowsheet(admission_id, bucket)
+        with self._lock:
+            if self._generation(admission_id) == generation:
+                self._entries[key] = (sheet, watermark, now)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return sheet
+
+    def invalidate(self, admission_ids):
+        with self._lock:
+            if admission_ids is ALL_ADMISSIONS:
+                self._global_generation += 1
+                self._entries.clear()
+                return
+            for admission_id in admission_ids:
+                self._generations[admission_id] = self._generations.get(admission_id, 0) + 1
+                for bucket in BUCKETS:
+                    self._entries.pop((admission_id, bucket), None)
+
+
+flowsheet_cache = FlowsheetCache()
+on_committed(Result, flowsheet_cache.invalidate)
@@ -0,0 +1,167 @@
+# services/hl7.py
+#
+# Minimal streaming reader for pipe-delimited HL7 v2 ORU^R01 lab result messages.
+# Only the segments needed to file results are interpreted: MSH, PID, PV1, OBR, OBX.
+
+import time
+from datetime import datetime
+
+MLLP_START = b'\x0b'
+MLLP_END = b'\x1c\x0d'
+SEGMENT_SEPARATOR = '\r'
+
+# OBX-8 abnormal flags that the analyzer uses to mark a critical (panic) value
+CRITICAL_FLAGS = frozenset(('HH', 'LL', 'AA'))
+
+
+class HL7ParseError(ValueError):
+    """Raised when a message cannot be interpreted as an ORU result message."""
+
+
+class Observation:
+    """One OBX segment."""
+    __slots__ = ('test_name', 'value', 'units', 'reference_range', 'abnormal_flag', 'observed_at')
+
+    def __init__(self, test_name, value, units, reference_range, abnormal_flag, observed_at):
+        self.test_name = test_name
+        self.value = value
+        self.units = units
+        self.reference_range = reference_range
+        self.abnormal_flag = abnormal_flag
+        self.observed_at = observed_at
+
+    @property
+    def is_critical(self):
+        return self.abnormal_flag in CRITICAL_FLAGS
+
+
+class OruMessage:
+    """A parsed ORU message; received_at is a perf_counter() stamp for latency measurement."""
+    __slots__ = ('control_id', 'message_type', 'mrn', 'visit_number', 'observations', 'received_at')
+
+    def __init__(self, control_id, message_type, mrn, visit_number, observations, received_at):
+        self.control_id = control_id
+        self.message_type = message_type
+        self.mrn = mrn
+        self.visit_number = visit_number
+        self.observations = observations
+        self.received_at = received_at
+
+
+def parse_hl7_datetime(value):
+    """HL7 TS (YYYYMMDD[HHMM[SS[.S+]]][+/-ZZZZ]) -> naive datetime, or None."""
+    if not value:
+        return None
+    value = value.split('+', 1)[0].split('-', 1)[0].split('.', 1)[0]
+    for fmt, length in (('%Y%m%d%H%M%S', 14), ('%Y%m%d%H%M', 12), ('%Y%m%d', 8)):
+        if len(value) >= length:
+            try:
+                return datetime.strptime(value[:length], fmt)
+            except ValueError:
+                return None
+    return None
+
+
+def _field(fields, index):
+    return fields[index] if len(fields) > index else ''
+
+
+def _component(value, index, separator='^'):
+    parts = value.split(separator)
+    return parts[index] if len(parts) > index else ''
+
+
+def parse_message(text, received_at=None):
+    """Parse one ORU message (segments separated by CR or newlines)."""
+    received_at = received_at if received_at is not None else time.perf_counter()
+    segments = [s for s in text.replace('\r\n', '\r').replace('\n', '\r').split(SEGMENT_SEPARATOR) if s]
+    if not segments or not segments[0].startswith('MSH'):
+        raise HL7ParseError("Message does not start with an MSH segment")
+
+    msh = segments[0]
+    field_sep = msh[3:4] or '|'
+    msh_fields = msh.split(field_sep)
+    # MSH-1 is the separator itself, so MSH-n sits at list index n-1.
+    component_sep = _field(msh_fields, 1)[:1] or '^'
+    message_type = _field(msh_fields, 8)
+    control_id = _field(msh_fields, 9)
+    message_time = parse_hl7_datetime(_field(msh_fields, 6))
+    if _component(message_type, 0, component_sep) != 'ORU':
+        raise HL7ParseError(f"Unsupported message type '{message_type}'")
+
+    mrn = visit_number = None
+    order_time = None
+    observations = []
+    for segment in segments[1:]:
+        fields = segment.split(field_sep)
+        seg_id = fields[0]
+        if seg_id == 'PID':
+            mrn = _component(_field(fields, 3), 0, component_sep) or None
+        elif seg_id == 'PV1':
+            visit_number = _component(_field(fields, 19), 0, component_sep) or None
+        elif seg_id == 'OBR':
+            order_time = parse_hl7_datetime(_field(fields, 7))
+        elif seg_id == 'OBX':
+            identifier = _field(fields, 3)
+            test_name = _component(identifier, 1, component_sep) or _component(identifier, 0, component_sep)
+            value = _field(fields, 5)
+            if not test_name or value == '':
+                continue
+            observations.append(Observation(
+                test_name=test_name,
+                value=value,
+                units=_component(_field(fields, 6), 0, component_sep) or None,
+                reference_range=_field(fields, 7) or None,
+                abnormal_flag=_field(fields, 8) or None,
+                observed_at=parse_hl7_datetime(_field(fields, 14)) or order_time or message_time
+            ))
+
+    if not mrn:
+        raise HL7ParseError("PID-3 (patient MRN) is missing")
+    return OruMessage(control_id, message_type, mrn, visit_number, observations, received_at)
+
+
+def iter_mllp_frames(stream, chunk_size=65536):
+    """Yield the payload of each MLLP frame (<VT> ... <FS><CR>) read from a binary stream."""
+    buffer = b''
+    while True:
+        chunk = stream.read1(chunk_size) if hasattr(stream, 'read1') else stream.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        while True:
+            end = buffer.find(MLLP_END)
+            if end < 0:
+                break
+            start = buffer.find(MLLP_START)
+            if 0 <= start < end:
+                yield buffer[start + 1:end]
+            buffer = buffer[end + len(MLLP_END):]
+
+
+def iter_file_messages(lines):
+    """
+    Yield message texts from a line iterable (e.g. an open file), starting a new message at each MSH.
+    Files may also carry MLLP framing bytes, which are stripped.
+    """
+    current = []
+    for line in lines:
+        line = line.strip('\r\n\x0b\x1c')
+        if not line:
+            continue
+        if line.startswith('MSH') and current:
+            yield SEGMENT_SEPARATOR.join(current)
+            current = []
+        current.append(line)
+    if current:
+        yield SEGMENT_SEPARATOR.join(current)
+
+
+def build_ack(control_id, code='AA', text=''):
+    """ACK for a received message, MLLP-framed and ready to send."""
+    now = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+    segments = [
+        f"MSH|^~\\&|MEDICARD|HMS|||{now}||ACK|ACK{control_id}|P|2.5",
+        f"MSA|{code}|{control_id}|{text}"
+    ]
+    return MLLP_START + SEGMENT_SEPARATOR.join(segments).encode('utf-8') + MLLP_END
@@ -0,0 +1,178 @@
+# services/identity.py
+
+import threading
+import time
+from collections import OrderedDict, deque
+from flask_login import UserMixin
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from extensions import db
+from models.models import User
+from services.permissions import permissions
+
+ALL_USERS = None # Passed to invalidate() when the changed users are unknown (bulk statements)
+IDENTITY_FIELDS = ('username', 'role', 'is_active')
+
+
+class UserIdentity(UserMixin):
+    """
+    Detached snapshot of the User columns request authentication needs; what current_user
+    is for requests. Routes that need other columns or the ORM object load the User by id.
+    permission_mask is the role/permission bitmask authorization checks AND against.
+    """
+    __slots__ = ('id', 'username', 'role', 'is_active', 'permission_mask')
+
+    def __init__(self, id, username, role, is_active):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.is_active = bool(is_active)
+        self.permission_mask = permissions.effective_mask(role)
+
+    def __repr__(self):
+        return f'<UserIdentity {self.username}>'
+
+
+class UserIdentityCache:
+    """
+    Bounded LRU of UserIdentity snapshots with a TTL, used by the Flask-Login user loader
+    so authenticated requests don't each cost a primary-key query.
+
+    Entries are dropped after any commit that changes a user's username, role or
+    is_active (or deletes the user); a generation counter keeps a load that raced with
+    such a commit from being stored. The TTL bounds how long another process's cache can
+    serve a snapshot this process's commit has changed.
+    """
+
+    def __init__(self, max_entries=4096, ttl=30.0, rate_window=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict() # user_id -> (identity, expires_at)
+        self._generations = {}
+        self._global_generation = 0
+        self._lock = threading.Lock()
+        self._hit_buckets = deque(maxlen=rate_window) # [second, hits] for the recent hit rate
+        self._started = time.monotonic()
+        self._subscribers = [] # callback(user_ids) after each invalidation, e.g. token revocation
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    def _generation(self, user_id):
+        return (self._global_generation, self._generations.get(user_id, 0))
+
+    def _count_hit(self, now):
+        self.hits += 1
+        second = int(now)
+        if self._hit_buckets and self._hit_buckets[-1][0] == second:
+            self._hit_buckets[-1][1] += 1
+        else:
+            self._hit_buckets.append([second, 1])
+
+    def get(self, user_id):
+        """UserIdentity for 'user_id', or None if no such user."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(user_id)
+                    self._count_hit(now)
+                    return entry[0]
+                del self._entries[user_id]
+                self.expired += 1
+            self.misses += 1
+            generation = self._generation(user_id)
+        row = db.session.execute(
+            select(User.id, User.username, User.role, User.is_active).where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        identity = UserIdentity(*row)
+        if self.ttl > 0:
+            with self._lock:
+                if self._generation(user_id) == generation:
+                    self._entries[user_id] = (identity, now + self.ttl)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        return identity
+
+    def subscribe(self, callback):
+        """Call callback(user_ids) whenever identities change (user_ids may be ALL_USERS)."""
+        self._subscribers.append(callback)
+        return callback
+
+    def invalidate(self, user_ids):
+        with self._lock:
+            self.invalidations += 1
+            if user_ids is ALL_USERS:
+                self._global_generation += 1
+                self._entries.clear()
+            else:
+                for user_id in user_ids:
+                    self._generations[user_id] = self._generations.get(user_id, 0) + 1
+                    self._entries.pop(user_id, None)
+        for callback in self._subscribers:
+            try:
+                callback(user_ids)
+            except Exception as e:
+                print(f"Error in user identity subscriber {callback.__name__}: {e}")
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            window = self._hit_buckets.maxlen
+            recent = sum(hits for second, hits in self._hit_buckets if second > int(now) - window)
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries), "max_entries": self.max_entries, "ttl_seconds": self.ttl,
+                "hits": self.hits, "misses": self.misses, "expired": self.expired,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                # Every hit is a user query not run
+                "queries_saved_per_second": round(recent / window, 3),
+                "queries_saved_per_second_lifetime": round(self.hits / max(now - self._started, 1e-9), 3)
+            }
+
+
+user_identities = UserIdentityCache()
+
+
+# --- Invalidation on commit ---
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed(session, flush_context):
+    changed = set()
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changed.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            attrs = inspect(obj).attrs
+            if any(attrs[field].history.has_changes() for field in IDENTITY_FIELDS):
+                changed.add(obj.id)
+    if changed:
+        touched = session.info.setdefault('touched_users', set())
+        if touched is not ALL_USERS:
+            touched.update(changed)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is User:
+        orm_execute_state.session.info['touched_users'] = ALL_USERS
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    if 'touched_users' in session.info:
+        user_identities.invalidate(session.info.pop('touched_users'))
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard(session, previous_transaction):
+    session.info.pop('touched_users', None)
@@ -0,0 +1,89 @@
+# services/image_render.py
+#
+# Image decoding and downscaling for the preview pipeline. Runs inside worker
+# processes, so this module imports nothing from the app (no Flask, no DB).
+
+import io
+import time
+import numpy as np
+
+PILLOW_TYPES = ('image/png', 'image/jpeg', 'image/tiff')
+DICOM_TYPE = 'application/dicom'
+JPEG_QUALITY = 80
+
+
+class UnsupportedImage(Exception):
+    """The content type has no decoder; not an error worth retrying."""
+
+
+def _to_uint8(pixels):
+    """Min-max scale any numeric pixel array to 8-bit for display."""
+    pixels = pixels.astype(np.float64, copy=False)
+    low, high = float(np.nanmin(pixels)), float(np.nanmax(pixels))
+    if high <= low:
+        return np.zeros(pixels.shape, dtype=np.uint8)
+    return ((pixels - low) * (255.0 / (high - low))).astype(np.uint8)
+
+
+def _load_pillow(source, max_edge):
+    from PIL import Image
+    image = Image.open(source)
+    width, height = image.size
+    frames = getattr(image, 'n_frames', 1)
+    image.seek(0)
+    image.draft('RGB', (max_edge, max_edge)) # JPEG: decode at reduced scale when possible
+    if image.mode in ('I', 'I;16', 'I;16B', 'F'):
+        image = Image.fromarray(_to_uint8(np.asarray(image)))
+    elif image.mode not in ('L', 'RGB'):
+        image = image.convert('RGB')
+    return image, width, height, frames
+
+
+def _load_dicom(source):
+    import pydicom
+    from pydicom.pixels import apply_voi_lut
+    from PIL import Image
+    ds = pydicom.dcmread(source)
+    width, height = int(ds.Columns), int(ds.Rows)
+    frames = int(ds.get('NumberOfFrames', 1) or 1)
+    pixels = ds.pixel_array
+    if frames > 1:
+        pixels = pixels[0]
+    if int(ds.get('SamplesPerPixel', 1)) == 1:
+        pixels = _to_uint8(apply_voi_lut(pixels, ds))
+        if ds.get('PhotometricInterpretation') == 'MONOCHROME1': # 0 is white
+            pixels = 255 - pixels
+    else:
+        pixels = _to_uint8(pixels)
+    return Image.fromarray(pixels), width, height, frames
+
+
+def render_derivatives(source, content_type, sizes):
+    """
+    Decode an image (a file path or bytes) and produce a JPEG per (name, max_edge) in 'sizes'.
+    Returns {"width", "height", "frames", "derivatives": {name: bytes}, "timings": {stage: seconds}}.
+    Raises UnsupportedImage for content types without a decoder.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    started = time.perf_counter()
+    if content_type == DICOM_TYPE:
+        image, width, height, frames = _load_dicom(source)
+    elif content_type in PILLOW_TYPES:
+        image, width, height, frames = _load_pillow(source, max(edge for _, edge in sizes))
+    else:
+        raise UnsupportedImage(content_type)
+    timings = {"decode": time.perf_counter() - started, "resize": 0.0, "encode": 0.0}
+
+    derivatives = {}
+    for name, edge in sorted(sizes, key=lambda s: -s[1]): # Largest first; smaller ones shrink from it
+        t = time.perf_counter()
+        image = image.copy()
+        image.thumbnail((edge, edge))
+        timings["resize"] += time.perf_counter() - t
+        t = time.perf_counter()
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+        derivatives[name] = buffer.getvalue()
+        timings["encode"] += time.perf_counter() - t
+    return {"width": width, "height": height, "frames": frames, "derivatives": derivatives, "timings": timings}
@@ -0,0 +1,186 @@
+# services/imaging_files.py
+
+import io
+import itertools
+import time
+from flask import Response, request, send_file
+from sqlalchemy import select, update
+from werkzeug.datastructures import ContentRange
+from extensions import db
+from models.models import Imaging
+from services.blob_store import DEFAULT_CONTENT_TYPE, BlobNotFound, blob_store
+
+STREAM_CHUNK_SIZE = 64 * 1024 # Per-request buffer when streaming from a non-local backend
+
+
+def attach_blob(imaging, stored):
+    """Point an Imaging row at a stored blob (StoredBlob from the blob store)."""
+    imaging.blob_digest = stored.digest
+    imaging.blob_size = stored.size
+    imaging.content_type = stored.content_type
+    imaging.image_file = None
+    # New content: derivatives are (re)built by the preview pipeline
+    imaging.preview_status = 'pending'
+    imaging.thumbnail_digest = imaging.preview_digest = None
+    return imaging
+
+
+def blob_references(digest):
+    """Number of Imaging rows sharing a blob (identical uploads are stored once)."""
+    return db.session.execute(
+        select(db.func.count()).select_from(Imaging).where(Imaging.blob_digest == digest)
+    ).scalar()
+
+
+def collect_unreferenced_blobs(min_age=3600, chunk_size=500, now=None):
+    """
+    Delete blobs no Imaging row references (file, thumbnail or preview digest).
+
+    Blobs are written before the row that references them commits, so a failed or
+    rolled back commit, or a stale preview write, leaves an orphan. Only blobs older
+    than 'min_age' seconds are considered, which spares ones whose reference is still
+    being committed. Also purges partial writes abandoned in the store. Returns (deleted, bytes_freed).
+    """
+    cutoff = (now or time.time()) - min_age
+    deleted = freed = 0
+    candidates = (digest for digest, stored_at in blob_store.iter_blobs() if stored_at < cutoff)
+    while True:
+        chunk = list(itertools.islice(candidates, chunk_size))
+        if not chunk:
+            break
+        referenced = set()
+        for column in (Imaging.blob_digest, Imaging.thumbnail_digest, Imaging.preview_digest):
+            referenced.update(db.session.execute(select(column).where(column.in_(chunk))).scalars())
+        for digest in chunk:
+            if digest not in referenced:
+                try:
+                    freed += blob_store.size(digest)
+                except BlobNotFound:
+                    continue
+                blob_store.delete(digest)
+                deleted += 1
+    db.session.rollback() # End the read transaction
+    blob_store.purge_incomplete(min_age)
+    return deleted, freed
+
+
+def migrate_image_files(chunk_size=50):
+    """
+    Move legacy Imaging.image_file bytes into the blob store.
+
+    Ids are walked in primary-key chunks (keyset pagination) and each image is read
+    on its own, so at most one image is held in memory. Every chunk is committed,
+    so the run can be stopped and resumed. Yields (rows_moved, bytes_moved, deduplicated, last_id).
+    """
+    last_id = 0
+    while True:
+        ids = db.session.execute(
+            select(Imaging.id)
+            .where(Imaging.id > last_id, Imaging.image_file.isnot(None))
+            .order_by(Imaging.id)
+            .limit(chunk_size)
+        ).scalars().all()
+        if not ids:
+            break
+        updates, moved_bytes, deduplicated = [], 0, 0
+        for imaging_id in ids:
+            data = db.session.execute(select(Imaging.image_file).where(Imaging.id == imaging_id)).scalar()
+            if data is None: # Cleared since the id scan
+                continue
+            stored = blob_store.put_bytes(bytes(data))
+            del data
+            updates.append({"id": imaging_id, "blob_digest": stored.digest, "blob_size": stored.size,
+                            "content_type": stored.content_type, "image_file": None,
+                            "preview_status": 'pending'})
+            moved_bytes += stored.size
+            deduplicated += 0 if stored.created else 1
+        if updates:
+            db.session.execute(update(Imaging), updates) # ORM bulk UPDATE by primary key
+        db.session.commit()
+        last_id = ids[-1]
+        yield len(updates), moved_bytes, deduplicated, last_id
+
+
+def _download_name(imaging, content_type):
+    extension = {'application/dicom': '.dcm', 'image/png': '.png', 'image/jpeg': '.jpg',
+                 'image/tiff': '.tif', 'application/pdf': '.pdf'}.get(content_type, '')
+    return f"imaging-{imaging.id}{extension}"
+
+
+def _stream_blob(digest, size, content_type, download_name):
+    """
+    Chunked response straight from the blob store with single-range and If-None-Match support.
+    Used when the backend has no local file for send_file; memory stays at one chunk.
+    """
+    headers = {"Accept-Ranges": "bytes"}
+    if request.if_none_match.contains(digest):
+        response = Response(status=304, headers=headers)
+        response.set_etag(digest)
+        return response
+
+    start, end, status = 0, size, 200
+    # If-Range with a stale validator means "send the whole thing"
+    if_range = request.if_range
+    use_range = request.range is not None and ((if_range.etag is None and if_range.date is None) or if_range.etag == digest)
+    if use_range and len(request.range.ranges) == 1: # Multi-range requests get the full body
+        bounds = request.range.range_for_length(size)
+        if bounds is None:
+            response = Response(status=416, headers=headers)
+            response.content_range = ContentRange('bytes', None, None, size)
+            return response
+        (start, end), status = bounds, 206
+
+    def generate():
+        with blob_store.open(digest) as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    response = Response(generate(), status=status, mimetype=content_type, headers=headers, direct_passthrough=True)
+    response.content_length = end - start
+    if status == 206:
+        response.content_range = ContentRange('bytes', start, end, size)
+    response.set_etag(digest)
+    response.headers['Content-Disposition'] = f'inline; filename="{download_name}"'
+    return response
+
+
+def file_response(imaging):
+    """
+    Response for an Imaging row's file, or None if it has none.
+
+    Blobs on local disk go through send_file with a path, which lets the WSGI server
+    use sendfile and handles Range/If-Range/If-None-Match (the digest is the ETag).
+    Other backends are streamed in fixed-size chunks. Rows not yet moved out of the
+    legacy image_file column are served from it until migrate_imaging_blobs.py runs.
+    """
+    content_type = imaging.content_type or DEFAULT_CONTENT_TYPE
+    download_name = _download_name(imaging, content_type)
+    if imaging.blob_digest:
+        return blob_response(imaging.blob_digest, content_type, download_name, size=imaging.blob_size)
+    data = db.session.execute(select(Imaging.image_file).where(Imaging.id == imaging.id)).scalar()
+    if data is None:
+        return None
+    response = send_file(io.BytesIO(data), mimetype=content_type, conditional=True,
+                         download_name=download_name, as_attachment=False, max_age=None)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def blob_response(digest, content_type, download_name, size=None):
+    """Serve one blob store object: send_file for local files, chunked streaming otherwise."""
+    path = blob_store.local_path(digest)
+    if path is not None:
+        response = send_file(path, mimetype=content_type, conditional=True, etag=digest,
+                             download_name=download_name, as_attachment=False, max_age=None)
+    else:
+        size = size if size is not None else blob_store.size(digest)
+        response = _stream_blob(digest, size, content_type, download_name)
+    # PHI: never cache in shared caches; browsers revalidate with If-None-Match
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
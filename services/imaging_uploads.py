@@ -0,0 +1,263 @@
+# services/imaging_uploads.py
+
+import hashlib
+import os
+import secrets
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, update
+from extensions import db
+from models.models import Imaging, ImagingUpload
+from services.blob_store import blob_store
+from services.imaging_files import attach_blob
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+COPY_BUFFER = 64 * 1024
+DEFAULT_MAX_UPLOAD_SIZE = 4 * 1024 * 1024 * 1024
+DEFAULT_MAX_OPEN_UPLOADS = 8
+
+
+class UploadError(Exception):
+    """A client-visible upload protocol error, carrying the HTTP status to return."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class _ChunkReader:
+    """File-like read() over the chunk files of a session, in order, one buffer at a time."""
+
+    def __init__(self, paths):
+        self._paths = iter(paths)
+        self._current = None
+
+    def read(self, size=-1):
+        while True:
+            if self._current is None:
+                path = next(self._paths, None)
+                if path is None:
+                    return b''
+                self._current = open(path, 'rb')
+            data = self._current.read(size)
+            if data:
+                return data
+            self._current.close()
+            self._current = None
+
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+
+
+class UploadManager:
+    """
+    Resumable imaging uploads: initiate a session, PUT numbered chunks (in any order and
+    in parallel), then finalize with the SHA-256 of the whole file.
+
+    Session metadata is an ImagingUpload row; chunk bytes are streamed from the request
+    straight to root/<upload_id>/<n>.part (written as a temp file and renamed, so a
+    chunk is either complete or absent). Finalize streams the chunks in order into the
+    blob store, which hashes as it writes and commits the object atomically; the
+    Imaging row is created only if the digest matches. Sessions idle longer than the
+    TTL are garbage collected. A session may not exceed max_size bytes, and one user
+    may hold at most max_open_per_user sessions, so staging space stays bounded.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.ttl = timedelta(hours=24)
+        self.max_size = DEFAULT_MAX_UPLOAD_SIZE
+        self.max_open_per_user = DEFAULT_MAX_OPEN_UPLOADS
+        self.gc_interval = 600
+        self._last_gc = None
+        self._gc_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.root = os.path.abspath(app.config['UPLOAD_TMP_PATH'])
+        self.ttl = timedelta(seconds=app.config.get('UPLOAD_SESSION_TTL', 24 * 3600))
+        self.max_size = app.config.get('MAX_UPLOAD_SIZE', DEFAULT_MAX_UPLOAD_SIZE)
+        self.max_open_per_user = app.config.get('MAX_OPEN_UPLOADS_PER_USER', DEFAULT_MAX_OPEN_UPLOADS)
+        os.makedirs(self.root, exist_ok=True)
+        app.extensions['imaging_uploads'] = self
+
+    def _dir(self, upload_id):
+        return os.path.join(self.root, upload_id)
+
+    def _chunk_path(self, upload_id, index):
+        return os.path.join(self._dir(upload_id), f"{index:06d}.part")
+
+    def received_chunks(self, upload):
+        try:
+            names = os.listdir(self._dir(upload.id))
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[:-5]) for name in names if name.endswith('.part'))
+
+    def expected_length(self, upload, index):
+        if index < 0 or index >= upload.total_chunks:
+            raise UploadError(f"Chunk index must be between 0 and {upload.total_chunks - 1}")
+        if index == upload.total_chunks - 1:
+            return upload.total_size - index * upload.chunk_size
+        return upload.chunk_size
+
+    def initiate(self, user_id, admission_id, total_size, image_type, chunk_size=None,
+                 content_type=None, image_date=None, image_report=None, is_critical=False):
+        if not isinstance(total_size, int) or total_size <= 0:
+            raise UploadError("total_size must be a positive integer (bytes)")
+        if total_size > self.max_size:
+            raise UploadError(f"total_size exceeds the upload limit of {self.max_size} bytes", 413)
+        chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+        if not isinstance(chunk_size, int) or not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+            raise UploadError(f"chunk_size must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE} bytes")
+        self.collect_garbage_if_due()
+        open_sessions = db.session.execute(
+            select(func.count()).select_from(ImagingUpload).where(ImagingUpload.created_by_id == user_id)
+        ).scalar()
+        if open_sessions >= self.max_open_per_user:
+            raise UploadError(f"At most {self.max_open_per_user} open upload sessions per user; "
+                              "complete or abort one first", 429)
+
+        upload = ImagingUpload(id=secrets.token_hex(16), admission_id=admission_id, created_by_id=user_id,
+                               total_size=total_size, chunk_size=chunk_size, content_type=content_type,
+                               image_type=image_type, image_date=image_date, image_report=image_report,
+                               is_critical=bool(is_critical))
+        os.makedirs(self._dir(upload.id))
+        db.session.add(upload)
+        db.session.commit()
+        return upload
+
+    def write_chunk(self, upload, index, stream):
+        """
+        Stream one chunk from 'stream' to disk, hashing as it goes. Re-sending a chunk
+        replaces it, so a client can retry any chunk it is unsure about.
+        Returns the chunk's SHA-256 (hex) so the client can verify what was stored.
+        """
+        if upload.status != 'open':
+            raise UploadError("Upload is being finalized", 409)
+        expected = self.expected_length(upload, index)
+        target = self._chunk_path(upload.id, index)
+        temp = f"{target}.{secrets.token_hex(4)}.tmp" # Unique: parallel retries of one chunk don't collide
+        sha = hashlib.sha256()
+        written = 0
+        try:
+            with open(temp, 'wb') as f:
+                while written <= expected:
+                    data = stream.read(min(COPY_BUFFER, expected + 1 - written))
+                    if not data:
+                        break
+                    sha.update(data)
+                    f.write(data)
+                    written += len(data)
+            if written != expected:
+                raise UploadError(f"Chunk {index} must be exactly {expected} bytes (got {written if written <= expected else 'more'})")
+            os.replace(temp, target)
+        except FileNotFoundError:
+            raise UploadError("Upload session has expired", 410)
+        finally:
+            if os.path.exists(temp):
+                os.unlink(temp)
+        return sha.hexdigest()
+
+    def finalize(self, upload, sha256):
+        """Assemble, verify and store the file; create the Imaging row. Returns the new Imaging."""
+        sha256 = (sha256 or '').strip().lower()
+        if len(sha256) != 64:
+            raise UploadError("sha256 (hex digest of the whole file) is required")
+        missing = sorted(set(range(upload.total_chunks)) - set(self.received_chunks(upload)))
+        if missing:
+            raise UploadError(f"{len(missing)} chunk(s) missing, first: {missing[0]}", 409)
+
+        # Only one finalize per session; chunk PUTs are refused from here on
+        claimed = db.session.execute(
+            update(ImagingUpload)
+            .where(ImagingUpload.id == upload.id, ImagingUpload.status == 'open')
+            .values(status='completing')
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if not claimed:
+            raise UploadError("Upload is already being finalized", 409)
+
+        reader = _ChunkReader([self._chunk_path(upload.id, i) for i in range(upload.total_chunks)])
+        try:
+            stored = blob_store.put_stream(reader, upload.content_type)
+        except Exception:
+            self._reopen(upload.id)
+            raise
+        finally:
+            reader.close()
+        if stored.digest != sha256:
+            if stored.created:
+                blob_store.delete(stored.digest)
+            self._reopen(upload.id)
+            raise UploadError("Checksum mismatch: re-send chunks or check the digest", 422)
+
+        imaging = attach_blob(Imaging(admission_id=upload.admission_id, image_type=upload.image_type,
+                                      image_report=upload.image_report, is_critical=upload.is_critical,
+                                      image_date=upload.image_date or datetime.utcnow()), stored)
+        db.session.add(imaging)
+        db.session.delete(upload)
+        db.session.commit()
+        shutil.rmtree(self._dir(upload.id), ignore_errors=True)
+        return imaging
+
+    def _reopen(self, upload_id):
+        db.session.rollback()
+        db.session.execute(update(ImagingUpload).where(ImagingUpload.id == upload_id).values(status='open'))
+        db.session.commit()
+
+    def abort(self, upload):
+        db.session.delete(upload)
+        db.session.commit()
+        shutil.rmtree(self._dir(upload.id), ignore_errors=True)
+
+    def last_activity(self, upload):
+        """Creation time or the latest chunk write (directory mtime), whichever is later."""
+        try:
+            touched = datetime.utcfromtimestamp(os.path.getmtime(self._dir(upload.id)))
+        except FileNotFoundError:
+            return upload.created_at
+        return max(upload.created_at, touched)
+
+    def collect_garbage(self, now=None):
+        """Delete sessions idle longer than the TTL, and chunk directories with no session. Returns sessions removed."""
+        now = now or datetime.utcnow()
+        cutoff = now - self.ttl
+        candidates = db.session.execute(
+            select(ImagingUpload).where(ImagingUpload.created_at < cutoff)
+        ).scalars().all()
+        expired = [u for u in candidates if self.last_activity(u) < cutoff]
+        for upload in expired:
+            db.session.delete(upload)
+        db.session.commit()
+        for upload in expired:
+            shutil.rmtree(self._dir(upload.id), ignore_errors=True)
+
+        known = set(db.session.execute(select(ImagingUpload.id)).scalars())
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name not in known and os.path.isdir(path) and \
+                    datetime.utcfromtimestamp(os.path.getmtime(path)) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        return len(expired)
+
+    def collect_garbage_if_due(self):
+        """Run collect_garbage at most once per gc_interval seconds (called opportunistically)."""
+        with self._gc_lock:
+            if self._last_gc is not None and time.monotonic() - self._last_gc < self.gc_interval:
+                return
+            self._last_gc = time.monotonic()
+        try:
+            self.collect_garbage()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error collecting abandoned imaging uploads: {e}")
+
+
+upload_manager = UploadManager()
@@ -0,0 +1,88 @@
+# services/indicators.py
+
+import threading
+import time
+from sqlalchemy import select, func
+from extensions import db
+from models.models import Admission, Imaging, Result
+from services.model_events import on_committed
+
+
+class CriticalIndicatorCache:
+    """
+    Latest unacknowledged critical Result/Imaging time per patient, for the dashboard's
+    user-independent indicators. Each kind is built with one grouped query and dropped
+    whenever a commit writes that model, so an acknowledgement batch costs one rebuild,
+    not one per row.
+
+    Commits made by other processes (ingest_hl7.py, other web workers) don't reach this
+    cache's listeners, so every lookup first reads the kind's watermark, (count, max id)
+    of its unacknowledged critical rows, from the partial index; a new critical row or
+    an acknowledgement changes it and forces a rebuild. max_age bounds how long any
+    snapshot is served regardless.
+    """
+
+    SOURCES = {
+        'lab': (Result, Result.result_date),
+        'imaging': (Imaging, Imaging.image_date)
+    }
+
+    def __init__(self, max_age=30.0):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._latest = {kind: None for kind in self.SOURCES} # kind -> ({patient_id: latest datetime}, watermark, built_at)
+        self._generation = {kind: 0 for kind in self.SOURCES}
+        self.rebuilds = 0
+        self.invalidations = 0
+        self.stale = 0
+
+    def _unacknowledged(self, model):
+        return (model.is_critical == True, model.acknowledged_at.is_(None))
+
+    def _watermark(self, kind):
+        model, _ = self.SOURCES[kind]
+        return tuple(db.session.execute(
+            select(func.count(), func.max(model.id)).where(*self._unacknowledged(model))
+        ).one())
+
+    def _load(self, kind):
+        model, date_col = self.SOURCES[kind]
+        stmt = select(Admission.patient_id, func.max(date_col))\
+            .select_from(model)\
+            .join(Admission, model.admission_id == Admission.id)\
+            .where(*self._unacknowledged(model))\
+            .group_by(Admission.patient_id)
+        return dict(db.session.execute(stmt).all())
+
+    def patients_with_critical(self, kind, patient_ids, since):
+        """Subset of patient_ids with an unacknowledged critical item of 'kind' newer than 'since'."""
+        # Read before loading: a row committed during the load leaves the snapshot behind its data, never ahead
+        watermark = self._watermark(kind)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._latest[kind]
+            if cached is not None and (cached[1] != watermark or now - cached[2] > self.max_age):
+                cached = self._latest[kind] = None
+                self.stale += 1
+            generation = self._generation[kind]
+        if cached is None:
+            latest = self._load(kind)
+            with self._lock:
+                # Don't publish a snapshot that a concurrent commit has already outdated
+                if self._generation[kind] == generation:
+                    self._latest[kind] = (latest, watermark, now)
+                self.rebuilds += 1
+        else:
+            latest = cached[0]
+        return {pid for pid in patient_ids if pid in latest and latest[pid] > since}
+
+    def invalidate(self, kind):
+        with self._lock:
+            self._latest[kind] = None
+            self._generation[kind] += 1
+            self.invalidations += 1
+
+
+indicator_cache = CriticalIndicatorCache()
+on_committed(Result, lambda admission_ids: indicator_cache.invalidate('lab'))
+on_committed(Imaging, lambda admission_ids: indicator_cache.invalidate('imaging'))
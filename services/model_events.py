@@ -0,0 +1,130 @@
+# services/model_events.py
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, scoped_session
+
+ALL_ADMISSIONS = None # Passed to listeners when the touched admissions are unknown (e.g. bulk UPDATE)
+TOUCHED_KEY = 'touched_admissions'
+
+_listeners = {} # model class -> [callback]
+_installed = False
+
+
+def on_committed(model, callback):
+    """
+    Register callback(admission_ids) to run after a commit that wrote rows of 'model'
+    (an admission-scoped model such as Result or Imaging). admission_ids is a set, or
+    ALL_ADMISSIONS when a bulk statement's scope is unknown.
+    Covers ORM flushes as well as bulk insert/update/delete statements run through the session.
+    """
+    global _installed
+    _listeners.setdefault(model, []).append(callback)
+    if not _installed:
+        event.listen(Session, 'after_flush', _collect_flush)
+        event.listen(Session, 'do_orm_execute', _collect_bulk)
+        event.listen(Session, 'after_commit', _dispatch)
+        event.listen(Session, 'after_soft_rollback', _discard)
+        _installed = True
+    return callback
+
+
+def mark_touched(session, model, admission_ids):
+    """
+    Record admissions touched by a statement that reports its own scope, e.g. an
+    UPDATE ... RETURNING run with execution_options(track_touched=False).
+    """
+    if isinstance(session, scoped_session): # e.g. db.session
+        session = session()
+    _merge(transaction_changes(session, TOUCHED_KEY, dict), model, admission_ids)
+
+
+def _merge(touched, model, admission_ids):
+    current = touched.get(model, set())
+    if current is ALL_ADMISSIONS or admission_ids is ALL_ADMISSIONS:
+        touched[model] = ALL_ADMISSIONS
+    else:
+        touched[model] = current | set(admission_ids)
+
+
+def _collect_flush(session, flush_context):
+    by_model = {}
+    for obj in session.new | session.dirty | session.deleted:
+        if type(obj) in _listeners:
+            by_model.setdefault(type(obj), set()).add(obj.admission_id)
+    for model, ids in by_model.items():
+        mark_touched(session, model, ids)
+
+
+def _collect_bulk(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if orm_execute_state.execution_options.get('track_touched') is False:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ not in _listeners:
+        return
+    params = orm_execute_state.parameters
+    if orm_execute_state.is_insert and params:
+        rows = params if isinstance(params, list) else [params]
+        mark_touched(orm_execute_state.session, mapper.class_, {row.get('admission_id') for row in rows})
+    else:
+        mark_touched(orm_execute_state.session, mapper.class_, ALL_ADMISSIONS)
+
+
+def _dispatch(session):
+    touched = {}
+    for record in committed_changes(session, TOUCHED_KEY):
+        for model, admission_ids in record.items():
+            _merge(touched, model, admission_ids)
+    for model, admission_ids in touched.items():
+        for callback in _listeners.get(model, ()):
+            try:
+                callback(admission_ids)
+            except Exception as e:
+                print(f"Error in {model.__name__} commit listener {callback.__name__}: {e}")
+
+
+def _discard(session, previous_transaction):
+    discard_changes(session, TOUCHED_KEY, previous_transaction)
+
+
+# --- Transaction-scoped change records ---
+# Listeners that collect changes in after_flush and apply them after commit keep them per
+# transaction, so a rolled back savepoint discards only what was flushed inside it and a
+# released savepoint is applied with the outermost commit, not on its own.
+
+def transaction_changes(session, key, factory):
+    """Change record for 'key' in the session's innermost transaction; factory() creates it."""
+    transaction = session.get_nested_transaction()
+    scopes = session.info.setdefault(key, [])
+    if not scopes or scopes[-1][0] is not transaction:
+        scopes.append((transaction, factory()))
+    return scopes[-1][1]
+
+
+def committed_changes(session, key):
+    """
+    For after_commit: pop the change records for 'key', oldest first. Returns [] on a
+    savepoint release, whose records are kept for the outermost commit.
+    """
+    if session.in_nested_transaction():
+        return []
+    return [changes for transaction, changes in session.info.pop(key, ())]
+
+
+def discard_changes(session, key, previous_transaction):
+    """For after_soft_rollback: drop the records of the rolled back transaction and the savepoints inside it."""
+    if not previous_transaction.nested:
+        session.info.pop(key, None)
+        return
+    scopes = session.info.get(key)
+    if scopes:
+        session.info[key] = [(t, changes) for t, changes in scopes if not _inside(t, previous_transaction)]
+
+
+def _inside(transaction, ancestor):
+    while transaction is not None:
+        if transaction is ancestor:
+            return True
+        transaction = transaction.parent
+    return False
@@ -0,0 +1,317 @@
+# services/notifications.py
+
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from sqlalchemy import case, event, func, inspect, select, update
+from sqlalchemy.orm import Session
+from extensions import db
+from models.models import Admission, CriticalNotification, Imaging, Patient, Result
+
+SOURCE_TYPES = {Result: 'result', Imaging: 'imaging'}
+
+
+# --- Outbox writes (same transaction as the critical row) ---
+
+def enqueue(session, source_type, items, now=None):
+    """
+    Write one outbox row per (source_id, admission_id) in 'items' on the session's
+    current transaction, so the notification commits or rolls back with its source.
+    """
+    now = now or datetime.utcnow()
+    rows = [{"source_type": source_type, "source_id": source_id, "admission_id": admission_id,
+             "created_at": now, "next_attempt_at": now, "status": 'pending', "attempts": 0}
+            for source_id, admission_id in items]
+    if rows:
+        # Core insert on the flush's own connection: safe inside after_flush, and never re-enters the ORM
+        session.connection().execute(CriticalNotification.__table__.insert(), rows)
+    return len(rows)
+
+
+def _became_critical(obj, is_new):
+    if not obj.is_critical:
+        return False
+    if is_new:
+        return True
+    history = inspect(obj).attrs.is_critical.history
+    return history.has_changes() and not any(history.deleted)
+
+
+@event.listens_for(Session, 'after_flush')
+def _enqueue_flushed(session, flush_context):
+    """ORM path: Result/Imaging rows inserted as critical, or flipped to critical, get an outbox row."""
+    pending = {}
+    for is_new, objects in ((True, session.new), (False, session.dirty)):
+        for obj in objects:
+            source_type = SOURCE_TYPES.get(type(obj))
+            if source_type and _became_critical(obj, is_new):
+                pending.setdefault(source_type, []).append((obj.id, obj.admission_id))
+    for source_type, items in pending.items():
+        enqueue(session, source_type, items)
+
+
+# --- Delivery ---
+
+class DeliveryError(Exception):
+    """Raised by a delivery adapter for a failure worth retrying."""
+
+
+class LogDeliveryAdapter:
+    """Stub transport: logs each notification and keeps the most recent ones for inspection."""
+
+    def __init__(self, keep=1000):
+        self.sent = deque(maxlen=keep)
+
+    def deliver(self, recipient_id, patient_id, items):
+        self.sent.append({"recipient_id": recipient_id, "patient_id": patient_id, "items": items})
+        kinds = ', '.join(f"{i['source_type']} {i['source_id']}" for i in items)
+        print(f"[critical] notify user {recipient_id}: patient {patient_id} has {len(items)} new critical item(s) ({kinds})")
+
+
+class NotificationStats:
+    """Delivery counters and rolling windows of outbox lag (created -> claimed) and delivery latency (created -> delivered)."""
+
+    def __init__(self, window=10000):
+        self._lock = threading.Lock()
+        self._lag = deque(maxlen=window)
+        self._latency = deque(maxlen=window)
+        self.delivered = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.failed = 0
+        self.undeliverable = 0
+        self.cycles = 0
+
+    def record_cycle(self, lags, latencies, **counts):
+        with self._lock:
+            self.cycles += 1
+            self._lag.extend(lags)
+            self._latency.extend(latencies)
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self):
+        with self._lock:
+            lag, latency = sorted(self._lag), sorted(self._latency)
+            counts = {name: getattr(self, name) for name in
+                      ('delivered', 'coalesced', 'retried', 'failed', 'undeliverable', 'cycles')}
+
+        def pct(values, p):
+            if not values:
+                return None
+            return round(values[min(len(values) - 1, int(p / 100.0 * len(values)))], 3)
+
+        return dict(counts,
+                    outbox_lag_seconds={"p50": pct(lag, 50), "p95": pct(lag, 95), "max": pct(lag, 100)},
+                    delivery_latency_seconds={"p50": pct(latency, 50), "p95": pct(latency, 95), "max": pct(latency, 100)})
+
+
+def outbox_backlog(now=None):
+    """Pending/failed counts and the age of the oldest undelivered row, read from the table (one query)."""
+    now = now or datetime.utcnow()
+    stmt = select(CriticalNotification.status, func.count(), func.min(CriticalNotification.created_at))\
+        .where(CriticalNotification.status.in_(('pending', 'sending', 'failed')))\
+        .group_by(CriticalNotification.status)
+    by_status = {status: (count, oldest) for status, count, oldest in db.session.execute(stmt)}
+    undelivered = [oldest for status, (_, oldest) in by_status.items() if status != 'failed']
+    return {
+        "pending": sum(by_status.get(s, (0, None))[0] for s in ('pending', 'sending')),
+        "failed": by_status.get('failed', (0, None))[0],
+        "oldest_pending_age_seconds": round((now - min(undelivered)).total_seconds(), 3) if undelivered else None
+    }
+
+
+class NotificationDispatcher:
+    """
+    Drains the critical_notification outbox.
+
+    One loop thread claims due rows (a lease: status='sending', next_attempt_at pushed
+    out, so rows from a crashed worker become due again), resolves each admission's
+    patient and current attending in one query, coalesces repeats per patient and
+    recipient, and hands one delivery per (recipient, patient) to a thread pool.
+    Outcomes are written back in one executemany UPDATE; failures retry with
+    exponential backoff until max_attempts. Reclaiming an expired lease counts as an
+    attempt, so a row that keeps killing its worker still ends up 'failed'.
+    """
+
+    def __init__(self, adapter=None, workers=4, batch_size=200, poll_interval=1.0,
+                 coalesce_window=300, max_attempts=5, backoff_base=5.0, backoff_max=900, lease_seconds=120):
+        self.adapter = adapter or LogDeliveryAdapter()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.coalesce_window = timedelta(seconds=coalesce_window)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = timedelta(seconds=lease_seconds)
+        self.stats = NotificationStats()
+        self._pool = None
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def backoff(self, attempts):
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+        return timedelta(seconds=delay * random.uniform(0.9, 1.1))
+
+    def _claim(self, now):
+        """
+        Lease due rows; returns (rows to deliver, number failed for running out of attempts).
+        A row still 'sending' is due only because its lease expired: the worker holding it died
+        or stalled mid-delivery. That counts as an attempt, and a row out of attempts is failed
+        here, before anything else can touch it, so a row that crashes workers can't loop forever.
+        """
+        reclaimed = case((CriticalNotification.status == 'sending', 1), else_=0)
+        due = select(CriticalNotification.id, CriticalNotification.source_type, CriticalNotification.source_id,
+                     CriticalNotification.admission_id, CriticalNotification.created_at,
+                     (CriticalNotification.attempts + reclaimed).label('attempts'))\
+            .where(CriticalNotification.status.in_(('pending', 'sending')),
+                   CriticalNotification.next_attempt_at <= now)\
+            .order_by(CriticalNotification.id)\
+            .limit(self.batch_size)\
+            .with_for_update(skip_locked=True)
+        rows = db.session.execute(due).all()
+        exhausted = [r for r in rows if r.attempts >= self.max_attempts]
+        rows = [r for r in rows if r.attempts < self.max_attempts]
+        if rows:
+            db.session.execute(
+                update(CriticalNotification)
+                .where(CriticalNotification.id.in_([r.id for r in rows]))
+                .values(status='sending', next_attempt_at=now + self.lease,
+                        attempts=CriticalNotification.attempts + reclaimed)
+                .execution_options(synchronize_session=False)
+            )
+        if exhausted:
+            db.session.execute(
+                update(CriticalNotification)
+                .where(CriticalNotification.id.in_([r.id for r in exhausted]))
+                .values(status='failed', attempts=CriticalNotification.attempts + 1,
+                        last_error="Delivery lease expired on the final attempt")
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+        return rows, len(exhausted)
+
+    def _recipients(self, admission_ids):
+        stmt = select(Admission.id, Admission.patient_id, Patient.attending_id)\
+            .join(Patient, Admission.patient_id == Patient.id)\
+            .where(Admission.id.in_(admission_ids))
+        return {admission_id: (patient_id, attending_id) for admission_id, patient_id, attending_id in db.session.execute(stmt)}
+
+    def _recently_notified(self, patient_ids, now):
+        """{(patient_id, recipient_id)} already delivered within the coalescing window."""
+        stmt = select(Admission.patient_id, CriticalNotification.recipient_id)\
+            .join(Admission, CriticalNotification.admission_id == Admission.id)\
+            .where(CriticalNotification.status == 'delivered',
+                   CriticalNotification.delivered_at >= now - self.coalesce_window,
+                   Admission.patient_id.in_(patient_ids))\
+            .distinct()
+        return set(db.session.execute(stmt).all())
+
+    def run_once(self):
+        """Claim, deliver and record one batch. Needs an app context; returns the number of rows processed."""
+        now = datetime.utcnow()
+        claimed, exhausted = self._claim(now)
+        if not claimed:
+            if exhausted:
+                self.stats.record_cycle(lags=[], latencies=[], failed=exhausted)
+            return exhausted
+
+        recipients = self._recipients({r.admission_id for r in claimed})
+        recent = self._recently_notified({p for p, _ in recipients.values()}, now)
+
+        updates, groups = [], {}
+        counts = dict(delivered=0, coalesced=0, retried=0, failed=exhausted, undeliverable=0)
+        for row in claimed:
+            patient_id, recipient_id = recipients.get(row.admission_id, (None, None))
+            if recipient_id is None:
+                updates.append({"id": row.id, "status": 'undeliverable', "last_error": "No attending on record"})
+                counts["undeliverable"] += 1
+            elif (patient_id, recipient_id) in recent:
+                updates.append({"id": row.id, "status": 'coalesced', "recipient_id": recipient_id})
+                counts["coalesced"] += 1
+            else:
+                groups.setdefault((recipient_id, patient_id), []).append(row)
+
+        pool = self._pool or ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            futures = {}
+            for (recipient_id, patient_id), rows in groups.items():
+                items = [{"source_type": r.source_type, "source_id": r.source_id,
+                          "admission_id": r.admission_id, "created_at": r.created_at.isoformat()} for r in rows]
+                futures[pool.submit(self.adapter.deliver, recipient_id, patient_id, items)] = (recipient_id, rows)
+            wait(futures)
+        finally:
+            if pool is not self._pool:
+                pool.shutdown()
+
+        latencies = []
+        for future, (recipient_id, rows) in futures.items():
+            error = future.exception()
+            finished = datetime.utcnow()
+            for n, row in enumerate(rows):
+                if error is None:
+                    # Repeats for the same patient in one batch ride along in the first delivery
+                    status = 'delivered' if n == 0 else 'coalesced'
+                    updates.append({"id": row.id, "status": status, "recipient_id": recipient_id,
+                                    "attempts": row.attempts + 1, "delivered_at": finished, "last_error": None})
+                    counts[status] += 1
+                    latencies.append((finished - row.created_at).total_seconds())
+                elif row.attempts + 1 >= self.max_attempts:
+                    updates.append({"id": row.id, "status": 'failed', "recipient_id": recipient_id,
+                                    "attempts": row.attempts + 1, "last_error": str(error)[:255]})
+                    counts["failed"] += 1
+                else:
+                    updates.append({"id": row.id, "status": 'pending', "recipient_id": recipient_id,
+                                    "attempts": row.attempts + 1, "last_error": str(error)[:255],
+                                    "next_attempt_at": finished + self.backoff(row.attempts + 1)})
+                    counts["retried"] += 1
+
+        # Rows differ in their columns, so group by key set for executemany
+        by_keys = {}
+        for u in updates:
+            by_keys.setdefault(tuple(sorted(u)), []).append(u)
+        for batch in by_keys.values():
+            db.session.execute(update(CriticalNotification), batch)
+        db.session.commit()
+
+        self.stats.record_cycle(lags=[(now - r.created_at).total_seconds() for r in claimed],
+                                latencies=latencies, **counts)
+        return len(claimed) + exhausted
+
+    # --- Background operation ---
+
+    def start(self, app):
+        self._stopping.clear()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='critical-notify')
+        self._thread = threading.Thread(target=self._run, args=(app,), name='critical-notify-dispatcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._pool:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _run(self, app):
+        with app.app_context():
+            while not self._stopping.is_set():
+                try:
+                    processed = self.run_once()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error dispatching critical notifications: {e}")
+                    processed = 0
+                finally:
+                    db.session.remove()
+                if processed < self.batch_size: # Caught up; otherwise keep draining
+                    self._stopping.wait(self.poll_interval)
+
+
+notification_dispatcher = NotificationDispatcher()
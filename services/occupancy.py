@@ -0,0 +1,114 @@
+# services/occupancy.py
+
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import select, or_
+from extensions import db
+from models.models import Admission, Patient
+from services.census import unit_from_location
+
+
+class OccupancyTimeline:
+    """
+    Sweep-line view over a set of [admission_date, discharge_date) intervals.
+
+    Admissions and discharges are merged into one sorted event list with a
+    running census, so occupancy at any instant is two binary searches and a
+    histogram over N buckets is a single pass over the events.
+    Open admissions (no discharge) are treated as ending at 'now'.
+    """
+
+    def __init__(self, intervals, now=None):
+        now = now or datetime.utcnow()
+        self.starts = sorted(start for start, _ in intervals)
+        self.ends = sorted(end or now for _, end in intervals)
+        # Discharges sort before admissions at the same instant (half-open intervals).
+        events = [(t, 1) for t in self.starts] + [(t, -1) for t in self.ends]
+        events.sort()
+        self.times = [t for t, _ in events]
+        self.running = []
+        level = 0
+        for _, delta in events:
+            level += delta
+            self.running.append(level)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def occupancy_at(self, at):
+        """Number of intervals covering instant 'at'."""
+        return bisect_right(self.starts, at) - bisect_right(self.ends, at)
+
+    def peak(self, start, end):
+        """Maximum simultaneous occupancy within [start, end); returns (count, first time reached)."""
+        best, best_at = self.occupancy_at(start), start
+        lo = bisect_right(self.times, start)
+        hi = bisect_left(self.times, end)
+        for i in range(lo, hi):
+            # Only the last event at a given instant reflects the settled level.
+            if i + 1 < len(self.times) and self.times[i + 1] == self.times[i]:
+                continue
+            if self.running[i] > best:
+                best, best_at = self.running[i], self.times[i]
+        return best, best_at
+
+    def histogram(self, start, end, step):
+        """
+        Occupancy per bucket of width 'step' over [start, end).
+        Each bucket reports the census at its start and the peak reached inside it.
+        """
+        buckets = []
+        bucket_start = start
+        i = bisect_right(self.times, start)
+        n = len(self.times)
+        while bucket_start < end:
+            bucket_end = min(bucket_start + step, end)
+            level = self.occupancy_at(bucket_start)
+            peak = level
+            while i < n and self.times[i] < bucket_end:
+                if i + 1 >= n or self.times[i + 1] != self.times[i]:
+                    peak = max(peak, self.running[i])
+                i += 1
+            buckets.append({"start": bucket_start, "occupied": level, "peak": peak})
+            bucket_start = bucket_end
+        return buckets
+
+
+def load_intervals(start, end, unit=None):
+    """
+    Fetch (admission_date, discharge_date, unit) for admissions overlapping [start, end)
+    in one projected range query. Unit comes from the patient's current location_bed,
+    as admissions do not record bed history.
+    """
+    stmt = select(Admission.admission_date, Admission.discharge_date, Patient.location_bed)\
+        .join(Patient, Admission.patient_id == Patient.id)\
+        .where(
+            Admission.admission_date < end,
+            or_(Admission.discharge_date.is_(None), Admission.discharge_date > start)
+        )
+    if unit:
+        stmt = stmt.where(Patient.location_bed.ilike(f"{unit}%"))
+    rows = db.session.execute(stmt).all()
+    wanted = unit.upper() if unit else None
+    intervals = []
+    for adm_date, dis_date, location_bed in rows:
+        row_unit = unit_from_location(location_bed)
+        if wanted is None or row_unit == wanted:
+            intervals.append((adm_date, dis_date, row_unit))
+    return intervals
+
+
+def timelines_by_unit(intervals, now=None):
+    """Group (start, end, unit) intervals into one OccupancyTimeline per unit."""
+    grouped = defaultdict(list)
+    for start, end, unit in intervals:
+        grouped[unit or 'UNASSIGNED'].append((start, end))
+    return {unit: OccupancyTimeline(rows, now=now) for unit, rows in grouped.items()}
+
+
+STEP_SIZES = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1)
+}
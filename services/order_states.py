@@ -0,0 +1,131 @@
+# services/order_states.py
+
+from datetime import datetime
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from constants import OrderStatus
+from models.models import Order, OrderTransition
+
+# Allowed status changes; every other change is rejected at flush time.
+TRANSITIONS = {
+    OrderStatus.PENDING_SIGNATURE: {OrderStatus.SIGNED, OrderStatus.CANCELLED},
+    OrderStatus.PENDING: {OrderStatus.IN_PROGRESS, OrderStatus.COMPLETED, OrderStatus.CANCELLED},
+    OrderStatus.SIGNED: {OrderStatus.IN_PROGRESS, OrderStatus.COMPLETED, OrderStatus.CANCELLED},
+    OrderStatus.IN_PROGRESS: {OrderStatus.COMPLETED, OrderStatus.CANCELLED},
+    OrderStatus.COMPLETED: set(),
+    OrderStatus.CANCELLED: set(),
+}
+INITIAL_STATES = (OrderStatus.PENDING, OrderStatus.PENDING_SIGNATURE)
+# A status outside TRANSITIONS (free text from before the state machine) can still be closed
+LEGACY_EXITS = {OrderStatus.COMPLETED, OrderStatus.CANCELLED}
+
+
+class InvalidTransition(Exception):
+    """An order status change the state machine does not allow."""
+
+    def __init__(self, from_status, to_status, order_id=None):
+        label = f"order {order_id}" if order_id is not None else "order"
+        if from_status is None:
+            message = f"New {label} cannot start as '{to_status}'. Allowed: {', '.join(INITIAL_STATES)}"
+        else:
+            allowed = ', '.join(sorted(TRANSITIONS.get(from_status, LEGACY_EXITS))) or 'none (final state)'
+            message = f"Cannot move {label} from '{from_status}' to '{to_status}'. Allowed: {allowed}"
+        super().__init__(message)
+        self.message = message
+
+
+def check_transition(from_status, to_status, order_id=None):
+    """
+    Raise InvalidTransition unless from_status -> to_status is allowed (from_status None = creation).
+    A from_status the state machine doesn't know may only move to LEGACY_EXITS.
+    """
+    if from_status is None:
+        if to_status not in INITIAL_STATES:
+            raise InvalidTransition(None, to_status, order_id)
+    elif to_status not in TRANSITIONS.get(from_status, LEGACY_EXITS):
+        raise InvalidTransition(from_status, to_status, order_id)
+
+
+def set_actor(session, user_id):
+    """Record who is changing orders in this session; stamped as by_id on logged transitions."""
+    session.info['order_actor_id'] = user_id
+
+
+def log_transitions(session, items, by_id=None, now=None):
+    """
+    Append one log row per (order_id, from_status, to_status) in 'items' on the session's
+    current transaction. Used directly by set-based paths (batch create, batch sign) that
+    change status without loading Order objects.
+    """
+    now = now or datetime.utcnow()
+    rows = [{"order_id": order_id, "from_status": from_status, "to_status": to_status, "at": now, "by_id": by_id}
+            for order_id, from_status, to_status in items]
+    if rows:
+        # Core insert on the flush's own connection: safe inside after_flush, and never re-enters the ORM
+        session.connection().execute(OrderTransition.__table__.insert(), rows)
+    return len(rows)
+
+
+@event.listens_for(Session, 'before_flush')
+def _check_flushed(session, flush_context, instances):
+    """ORM path: validate status on new and changed Orders; the log rows are written once ids exist."""
+    pending = session.info.setdefault('order_transitions', [])
+    for obj in session.new:
+        if isinstance(obj, Order):
+            obj.status = obj.status or OrderStatus.PENDING
+            check_transition(None, obj.status)
+            pending.append((obj, None, obj.status))
+    for obj in session.dirty:
+        if not isinstance(obj, Order):
+            continue
+        history = inspect(obj).attrs.status.history
+        if not history.has_changes():
+            continue
+        if history.deleted:
+            old = history.deleted[0]
+        else: # Status was expired before being set: read the stored value (autoflush is off during flush)
+            old = session.execute(select(Order.status).where(Order.id == obj.id)).scalar()
+        if old != obj.status:
+            check_transition(old, obj.status, obj.id)
+            pending.append((obj, old, obj.status))
+
+
+@event.listens_for(Session, 'after_flush')
+def _log_flushed(session, flush_context):
+    pending = session.info.pop('order_transitions', None)
+    if pending:
+        log_transitions(session, [(obj.id, old, new) for obj, old, new in pending], session.info.get('order_actor_id'))
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard(session, previous_transaction):
+    session.info.pop('order_transitions', None)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _guard_bulk(orm_execute_state):
+    """
+    Bulk statements bypass the flush checks: the log may only be appended to, and a bulk
+    UPDATE of Order.status must declare that it logged its own transitions.
+    """
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+    if mapper.class_ is OrderTransition:
+        raise RuntimeError("order_transition is append-only")
+    if mapper.class_ is Order and orm_execute_state.is_update \
+            and not orm_execute_state.execution_options.get('order_transitions_logged'):
+        values = getattr(orm_execute_state.statement, '_values', None) or {}
+        params = orm_execute_state.parameters
+        rows = params if isinstance(params, list) else [params or {}]
+        if any(getattr(column, 'key', column) == 'status' for column in values) or any('status' in row for row in rows):
+            raise RuntimeError("Bulk Order.status updates must log transitions (services.order_states.log_transitions) "
+                               "and set execution_options(order_transitions_logged=True)")
+
+
+@event.listens_for(OrderTransition, 'before_update')
+@event.listens_for(OrderTransition, 'before_delete')
+def _append_only(mapper, connection, target):
+    raise RuntimeError("order_transition is append-only")
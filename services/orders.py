@@ -0,0 +1,229 @@
+# services/orders.py
+
+import base64
+import binascii
+import hashlib
+import re
+from datetime import datetime, timedelta
+from marshmallow import ValidationError
+from sqlalchemy import event, func, insert, select, tuple_, update
+from constants import OrderStatus
+from extensions import db
+from models.models import Admission, Order, Patient, User
+from schemas import order_batch_item_schema
+from services.order_states import INITIAL_STATES, log_transitions
+
+MAX_BATCH_ORDERS = 200
+USER_REFERENCES = ('responsible_attending_id',) # Order columns that point at User rows
+DUPLICATE_POLICIES = ('off', 'warn', 'block')
+
+_NON_WORD = re.compile(r'[^a-z0-9.]+')
+_DOSE = re.compile(r'(\d+(?:\.\d+)?)\s*(mcg|mg|g|ml|units?|iu|meq|mmol)\b')
+_ROUTES = frozenset(('po', 'iv', 'im', 'sc', 'subcut', 'sl', 'pr', 'inh', 'top'))
+
+
+def order_set_items(order_set):
+    """Order fields for each item of an OrderSet, in position order."""
+    return [{"order_type": item.order_type, "order_name": item.order_name, "order_details": item.order_details}
+            for item in order_set.items]
+
+
+def validate_order_batch(items, defaults=None):
+    """
+    Validate a list of order dicts in one pass: schema checks per item, then every
+    referenced user resolved with a single IN query.
+    Returns (rows, errors): insert-ready dicts, and {index: messages} for the items that failed.
+    """
+    rows, errors = [], {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[index] = {"_schema": ["Each order must be an object."]}
+            rows.append(None)
+            continue
+        try:
+            row = order_batch_item_schema.load(dict(defaults or {}, **item))
+            row['status'] = row.get('status') or OrderStatus.PENDING
+            if row['status'] not in INITIAL_STATES:
+                raise ValidationError({"status": [f"New orders must start as one of: {', '.join(INITIAL_STATES)}."]})
+        except ValidationError as err:
+            errors[index] = err.messages
+            row = None
+        rows.append(row)
+
+    referenced = {row[column] for row in rows if row for column in USER_REFERENCES if row.get(column) is not None}
+    if referenced:
+        existing = set(db.session.execute(select(User.id).where(User.id.in_(referenced))).scalars())
+        for index, row in enumerate(rows):
+            for column in USER_REFERENCES:
+                if row and row.get(column) is not None and row[column] not in existing:
+                    errors.setdefault(index, {})[column] = ["Does not refer to an existing user."]
+    return rows, errors
+
+
+def create_order_batch(admission_id, rows, created_by_id=None):
+    """
+    Insert validated order rows for one admission as a single INSERT ... RETURNING, and their
+    creation transitions as one more, in the current transaction (the caller commits).
+    Returns the new ids in input order.
+    """
+    rows = [dict(row, admission_id=admission_id,
+                 signature=order_signature(admission_id, row['order_type'], row['order_name'], row.get('order_details')))
+            for row in rows]
+    stmt = insert(Order).returning(Order.id, sort_by_parameter_order=True)
+    ids = list(db.session.execute(stmt, rows).scalars())
+    log_transitions(db.session, [(order_id, None, row['status']) for order_id, row in zip(ids, rows)], created_by_id)
+    return ids
+
+
+# --- Duplicate detection ---
+
+def normalize_text(value):
+    """Lower-case, punctuation folded to single spaces: 'CBC w/ Diff' == 'cbc  w diff'."""
+    return _NON_WORD.sub(' ', (value or '').lower()).strip()
+
+
+def key_details(order_type, order_details):
+    """
+    The part of order_details that makes two orders different. Free text (indication,
+    notes) is ignored; for medications the dose(s) and route are kept, so 81 mg PO and
+    325 mg PO aspirin are distinct orders.
+    """
+    if normalize_text(order_type) != 'medication':
+        return ''
+    text = normalize_text(order_details)
+    doses = [f"{float(amount):g}{unit.rstrip('s')}" for amount, unit in _DOSE.findall(text)]
+    routes = sorted(_ROUTES.intersection(text.split()))
+    return ' '.join(doses + routes)
+
+
+def order_signature(admission_id, order_type, order_name, order_details=None):
+    """Stable 128-bit hex digest of what makes an order a duplicate of another."""
+    parts = (str(admission_id), normalize_text(order_type), normalize_text(order_name),
+             key_details(order_type, order_details))
+    return hashlib.sha256('\x1f'.join(parts).encode()).hexdigest()[:32]
+
+
+@event.listens_for(Order, 'before_insert')
+@event.listens_for(Order, 'before_update')
+def _stamp_signature(mapper, connection, target):
+    # ORM path; create_order_batch sets it on its rows since bulk INSERTs skip mapper events
+    target.signature = order_signature(target.admission_id, target.order_type, target.order_name, target.order_details)
+
+
+def find_duplicates(signatures, window_minutes, now=None):
+    """
+    Open orders (not cancelled) placed in the last 'window_minutes' whose signature is
+    in 'signatures': one IN lookup on ix_order_signature_date.
+    Returns {signature: [order summary, ...]}, most recent first.
+    """
+    signatures = set(signatures)
+    if not signatures:
+        return {}
+    since = (now or datetime.utcnow()) - timedelta(minutes=window_minutes)
+    stmt = select(Order.id, Order.signature, Order.order_name, Order.order_date, Order.status,
+                  Order.responsible_attending_id)\
+        .where(Order.signature.in_(signatures), Order.order_date >= since,
+               Order.status != OrderStatus.CANCELLED)\
+        .order_by(Order.order_date.desc(), Order.id.desc())
+    found = {}
+    for row in db.session.execute(stmt):
+        found.setdefault(row.signature, []).append({
+            "order_id": row.id, "order_name": row.order_name, "status": row.status,
+            "order_date": row.order_date.isoformat() if row.order_date else None,
+            "responsible_attending_id": row.responsible_attending_id})
+    return found
+
+
+def check_duplicates(admission_id, rows, window_minutes, now=None):
+    """
+    Duplicate report for order rows about to be created for one admission: each row's
+    signature is looked up against recent orders and against the rows before it in the
+    same request. Returns a list of {index, order_name, duplicate_of, duplicate_of_items}
+    for the rows that match anything (empty when none do).
+    """
+    signatures = [order_signature(admission_id, row.get('order_type'), row.get('order_name'), row.get('order_details'))
+                  for row in rows]
+    existing = find_duplicates(signatures, window_minutes, now)
+    duplicates, first_index = [], {}
+    for index, (row, signature) in enumerate(zip(rows, signatures)):
+        earlier = first_index.setdefault(signature, index)
+        entry = {"index": index, "order_name": row.get('order_name'),
+                 "duplicate_of": existing.get(signature, []),
+                 "duplicate_of_items": [earlier] if earlier != index else []}
+        if entry["duplicate_of"] or entry["duplicate_of_items"]:
+            duplicates.append(entry)
+    return duplicates
+
+
+# --- Pending-signature worklist ---
+
+def encode_cursor(order_date, order_id):
+    """Opaque keyset cursor for the row after which the next page starts."""
+    return base64.urlsafe_b64encode(f"{order_date.isoformat()}|{order_id}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(order_date, order_id) from encode_cursor. Raises ValueError if malformed."""
+    try:
+        order_date, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(order_date), int(order_id)
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(str(e))
+
+
+def pending_signature_worklist(attending_id, limit=50, cursor=None):
+    """
+    One page of orders awaiting 'attending_id's signature, oldest first, with patient context.
+    Keyset pagination on (order_date, id) walks the partial index ix_order_pending_signature,
+    so every page costs the same however deep the list is.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    stmt = select(
+        Order.id, Order.admission_id, Order.order_type, Order.order_name, Order.order_details, Order.order_date,
+        Admission.patient_id, Patient.mrn, Patient.first_name, Patient.last_name, Patient.location_bed
+    ).join(Admission, Order.admission_id == Admission.id)\
+        .join(Patient, Admission.patient_id == Patient.id)\
+        .where(Order.responsible_attending_id == attending_id, Order.status == OrderStatus.PENDING_SIGNATURE)\
+        .order_by(Order.order_date, Order.id)\
+        .limit(limit + 1)
+    if cursor is not None:
+        stmt = stmt.where(tuple_(Order.order_date, Order.id) > tuple_(*cursor))
+    rows = [dict(row._mapping) for row in db.session.execute(stmt)]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["order_date"], rows[-1]["id"])
+    return rows, next_cursor
+
+
+def pending_signature_count(attending_id):
+    return db.session.execute(
+        select(func.count()).select_from(Order)
+        .where(Order.responsible_attending_id == attending_id, Order.status == OrderStatus.PENDING_SIGNATURE)
+    ).scalar()
+
+
+def sign_orders(ids, attending_id, now=None):
+    """
+    Sign every order in 'ids' that is still PendingSignature and belongs to 'attending_id'
+    with one set-based UPDATE. Returns the ids that changed; the caller commits.
+    """
+    if not ids:
+        return []
+    now = now or datetime.utcnow()
+    condition = (Order.id.in_(ids), Order.status == OrderStatus.PENDING_SIGNATURE,
+                 Order.responsible_attending_id == attending_id)
+    stmt = update(Order).where(*condition)\
+        .values(status=OrderStatus.SIGNED, signed_at=now, signed_by_id=attending_id)\
+        .execution_options(synchronize_session=False, order_transitions_logged=True)
+
+    if db.engine.dialect.update_returning:
+        signed = db.session.execute(stmt.returning(Order.id)).scalars().all()
+    else:
+        # No UPDATE ... RETURNING: lock the candidate rows first, then update exactly those.
+        signed = db.session.execute(select(Order.id).where(*condition).with_for_update()).scalars().all()
+        if signed:
+            db.session.execute(stmt.where(Order.id.in_(signed)))
+    log_transitions(db.session, [(order_id, OrderStatus.PENDING_SIGNATURE, OrderStatus.SIGNED) for order_id in signed],
+                    attending_id, now)
+    return sorted(signed)
@@ -0,0 +1,147 @@
+# services/passwords.py
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt' # werkzeug's default; e.g. 'scrypt:65536:8:1' or 'pbkdf2:sha256:1000000' to change the cost
+
+
+class HasherBusy(Exception):
+    """The password hashing pool is saturated (queue full or timed out); the caller should retry shortly."""
+
+
+class PasswordHashStats:
+    """Outcome counters and rolling queue-wait / hashing timings for the password hasher."""
+
+    def __init__(self, window=5000):
+        self._lock = threading.Lock()
+        self._wait = deque(maxlen=window)
+        self._work = deque(maxlen=window)
+        self.hashed = 0
+        self.verified = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.rehashed = 0
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def record(self, name, wait, work):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+            self._wait.append(wait)
+            self._work.append(work)
+
+    def snapshot(self):
+        with self._lock:
+            wait, work = sorted(self._wait), sorted(self._work)
+            counts = {name: getattr(self, name) for name in ('hashed', 'verified', 'rejected', 'timed_out', 'rehashed')}
+
+        def pct(values, p):
+            if not values:
+                return None
+            return round(values[min(len(values) - 1, int(p / 100.0 * len(values)))] * 1000, 3)
+
+        return dict(counts,
+                    queue_wait_ms={"p50": pct(wait, 50), "p95": pct(wait, 95), "max": pct(wait, 100)},
+                    hash_ms={"p50": pct(work, 50), "p95": pct(work, 95), "max": pct(work, 100)})
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords in a bounded thread pool, off the request worker's CPU.
+
+    werkzeug's scrypt/PBKDF2 run in hashlib, which releases the GIL, so threads hash in
+    parallel. At most 'workers' hashes run at once and 'max_queue' more may wait; beyond
+    that, or after 'timeout' seconds, HasherBusy is raised so a login storm gets fast
+    503s instead of tying up every web worker. 'method' is the werkzeug method string
+    (algorithm and cost) for new hashes; stored hashes made with anything else report
+    needs_rehash() so login can upgrade them.
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, workers=None, max_queue=32, timeout=10.0):
+        self.method = method
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.stats = PasswordHashStats()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._slots = None
+        self._prefix = {} # method -> canonical prefix of its hashes, e.g. 'scrypt:32768:8:1'
+
+    def init_app(self, app):
+        self.shutdown()
+        self.method = app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS') or self.workers
+        self.max_queue = app.config.get('PASSWORD_HASH_QUEUE', self.max_queue)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT_SECONDS', self.timeout)
+        app.extensions['password_hasher'] = self
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+                self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+            return self._pool, self._slots
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool, self._slots = self._pool, None, None
+        if pool:
+            pool.shutdown()
+
+    def _submit(self, counter, fn, *args):
+        pool, slots = self._executor()
+        if not slots.acquire(blocking=False):
+            self.stats.count('rejected')
+            raise HasherBusy("Password hashing queue is full")
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self.stats.record(counter, started - submitted, time.perf_counter() - started)
+
+        try:
+            future = pool.submit(timed)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda f: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel() # Frees the slot at once if it never started
+            self.stats.count('timed_out')
+            raise HasherBusy(f"Password hashing took longer than {self.timeout}s")
+
+    def hash(self, password):
+        return self._submit('hashed', generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._submit('verified', check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if 'password_hash' was not made with the configured method and cost."""
+        method = self.method
+        if method not in self._prefix:
+            # werkzeug expands defaults ('scrypt' -> 'scrypt:32768:8:1'); read them off a real hash once
+            self._prefix[method] = generate_password_hash('', method).split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._prefix[method]
+
+    def snapshot(self):
+        slots = self._slots
+        in_use = (self.workers + self.max_queue - slots._value) if slots is not None else 0
+        return dict(self.stats.snapshot(), method=self.method, workers=self.workers,
+                    max_queue=self.max_queue, in_use=in_use, timeout_seconds=self.timeout)
+
+
+password_hasher = PasswordHasher()
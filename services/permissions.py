@@ -0,0 +1,94 @@
+# services/permissions.py
+
+from constants import Permissions, Roles
+
+# Permissions each role grants on top of its own role bit
+ROLE_PERMISSIONS = {
+    Roles.ADMIN: (Permissions.VIEW_METRICS, Permissions.REVOKE_TOKENS, Permissions.MANAGE_UPLOADS),
+    Roles.IT_SUPPORT: (Permissions.VIEW_METRICS,),
+    Roles.SECURITY: (Permissions.REVOKE_TOKENS,),
+}
+
+
+def _constants(cls):
+    """String constants of a constants class, in declaration order."""
+    return [value for name, value in vars(cls).items() if name.isupper() and isinstance(value, str)]
+
+
+class PermissionRegistry:
+    """
+    Roles and permissions compiled into one integer bitmask space at import: every role
+    and every permission owns a bit. A user's effective mask (their role bits plus the
+    permission bits those roles grant) is computed once per distinct role string and
+    stored on the cached identity; a route's requirement is compiled when it is
+    decorated, so each authorization check is a single AND.
+    User.role may list several roles separated by commas ('Doctor,Radiologist').
+    Masks are process-local and never stored; only role names are persisted.
+    """
+
+    def __init__(self, roles, permissions, role_permissions):
+        self.roles = roles
+        self.permissions = permissions
+        self._role_set = frozenset(roles)
+        self.bits = {name: 1 << i for i, name in enumerate(roles + permissions)}
+        self._grants = {role: self.bits[role] | self.mask(granted) for role, granted in role_permissions.items()}
+        self._by_role_string = {}
+
+    def mask(self, names):
+        """Bitmask for role and/or permission names. Unknown names raise KeyError (caught at decoration time)."""
+        mask = 0
+        for name in names:
+            mask |= self.bits[name]
+        return mask
+
+    def effective_mask(self, role):
+        """Role bits plus granted permission bits for a User.role string (memoized per distinct string)."""
+        mask = self._by_role_string.get(role)
+        if mask is None:
+            mask = 0
+            for name in (role or '').split(','):
+                name = name.strip()
+                if name in self._role_set: # Unknown roles (e.g. 'User') grant nothing
+                    mask |= self._grants.get(name, self.bits[name])
+            self._by_role_string[role] = mask
+        return mask
+
+    def mask_of(self, identity):
+        """Effective mask of current_user: precomputed on identities, derived for ORM User objects."""
+        try:
+            return identity.permission_mask
+        except AttributeError:
+            return self.effective_mask(getattr(identity, 'role', None))
+
+    def allows(self, identity, required_mask):
+        return bool(self.mask_of(identity) & required_mask)
+
+    def names(self, mask):
+        """(roles, permissions) whose bits are set in 'mask'."""
+        return ([r for r in self.roles if mask & self.bits[r]],
+                [p for p in self.permissions if mask & self.bits[p]])
+
+    def roles_allowed(self, required_mask):
+        """Single roles that pass a check against 'required_mask'."""
+        return [r for r in self.roles if self.effective_mask(r) & required_mask]
+
+    def route_report(self, app):
+        """
+        Every URL rule with the roles/permissions it requires and the single roles that pass;
+        rules without a roles_required/permission_required check have None for all three.
+        """
+        report = []
+        for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+            view = app.view_functions.get(rule.endpoint)
+            required = getattr(view, 'required_mask', None)
+            entry = {"rule": rule.rule, "endpoint": rule.endpoint,
+                     "methods": sorted(rule.methods - {'HEAD', 'OPTIONS'}),
+                     "required_roles": None, "required_permissions": None, "allowed_roles": None}
+            if required is not None:
+                entry["required_roles"], entry["required_permissions"] = self.names(required)
+                entry["allowed_roles"] = self.roles_allowed(required)
+            report.append(entry)
+        return report
+
+
+permissions = PermissionRegistry(_constants(Roles), _constants(Permissions), ROLE_PERMISSIONS)
@@ -0,0 +1,203 @@
+# services/previews.py
+
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from sqlalchemy import func, select, update
+from extensions import db
+from models.models import Imaging
+from services.blob_store import blob_store
+from services.image_render import UnsupportedImage, render_derivatives
+
+DERIVATIVE_SIZES = (('thumbnail', 128), ('preview', 512)) # (name, max edge in pixels)
+STAGES = ('queue_wait', 'decode', 'resize', 'encode', 'store')
+
+
+class PreviewStats:
+    """Outcome counters and rolling per-stage timings for the preview pipeline."""
+
+    def __init__(self, window=5000):
+        self._lock = threading.Lock()
+        self._timings = {stage: deque(maxlen=window) for stage in STAGES}
+        self.in_flight = 0
+        self.ready = 0
+        self.failed = 0
+        self.unsupported = 0
+
+    def record(self, status, timings):
+        with self._lock:
+            setattr(self, status, getattr(self, status) + 1)
+            for stage, seconds in timings.items():
+                self._timings[stage].append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            timings = {stage: sorted(values) for stage, values in self._timings.items()}
+            counts = {"in_flight": self.in_flight, "ready": self.ready,
+                      "failed": self.failed, "unsupported": self.unsupported}
+
+        def pct(values, p):
+            if not values:
+                return None
+            return round(values[min(len(values) - 1, int(p / 100.0 * len(values)))] * 1000, 3)
+
+        return dict(counts, stage_ms={
+            stage: {"p50": pct(values, 50), "p95": pct(values, 95), "max": pct(values, 100)}
+            for stage, values in timings.items()
+        })
+
+
+def preview_backlog():
+    """Imaging rows waiting for derivatives (the queue lives in the table), read with one query."""
+    count, oldest = db.session.execute(
+        select(func.count(), func.min(Imaging.image_date)).where(Imaging.preview_status == 'pending')
+    ).one()
+    return {"pending": count, "oldest_pending_image_date": oldest.isoformat() if oldest else None}
+
+
+class PreviewPipeline:
+    """
+    Builds thumbnails/previews and reads basic metadata for Imaging blobs.
+
+    Rows with preview_status='pending' are the queue. A loop thread keeps up to
+    2 x workers decodes in flight in a process pool (decoding and resizing are
+    CPU-bound and must not run on web workers), then stores each result's
+    derivatives in the blob store and updates its row. A row is only marked
+    ready/failed/unsupported after processing, so rows in flight when the process
+    stops are picked up again on the next start.
+    """
+
+    def __init__(self, workers=2, poll_interval=2.0):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stats = PreviewStats()
+        self._pool = None
+        self._in_flight = {} # future -> (imaging_id, source blob digest, submitted_at)
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def _open_pool(self):
+        # 'spawn': children import only services.image_render, never the app's DB connections
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def _submit_pending(self):
+        capacity = 2 * self.workers - len(self._in_flight)
+        if capacity <= 0:
+            return 0
+        busy = [imaging_id for imaging_id, _, _ in self._in_flight.values()]
+        stmt = select(Imaging.id, Imaging.blob_digest, Imaging.content_type)\
+            .where(Imaging.preview_status == 'pending', Imaging.blob_digest.isnot(None))\
+            .order_by(Imaging.id)\
+            .limit(capacity)
+        if busy:
+            stmt = stmt.where(Imaging.id.notin_(busy))
+        rows = db.session.execute(stmt).all()
+        db.session.commit() # End the read transaction; results are written in new ones
+        for imaging_id, digest, content_type in rows:
+            # Local blobs are opened by the child; other backends ship the bytes
+            source = blob_store.local_path(digest)
+            if source is None:
+                with blob_store.open(digest) as f:
+                    source = f.read()
+            future = self._pool.submit(render_derivatives, source, content_type, DERIVATIVE_SIZES)
+            self._in_flight[future] = (imaging_id, digest, time.perf_counter())
+        self.stats.in_flight = len(self._in_flight)
+        return len(rows)
+
+    def _store(self, future, imaging_id, digest, submitted_at):
+        timings = {"queue_wait": 0.0}
+        values = {}
+        error = future.exception()
+        if isinstance(error, UnsupportedImage):
+            status = 'unsupported'
+        elif error is not None:
+            status = 'failed'
+            print(f"Error rendering previews for imaging {imaging_id}: {error}")
+        else:
+            out = future.result()
+            timings.update(out["timings"])
+            started = time.perf_counter()
+            for name, data in out["derivatives"].items():
+                values[f"{name}_digest"] = blob_store.put_bytes(data, 'image/jpeg').digest
+            timings["store"] = time.perf_counter() - started
+            values.update(width=out["width"], height=out["height"], frame_count=out["frames"])
+            status = 'ready'
+        # Time not spent in a stage inside the worker was spent waiting for one
+        timings["queue_wait"] = max(0.0, time.perf_counter() - submitted_at - sum(timings.values()))
+        db.session.execute(
+            update(Imaging)
+            # Skip if the file was replaced meanwhile: replacing resets the status to 'pending'
+            # too, so only the source digest tells derivatives of the old blob from the new
+            .where(Imaging.id == imaging_id, Imaging.preview_status == 'pending', Imaging.blob_digest == digest)
+            .values(preview_status=status, **values)
+            .execution_options(synchronize_session=False)
+        )
+        self.stats.record(status, timings)
+
+    def run_once(self, timeout=None):
+        """Top up the pool, then store whatever finishes within 'timeout'. Needs an app context; returns rows stored."""
+        self._submit_pending()
+        if not self._in_flight:
+            return 0
+        done, _ = wait(list(self._in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            imaging_id, digest, submitted_at = self._in_flight.pop(future)
+            self._store(future, imaging_id, digest, submitted_at)
+        db.session.commit()
+        self.stats.in_flight = len(self._in_flight)
+        return len(done)
+
+    def drain(self):
+        """Process everything pending now, then return (used by preview_worker.py --once)."""
+        owns_pool = self._pool is None
+        if owns_pool:
+            self._pool = self._open_pool()
+        try:
+            total = 0
+            while True:
+                stored = self.run_once()
+                if not stored and not self._in_flight:
+                    return total
+                total += stored
+        finally:
+            if owns_pool:
+                self._pool.shutdown()
+                self._pool = None
+
+    # --- Background operation ---
+
+    def start(self, app):
+        self._stopping.clear()
+        self._pool = self._open_pool()
+        self._thread = threading.Thread(target=self._run, args=(app,), name='imaging-previews', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._pool:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+            self._in_flight.clear()
+
+    def _run(self, app):
+        with app.app_context():
+            while not self._stopping.is_set():
+                try:
+                    stored = self.run_once(timeout=self.poll_interval)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error in imaging preview pipeline: {e}")
+                    stored = 0
+                finally:
+                    db.session.remove()
+                if not stored and not self._in_flight:
+                    self._stopping.wait(self.poll_interval)
+
+
+preview_pipeline = PreviewPipeline()
@@ -0,0 +1,239 @@
+# services/reference_ranges.py
+
+import re
+import threading
+from datetime import datetime
+from bisect import bisect_right
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+from extensions import db
+from models.models import Admission, Patient, ReferenceRange, Result
+from services.model_events import mark_touched
+from services.notifications import enqueue
+
+# '4.2', '4.2 mmol/L', '<0.01 ng/mL', '>= 90 mL/min/1.73m2', '12%'
+_NUMERIC_VALUE = re.compile(
+    r'^\s*(?:<=|>=|<|>)?\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*'
+    r'([A-Za-z%µ/][^\s]*)?\s*$'
+)
+UNIT_MAX_LEN = 32
+
+
+def parse_result_value(raw):
+    """Raw result string -> (numeric_value, unit). Non-numeric results give (None, None)."""
+    if raw is None:
+        return None, None
+    match = _NUMERIC_VALUE.match(str(raw))
+    if not match:
+        return None, None
+    unit = match.group(2)
+    return float(match.group(1)), (unit[:UNIT_MAX_LEN] if unit else None)
+
+
+def normalize_sex(sex):
+    initial = (sex or '').strip()[:1].upper()
+    return initial if initial in ('M', 'F') else None
+
+
+def age_in_years(dob, at):
+    if dob is None or at is None:
+        return None
+    return at.year - dob.year - ((at.month, at.day) < (dob.month, dob.day))
+
+
+class RangeBand:
+    """Plain snapshot of one reference_range row, shared read-only across requests."""
+    COLUMNS = (ReferenceRange.test_name, ReferenceRange.sex, ReferenceRange.age_min_years,
+               ReferenceRange.age_max_years, ReferenceRange.unit, ReferenceRange.low,
+               ReferenceRange.high, ReferenceRange.critical_low, ReferenceRange.critical_high)
+    __slots__ = ('test_name', 'sex', 'age_min_years', 'age_max_years', 'unit',
+                 'low', 'high', 'critical_low', 'critical_high')
+
+    def __init__(self, test_name, sex, age_min_years, age_max_years, unit, low, high, critical_low, critical_high):
+        self.test_name = test_name
+        self.sex = sex
+        self.age_min_years = age_min_years or 0
+        self.age_max_years = age_max_years
+        self.unit = unit
+        self.low = low
+        self.high = high
+        self.critical_low = critical_low
+        self.critical_high = critical_high
+
+
+class ReferenceRangeIndex:
+    """
+    In-memory index over the reference_range table.
+
+    Ranges are grouped by (test_name, sex) and sorted by age_min_years, so a
+    lookup is one dict probe plus a binary search over the age bands.
+    Sex-specific bands win over sex-neutral ones. Reloaded lazily after any
+    committed ReferenceRange change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bands = None # (test_name_lower, sex) -> (age_mins, ranges)
+
+    def init_app(self, app):
+        event.listen(Session, 'after_flush', _note_range_changes)
+        event.listen(Session, 'after_commit', self._after_commit)
+        app.extensions['reference_ranges'] = self
+
+    def _after_commit(self, session):
+        if session.info.pop('reference_ranges_changed', False):
+            self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            self._bands = None
+
+    def _load(self):
+        grouped = {}
+        for row in db.session.execute(select(*RangeBand.COLUMNS)):
+            band = RangeBand(*row)
+            grouped.setdefault((band.test_name.strip().lower(), normalize_sex(band.sex)), []).append(band)
+        bands = {}
+        for key, ranges in grouped.items():
+            ranges.sort(key=lambda r: r.age_min_years)
+            bands[key] = ([r.age_min_years for r in ranges], ranges)
+        return bands
+
+    def lookup(self, test_name, sex=None, age=None):
+        """Best matching RangeBand for a test/sex/age, or None."""
+        with self._lock:
+            if self._bands is None:
+                self._bands = self._load()
+            bands = self._bands
+        name = (test_name or '').strip().lower()
+        for key_sex in ((normalize_sex(sex), None) if normalize_sex(sex) else (None,)):
+            entry = bands.get((name, key_sex))
+            if not entry:
+                continue
+            age_mins, ranges = entry
+            if age is None:
+                # Unknown age: only an all-ages band can apply
+                candidates = [r for r in ranges if not r.age_min_years and r.age_max_years is None]
+                if candidates:
+                    return candidates[0]
+                continue
+            i = bisect_right(age_mins, age) - 1
+            while i >= 0:
+                rng = ranges[i]
+                if rng.age_max_years is None or age < rng.age_max_years:
+                    return rng
+                i -= 1
+        return None
+
+
+def flag_value(value, rng):
+    """(abnormal_flag, is_abnormal, is_critical) for a numeric value against a range."""
+    if rng.critical_low is not None and value <= rng.critical_low:
+        return 'LL', True, True
+    if rng.critical_high is not None and value >= rng.critical_high:
+        return 'HH', True, True
+    if rng.low is not None and value < rng.low:
+        return 'L', True, False
+    if rng.high is not None and value > rng.high:
+        return 'H', True, False
+    return 'N', False, False
+
+
+def evaluate(test_name, raw_value, sex, age):
+    """
+    Parse a raw value and flag it against the matching reference range.
+    Returns a dict of Result column values (numeric_value, unit, abnormal_flag, is_abnormal, is_critical).
+    """
+    numeric, unit = parse_result_value(raw_value)
+    out = {"numeric_value": numeric, "unit": unit, "abnormal_flag": None,
+           "is_abnormal": False, "is_critical": False}
+    if numeric is None:
+        return out
+    rng = reference_ranges.lookup(test_name, sex, age)
+    # A range recorded in a different unit cannot be compared safely.
+    if rng is None or (rng.unit and unit and rng.unit.lower() != unit.lower()):
+        return out
+    out["abnormal_flag"], out["is_abnormal"], out["is_critical"] = flag_value(numeric, rng)
+    return out
+
+
+def annotate_result(result, client_critical=False):
+    """
+    Fill parsed/flag columns on a single Result instance before commit. 'client_critical' is
+    the is_critical the client sent in this request, if any: a critical flag it sets is kept,
+    otherwise is_critical is the computed flag (an updated value can clear it).
+    """
+    row = db.session.execute(
+        select(Patient.sex, Patient.dob)
+        .join(Admission, Admission.patient_id == Patient.id)
+        .where(Admission.id == result.admission_id)
+    ).first()
+    sex, dob = row if row else (None, None)
+    at = result.result_date or datetime.utcnow() # Column default not applied until flush
+    flags = evaluate(result.test_name, result.result_value, sex, age_in_years(dob, at))
+    for column, value in flags.items():
+        setattr(result, column, value)
+    result.is_critical = bool(client_critical) or flags["is_critical"]
+    return result
+
+
+def annotate_rows(rows, demographics):
+    """
+    Batch form of annotate_result for insert mappings.
+    demographics: admission_id -> (sex, dob). Mutates and returns rows.
+    """
+    for row in rows:
+        sex, dob = demographics.get(row["admission_id"], (None, None))
+        flags = evaluate(row["test_name"], row["result_value"], sex, age_in_years(dob, row.get("result_date")))
+        client_critical = bool(row.get("is_critical"))
+        row.update(flags)
+        row["is_critical"] = client_critical or flags["is_critical"]
+    return rows
+
+
+def backfill_result_values(chunk_size=1000, only_missing=True):
+    """
+    Parse and flag existing Result rows in primary-key chunks (keyset pagination),
+    committing each chunk. Yields (rows_updated, last_id) after every chunk.
+    Rows that become critical get their notification outbox rows in the chunk's
+    transaction, and the chunk's admissions are reported to the result caches.
+    """
+    last_id = 0
+    while True:
+        stmt = select(Result.id, Result.admission_id, Result.test_name, Result.result_value,
+                      Result.result_date, Result.is_critical, Patient.sex, Patient.dob)\
+            .join(Admission, Result.admission_id == Admission.id)\
+            .join(Patient, Admission.patient_id == Patient.id)\
+            .where(Result.id > last_id)\
+            .order_by(Result.id)\
+            .limit(chunk_size)
+        if only_missing:
+            stmt = stmt.where(Result.numeric_value.is_(None), Result.abnormal_flag.is_(None))
+        chunk = db.session.execute(stmt).all()
+        if not chunk:
+            break
+        updates, newly_critical = [], []
+        for rid, admission_id, test_name, raw, result_date, is_critical, sex, dob in chunk:
+            flags = evaluate(test_name, raw, sex, age_in_years(dob, result_date))
+            if flags["is_critical"] and not is_critical:
+                newly_critical.append((rid, admission_id))
+            flags["is_critical"] = bool(is_critical) or flags["is_critical"]
+            flags["id"] = rid
+            updates.append(flags)
+        # ORM bulk UPDATE by primary key: bypasses the flush hooks, so report its scope and outbox rows here
+        db.session.execute(update(Result).execution_options(track_touched=False), updates)
+        mark_touched(db.session, Result, {row[1] for row in chunk})
+        enqueue(db.session, 'result', newly_critical)
+        db.session.commit()
+        last_id = chunk[-1][0]
+        yield len(updates), last_id
+
+
+def _note_range_changes(session, flush_context):
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, ReferenceRange):
+            session.info['reference_ranges_changed'] = True
+            return
+
+
+reference_ranges = ReferenceRangeIndex()
@@ -0,0 +1,309 @@
+# services/result_ingest.py
+
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from datetime import datetime
+from sqlalchemy import insert, select
+from extensions import db
+from models.models import Admission, Patient, Result
+from services.census import census
+from services.delta_checks import apply_delta_checks
+from services.hl7 import HL7ParseError, parse_message
+from services.notifications import enqueue
+from services.reference_ranges import annotate_rows
+
+RESULT_VALUE_MAX_LEN = 100 # Result.result_value is String(100)
+
+
+class PatientLookupCache:
+    """
+    Bounded MRN -> (patient_id, sex, dob) cache. All misses of a batch are resolved with one IN query.
+    Sex and date of birth ride along for reference-range selection.
+    """
+
+    def __init__(self, max_size=50000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, mrns):
+        found, missing = {}, []
+        with self._lock:
+            for mrn in mrns:
+                patient = self._entries.get(mrn)
+                if patient is None:
+                    missing.append(mrn)
+                else:
+                    self._entries.move_to_end(mrn)
+                    found[mrn] = patient
+        if missing:
+            rows = db.session.execute(
+                select(Patient.mrn, Patient.id, Patient.sex, Patient.dob).where(Patient.mrn.in_(missing))
+            ).all()
+            with self._lock:
+                for mrn, patient_id, sex, dob in rows:
+                    found[mrn] = self._entries[mrn] = (patient_id, sex, dob)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return found
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class IngestStats:
+    """Throughput counters and a rolling window of end-to-end latencies (parse -> commit)."""
+
+    def __init__(self, latency_window=10000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.messages_ingested = 0
+            self.messages_rejected = 0
+            self.results_inserted = 0
+            self.delta_flagged = 0
+            self.batches = 0
+            self.busy_seconds = 0.0
+            self.first_at = None
+            self.last_at = None
+            self._latencies.clear()
+
+    def record_batch(self, ingested, rejected, results, latencies, started_at, finished_at, delta_flagged=0):
+        with self._lock:
+            self.messages_ingested += ingested
+            self.messages_rejected += rejected
+            self.results_inserted += results
+            self.delta_flagged += delta_flagged
+            self.batches += 1
+            self.busy_seconds += finished_at - started_at
+            self.first_at = self.first_at if self.first_at is not None else started_at
+            self.last_at = finished_at
+            self._latencies.extend(latencies)
+
+    def record_rejected(self, count):
+        with self._lock:
+            self.messages_rejected += count
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = (self.last_at - self.first_at) if self.first_at is not None else 0.0
+            latencies = sorted(self._latencies)
+
+        def pct(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p / 100.0 * len(latencies)))] * 1000, 3)
+
+        return {
+            "messages_ingested": self.messages_ingested,
+            "messages_rejected": self.messages_rejected,
+            "results_inserted": self.results_inserted,
+            "delta_flagged": self.delta_flagged,
+            "batches": self.batches,
+            "messages_per_second": round(self.messages_ingested / elapsed, 1) if elapsed > 0 else None,
+            "messages_per_busy_second": round(self.messages_ingested / self.busy_seconds, 1) if self.busy_seconds > 0 else None,
+            "latency_ms": {"p50": pct(50), "p95": pct(95), "p99": pct(99),
+                           "max": round(latencies[-1] * 1000, 3) if latencies else None}
+        }
+
+
+def _result_value(observation):
+    value = observation.value if not observation.units else f"{observation.value} {observation.units}"
+    return value[:RESULT_VALUE_MAX_LEN]
+
+
+def active_admission_in_db(patient_id, visit_id=None):
+    """
+    Active admission of 'patient_id' from ix_admission_patient_active: 'visit_id' if it is
+    one of them, else the most recent. None if the patient has no active admission.
+    """
+    rows = db.session.execute(
+        select(Admission.id).where(Admission.patient_id == patient_id, Admission.discharge_date.is_(None))
+        .order_by(Admission.admission_date.desc(), Admission.id.desc())
+    ).scalars().all()
+    if visit_id in rows:
+        return visit_id
+    return rows[0] if rows else None
+
+
+class ResultIngestPipeline:
+    """
+    Parsed ORU messages -> Result rows.
+
+    Each batch resolves MRNs through the patient cache, maps patients to their
+    active admission through the census, or the database on a census miss
+    (PV1-19 is honoured when it names an active admission of the same patient), parses and flags values against
+    reference ranges and delta-check rules, and inserts every observation of
+    the batch with one executemany INSERT and one commit. Critical rows are inserted with RETURNING
+    so their notification outbox rows join the same transaction.
+    """
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self.patients = PatientLookupCache()
+        self.stats = IngestStats()
+
+    def resolve_admission(self, message, patient_id):
+        visit = message.visit_number
+        visit_id = int(visit) if visit and visit.isdigit() else None
+        if visit_id is not None and census.admission_patient(visit_id) == patient_id:
+            return visit_id
+        admission_id = census.active_admission_for_patient(patient_id)
+        if admission_id is None or (visit_id is not None and not census.is_active(visit_id)):
+            # Census miss: the admission may be newer than this process's census (committed by
+            # another worker since the last refresh), so ask the database
+            return active_admission_in_db(patient_id, visit_id) or admission_id
+        return admission_id
+
+    def ingest_texts(self, texts):
+        """
+        Parse and ingest raw message texts as a stream: at most batch_size parsed
+        messages are held at once. Returns one outcome dict per message, in order.
+        """
+        outcomes, batch = [], []
+        for text in texts:
+            try:
+                batch.append(parse_message(text))
+            except HL7ParseError as e:
+                outcomes.append({"control_id": None, "status": "AR", "error": str(e)})
+                self.stats.record_rejected(1)
+                continue
+            if len(batch) >= self.batch_size:
+                outcomes.extend(self.write_batch(batch))
+                batch = []
+        if batch:
+            outcomes.extend(self.write_batch(batch))
+        return outcomes
+
+    def write_batch(self, batch):
+        started_at = time.perf_counter()
+        patients = self.patients.resolve({m.mrn for m in batch})
+
+        received_at = datetime.utcnow()
+        rows, outcomes, accepted, demographics = [], [], [], {}
+        for message in batch:
+            patient_id, sex, dob = patients.get(message.mrn, (None, None, None))
+            admission_id = self.resolve_admission(message, patient_id) if patient_id else None
+            if patient_id is None:
+                outcomes.append({"control_id": message.control_id, "status": "AE", "error": f"Unknown MRN {message.mrn}"})
+                continue
+            if admission_id is None:
+                outcomes.append({"control_id": message.control_id, "status": "AE", "error": f"No active admission for MRN {message.mrn}"})
+                continue
+            demographics[admission_id] = (sex, dob)
+            for obs in message.observations:
+                rows.append({
+                    "admission_id": admission_id,
+                    "test_name": obs.test_name[:100],
+                    "result_value": _result_value(obs),
+                    "result_date": obs.observed_at or received_at,
+                    "is_critical": obs.is_critical
+                })
+            outcome = {"control_id": message.control_id, "status": "AA",
+                       "admission_id": admission_id, "results": len(message.observations)}
+            outcomes.append(outcome)
+            accepted.append((message, outcome))
+
+        delta_flagged = 0
+        if rows:
+            try:
+                annotate_rows(rows, demographics) # numeric value, unit, abnormal/critical flags
+                delta_flagged = apply_delta_checks(rows) # change since the previous value of the same test
+                critical = [r for r in rows if r["is_critical"]]
+                routine = [r for r in rows if not r["is_critical"]]
+                if routine:
+                    db.session.execute(insert(Result), routine)
+                if critical:
+                    # Critical rows need their ids for the notification outbox (same transaction)
+                    inserted = db.session.execute(insert(Result).returning(Result.id, Result.admission_id), critical).all()
+                    enqueue(db.session, 'result', inserted)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error inserting HL7 result batch: {e}")
+                for _, outcome in accepted:
+                    outcome.update(status="AE", error="Database error occurred")
+                    outcome.pop("results", None)
+                accepted = []
+                delta_flagged = 0
+
+        finished_at = time.perf_counter()
+        self.stats.record_batch(
+            ingested=len(accepted),
+            rejected=len(batch) - len(accepted),
+            results=sum(o["results"] for _, o in accepted),
+            delta_flagged=delta_flagged,
+            latencies=[finished_at - m.received_at for m, _ in accepted],
+            started_at=started_at, finished_at=finished_at
+        )
+        return outcomes
+
+
+class IngestWorker:
+    """
+    Background writer for streaming sources (the MLLP listener).
+    Messages are queued by receiver threads and written in batches by one thread;
+    each submit() returns a Future resolved with the message outcome after commit.
+    """
+
+    def __init__(self, app, pipeline, max_wait=0.05):
+        self.app = app
+        self.pipeline = pipeline
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='hl7-ingest-writer', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread:
+            self._thread.join()
+
+    def submit(self, message):
+        future = Future()
+        self._queue.put((message, future))
+        return future
+
+    def _drain(self):
+        try:
+            items = [self._queue.get(timeout=self.max_wait)]
+        except queue.Empty:
+            return []
+        while len(items) < self.pipeline.batch_size:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        with self.app.app_context():
+            while not (self._stopping.is_set() and self._queue.empty()):
+                items = self._drain()
+                if not items:
+                    continue
+                try:
+                    outcomes = self.pipeline.write_batch([m for m, _ in items])
+                except Exception as e:
+                    db.session.rollback()
+                    for _, future in items:
+                        future.set_exception(e)
+                    continue
+                for (_, future), outcome in zip(items, outcomes):
+                    future.set_result(outcome)
+                db.session.remove()
+
+
+result_pipeline = ResultIngestPipeline()
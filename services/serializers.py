@@ -0,0 +1,41 @@
+# services/serializers.py
+
+from sqlalchemy import Date, DateTime, LargeBinary
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def projected_columns(model, exclude=()):
+    """Table columns for a model, minus any binary blobs and explicitly excluded names."""
+    return [
+        col for col in model.__table__.columns
+        if not isinstance(col.type, LargeBinary) and col.name not in exclude
+    ]
+
+
+def compile_row_serializer(columns):
+    """
+    Build a row -> dict function for a fixed column list, once.
+
+    Column positions and per-column converters are resolved up front, so
+    serializing a row is a single dict comprehension over plain tuples
+    with no schema introspection (unlike a marshmallow dump per object).
+    """
+    plan = []
+    for index, col in enumerate(columns):
+        converter = _isoformat if isinstance(col.type, (DateTime, Date)) else None
+        plan.append((col.name, index, converter))
+    plain = tuple((name, index) for name, index, conv in plan if conv is None)
+    converted = tuple((name, index, conv) for name, index, conv in plan if conv is not None)
+
+    def serialize(row):
+        out = {name: row[index] for name, index in plain}
+        for name, index, conv in converted:
+            out[name] = conv(row[index])
+        return out
+
+    serialize.columns = tuple(col.name for col in columns)
+    return serialize
+
@@ -0,0 +1,415 @@
+# services/text_search.py
+
+import html
+import re
+import threading
+import time
+from collections import Counter
+import numpy as np
+from sqlalchemy import desc, func, literal, literal_column, select, union_all
+from extensions import db
+from models.models import Admission, Consult, Imaging
+from services.model_events import ALL_ADMISSIONS, on_committed
+
+TS_CONFIG = literal_column("'english'::regconfig") # Must match the GIN index expressions in the migration
+# ts_headline marks matches with STX/ETX (stripped from the text first), swapped for <b></b> after escaping
+MATCH_START, MATCH_STOP = '\x02', '\x03'
+HEADLINE_OPTIONS = f'StartSel="{MATCH_START}", StopSel="{MATCH_STOP}", MaxWords=30, MinWords=12, MaxFragments=1'
+SNIPPET_WORDS = 30
+BACKEND_NAMES = ('auto', 'postgres', 'memory')
+
+# kind -> (model, text column, date column). Both are admission-scoped.
+SOURCES = {
+    'imaging': (Imaging, Imaging.image_report, Imaging.image_date),
+    'consult': (Consult, Consult.consult_notes, Consult.consult_date),
+}
+KINDS = tuple(SOURCES)
+
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its no not of on or that the "
+    "there this to was were will with".split()
+)
+_WORD = re.compile(r'[A-Za-z0-9]+')
+
+
+def stem(word):
+    """Fold plurals only ('lesions' -> 'lesion', 'arteries' -> 'artery'); clinical terms are left alone."""
+    if len(word) <= 3 or word.isdigit():
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith('sses'):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Index terms of a text, in order: lowercased alphanumeric words, stop words dropped, plurals folded."""
+    return [stem(w) for w in (m.lower() for m in _WORD.findall(text or '')) if w not in STOP_WORDS]
+
+
+def highlight_markup(headline):
+    """HTML for a ts_headline result: the text escaped, its match markers turned into <b></b>."""
+    return html.escape(headline or '').replace(MATCH_START, '<b>').replace(MATCH_STOP, '</b>')
+
+
+def make_snippet(text, terms, words=SNIPPET_WORDS):
+    """
+    The 'words'-word window of 'text' with the most query terms, as HTML: the text is
+    escaped (notes and reports are free text) and matches are wrapped in <b></b>.
+    """
+    spans = [(stem(m.group().lower()), m.start(), m.end()) for m in _WORD.finditer(text or '')]
+    if not spans:
+        return ''
+    hits = [i for i, (term, _, _) in enumerate(spans) if term in terms]
+    first, best, j = 0, 0, 0
+    for i in range(len(hits)):
+        while hits[i] - hits[j] >= words:
+            j += 1
+        if i - j + 1 > best:
+            best, first = i - j + 1, hits[j]
+    first = max(0, first - 3) if hits else 0 # A few words of lead-in
+    last = min(len(spans), first + words) - 1
+
+    out, cursor = [], spans[first][1]
+    for term, start, end in spans[first:last + 1]:
+        if term in terms:
+            out.append(html.escape(text[cursor:start]))
+            out.append(f"<b>{html.escape(text[start:end])}</b>")
+            cursor = end
+    out.append(html.escape(text[cursor:spans[last][2]]))
+    snippet = ''.join(out)
+    return ('...' if first > 0 else '') + snippet + ('...' if last < len(spans) - 1 else '')
+
+
+def _epoch(value):
+    return int(value.timestamp()) if value else 0
+
+
+class _Postings:
+    """Doc numbers (ascending, since docs are only appended) and term frequencies for one term."""
+    __slots__ = ('docs', 'tfs', 'n')
+
+    def __init__(self):
+        self.docs = np.empty(4, dtype=np.uint32)
+        self.tfs = np.empty(4, dtype=np.uint16)
+        self.n = 0
+
+    def append(self, doc, tf):
+        if self.n == len(self.docs):
+            self.docs = np.resize(self.docs, 2 * self.n)
+            self.tfs = np.resize(self.tfs, 2 * self.n)
+        self.docs[self.n] = doc
+        self.tfs[self.n] = min(tf, 65535)
+        self.n += 1
+
+
+class InvertedIndex:
+    """
+    In-process BM25 index over (kind, source id) documents.
+
+    Every document version gets the next doc number, so postings stay sorted and are
+    append-only; an update or delete tombstones the old number. Per-doc metadata
+    (kind, patient, admission, date, length, live flag) lives in parallel NumPy arrays,
+    so intersection, scope filtering and scoring are vectorized over candidates.
+    Tombstones are reclaimed by rebuilding (see dead_ratio).
+    """
+    k1 = 1.2
+    b = 0.75
+    COLUMNS = (('kind', np.uint8), ('source_id', np.int64), ('patient_id', np.int64),
+               ('admission_id', np.int64), ('date', np.int64), ('length', np.uint32), ('live', np.bool_))
+
+    def __init__(self):
+        self._n = 0
+        self._cols = {name: np.zeros(1024, dtype=dtype) for name, dtype in self.COLUMNS}
+        self._postings = {}
+        self._docs = {} # (kind, source_id) -> (doc number, fingerprint)
+        self._by_admission = {} # admission_id -> {(kind, source_id)}
+        self.live = 0
+        self.dead = 0
+        self._total_length = 0
+
+    def __len__(self):
+        return self.live
+
+    @property
+    def dead_ratio(self):
+        return self.dead / max(1, self._n)
+
+    def keys_for_admission(self, admission_id):
+        return set(self._by_admission.get(admission_id, ()))
+
+    def add(self, kind, source_id, patient_id, admission_id, date, text):
+        """Index (or re-index) one document. Unchanged documents are skipped."""
+        key = (kind, source_id)
+        fingerprint = (patient_id, admission_id, date, hash(text))
+        existing = self._docs.get(key)
+        if existing is not None and existing[1] == fingerprint:
+            return
+        self.remove(kind, source_id)
+        counts = Counter(tokenize(text))
+        if not counts:
+            return
+        doc = self._n
+        if doc == len(self._cols['kind']):
+            for name in self._cols:
+                self._cols[name] = np.resize(self._cols[name], 2 * doc)
+        length = sum(counts.values())
+        for name, value in (('kind', KINDS.index(kind)), ('source_id', source_id), ('patient_id', patient_id),
+                            ('admission_id', admission_id), ('date', _epoch(date)), ('length', length), ('live', True)):
+            self._cols[name][doc] = value
+        for term, tf in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _Postings()
+            postings.append(doc, tf)
+        self._n += 1
+        self._docs[key] = (doc, fingerprint)
+        self._by_admission.setdefault(admission_id, set()).add(key)
+        self.live += 1
+        self._total_length += length
+
+    def remove(self, kind, source_id):
+        existing = self._docs.pop((kind, source_id), None)
+        if existing is None:
+            return
+        doc, (_, admission_id, _, _) = existing
+        self._cols['live'][doc] = False
+        self._by_admission.get(admission_id, set()).discard((kind, source_id))
+        self.live -= 1
+        self.dead += 1
+        self._total_length -= int(self._cols['length'][doc])
+
+    def search(self, terms, kinds=KINDS, patient_id=None, admission_id=None, start=None, end=None, limit=20):
+        """Top 'limit' live docs containing every term, as [(kind, source_id, score)], best first."""
+        if not terms or not self.live:
+            return []
+        postings = [self._postings.get(term) for term in terms]
+        if any(p is None for p in postings):
+            return []
+        postings.sort(key=lambda p: p.n) # Intersect from the rarest term
+        arrays = [(p.docs[:p.n], p.tfs[:p.n]) for p in postings]
+        candidates = arrays[0][0]
+        for docs, _ in arrays[1:]:
+            candidates = np.intersect1d(candidates, docs, assume_unique=True)
+            if not len(candidates):
+                return []
+
+        cols = self._cols
+        mask = cols['live'][candidates]
+        if len(kinds) < len(KINDS):
+            mask &= np.isin(cols['kind'][candidates], [KINDS.index(k) for k in kinds])
+        if patient_id is not None:
+            mask &= cols['patient_id'][candidates] == patient_id
+        if admission_id is not None:
+            mask &= cols['admission_id'][candidates] == admission_id
+        if start is not None:
+            mask &= cols['date'][candidates] >= _epoch(start)
+        if end is not None:
+            mask &= cols['date'][candidates] <= _epoch(end)
+        candidates = candidates[mask]
+        if not len(candidates):
+            return []
+
+        # BM25; document frequency counts tombstoned versions too until the next rebuild
+        lengths = cols['length'][candidates].astype(np.float64)
+        norm = self.k1 * (1 - self.b + self.b * lengths / (self._total_length / self.live))
+        scores = np.zeros(len(candidates))
+        for docs, tfs in arrays:
+            df = len(docs)
+            idf = np.log(1 + (self.live - df + 0.5) / (df + 0.5))
+            tf = tfs[np.searchsorted(docs, candidates)].astype(np.float64)
+            scores += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.lexsort((candidates[top], -scores[top]))]
+        return [(KINDS[cols['kind'][d]], int(cols['source_id'][d]), float(s))
+                for d, s in zip(candidates[top], scores[top])]
+
+
+class TextSearch:
+    """
+    Ranked search over radiology reports (Imaging.image_report) and consult notes
+    (Consult.consult_notes), scoped by patient, admission and date range.
+
+    On PostgreSQL, queries run against GIN expression indexes on to_tsvector('english', ...)
+    with ts_rank_cd ranking and ts_headline snippets. Elsewhere (SQLite, tests) an
+    in-process InvertedIndex is built on first use and kept current: commits touching
+    imaging or consults mark their admissions, whose documents are re-read before the
+    next query. TEXT_SEARCH_BACKEND ('auto', 'postgres', 'memory') overrides the choice.
+    """
+
+    def __init__(self, chunk_size=5000, rebuild_dead_ratio=0.5):
+        self.backend = None
+        self.chunk_size = chunk_size
+        self.rebuild_dead_ratio = rebuild_dead_ratio
+        self._index = None
+        self._lock = threading.Lock() # Guards the index
+        self._dirty_lock = threading.Lock()
+        self._dirty = set()
+        self._dirty_all = False
+        self.builds = 0
+        self.last_build_seconds = None
+
+    def init_app(self, app):
+        name = app.config.get('TEXT_SEARCH_BACKEND', 'auto')
+        if name not in BACKEND_NAMES:
+            raise ValueError(f"Unknown TEXT_SEARCH_BACKEND '{name}'. Options: {', '.join(BACKEND_NAMES)}")
+        if name == 'auto':
+            with app.app_context():
+                name = 'postgres' if db.engine.dialect.name == 'postgresql' else 'memory'
+        self.backend = name
+        if name == 'memory':
+            for model, _, _ in SOURCES.values():
+                on_committed(model, self._touched)
+        app.extensions['text_search'] = self
+
+    def _touched(self, admission_ids):
+        with self._dirty_lock:
+            if admission_ids is ALL_ADMISSIONS:
+                self._dirty_all = True
+            else:
+                self._dirty.update(admission_ids)
+
+    def search(self, query, kinds=KINDS, patient_id=None, admission_id=None, start=None, end=None, limit=20):
+        """
+        Ranked matches for every word of 'query'.
+        Returns [{"kind", "id", "admission_id", "patient_id", "date", "score", "snippet"}], best first.
+        """
+        if self.backend == 'postgres':
+            return self._search_postgres(query, kinds, patient_id, admission_id, start, end, limit)
+        return self._search_memory(query, kinds, patient_id, admission_id, start, end, limit)
+
+    # --- PostgreSQL ---
+
+    def _search_postgres(self, query, kinds, patient_id, admission_id, start, end, limit):
+        tsquery = func.plainto_tsquery(TS_CONFIG, query)
+        parts = []
+        for kind in kinds:
+            model, text_col, date_col = SOURCES[kind]
+            vector = func.to_tsvector(TS_CONFIG, text_col)
+            stmt = select(
+                literal(kind).label('kind'), model.id.label('id'), model.admission_id.label('admission_id'),
+                Admission.patient_id.label('patient_id'), date_col.label('date'), text_col.label('body'),
+                func.ts_rank_cd(vector, tsquery).label('score')
+            ).join(Admission, model.admission_id == Admission.id).where(vector.op('@@')(tsquery))
+            if patient_id is not None:
+                stmt = stmt.where(Admission.patient_id == patient_id)
+            if admission_id is not None:
+                stmt = stmt.where(model.admission_id == admission_id)
+            if start is not None:
+                stmt = stmt.where(date_col >= start)
+            if end is not None:
+                stmt = stmt.where(date_col <= end)
+            parts.append(stmt)
+        # Rank everything, but build headlines for the returned page only
+        top = union_all(*parts).order_by(desc('score'), 'kind', 'id').limit(limit).subquery()
+        rows = db.session.execute(
+            select(top.c.kind, top.c.id, top.c.admission_id, top.c.patient_id, top.c.date, top.c.score,
+                   func.ts_headline(TS_CONFIG, func.translate(top.c.body, MATCH_START + MATCH_STOP, ''),
+                                    tsquery, HEADLINE_OPTIONS).label('snippet'))
+            .order_by(top.c.score.desc(), top.c.kind, top.c.id)
+        ).all()
+        return [{"kind": r.kind, "id": r.id, "admission_id": r.admission_id, "patient_id": r.patient_id,
+                 "date": r.date.isoformat() if r.date else None, "score": float(r.score),
+                 "snippet": highlight_markup(r.snippet)}
+                for r in rows]
+
+    # --- In-process index ---
+
+    def _documents(self, kind, admission_ids=None, after_id=0):
+        """Keyset-paged (id, patient_id, admission_id, date, text) rows of one source."""
+        model, text_col, date_col = SOURCES[kind]
+        stmt = select(model.id, Admission.patient_id, model.admission_id, date_col, text_col)\
+            .join(Admission, model.admission_id == Admission.id)\
+            .where(model.id > after_id)\
+            .order_by(model.id)\
+            .limit(self.chunk_size)
+        if admission_ids is not None:
+            stmt = stmt.where(model.admission_id.in_(admission_ids))
+        return db.session.execute(stmt).all()
+
+    def _load(self, index, kind, admission_ids=None):
+        """Add every stored document of 'kind' (optionally only these admissions); returns the keys seen."""
+        seen, last_id = set(), 0
+        while True:
+            rows = self._documents(kind, admission_ids, last_id)
+            if not rows:
+                return seen
+            for source_id, patient_id, adm_id, date, text in rows:
+                index.add(kind, source_id, patient_id, adm_id, date, text)
+                seen.add((kind, source_id))
+            last_id = rows[-1][0]
+
+    def _build(self):
+        started = time.perf_counter()
+        index = InvertedIndex()
+        for kind in KINDS:
+            self._load(index, kind)
+        self.builds += 1
+        self.last_build_seconds = round(time.perf_counter() - started, 3)
+        return index
+
+    def _refresh(self, index, admission_ids):
+        """Re-read every document of the given admissions; documents no longer there are dropped."""
+        admission_ids = sorted(admission_ids)
+        for i in range(0, len(admission_ids), 500):
+            batch = admission_ids[i:i + 500]
+            before = set().union(*(index.keys_for_admission(a) for a in batch))
+            seen = set()
+            for kind in KINDS:
+                seen |= self._load(index, kind, batch)
+            for kind, source_id in before - seen:
+                index.remove(kind, source_id)
+
+    def current_index(self):
+        """The index with all committed changes applied (built on first use). Caller holds self._lock."""
+        with self._dirty_lock:
+            dirty, dirty_all = self._dirty, self._dirty_all
+            self._dirty, self._dirty_all = set(), False
+        if self._index is None or dirty_all or self._index.dead_ratio > self.rebuild_dead_ratio:
+            self._index = self._build()
+        elif dirty:
+            self._refresh(self._index, dirty)
+        return self._index
+
+    def _search_memory(self, query, kinds, patient_id, admission_id, start, end, limit):
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            hits = self.current_index().search(terms, kinds, patient_id, admission_id, start, end, limit)
+        if not hits:
+            return []
+        # Texts for the returned page only; the index keeps none
+        found = {}
+        for kind in {k for k, _, _ in hits}:
+            model, text_col, date_col = SOURCES[kind]
+            ids = [source_id for k, source_id, _ in hits if k == kind]
+            stmt = select(model.id, model.admission_id, Admission.patient_id, date_col, text_col)\
+                .join(Admission, model.admission_id == Admission.id).where(model.id.in_(ids))
+            for source_id, adm_id, patient, date, text in db.session.execute(stmt):
+                found[(kind, source_id)] = (adm_id, patient, date, text)
+        term_set = set(terms)
+        results = []
+        for kind, source_id, score in hits:
+            row = found.get((kind, source_id))
+            if row is None: # Deleted since the index was refreshed
+                continue
+            adm_id, patient, date, text = row
+            results.append({"kind": kind, "id": source_id, "admission_id": adm_id, "patient_id": patient,
+                            "date": date.isoformat() if date else None, "score": round(score, 4),
+                            "snippet": make_snippet(text, term_set)})
+        return results
+
+    def stats(self):
+        index = self._index
+        return {"backend": self.backend, "documents": len(index) if index is not None else None,
+                "tombstones": index.dead if index is not None else None,
+                "builds": self.builds, "last_build_seconds": self.last_build_seconds}
+
+
+text_search = TextSearch()
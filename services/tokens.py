@@ -0,0 +1,172 @@
+# services/tokens.py
+
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import time
+from services.identity import ALL_USERS, UserIdentity, user_identities
+
+ALGORITHM = 'HS256'
+_HEADER = base64.urlsafe_b64encode(json.dumps({"alg": ALGORITHM, "typ": "JWT"}, separators=(',', ':')).encode()).rstrip(b'=')
+
+
+class TokenError(Exception):
+    """An access token that is malformed, wrongly signed, expired or revoked. 'reason' is a short code."""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+        self.message = message
+
+
+class TokenIdentity(UserIdentity):
+    """current_user for a request authenticated by an access token: the token's claims, no DB row."""
+    __slots__ = ('token_id', 'expires_at')
+
+    def __init__(self, claims):
+        super().__init__(int(claims['sub']), claims.get('name'), claims.get('role'), True)
+        self.token_id = claims['jti']
+        self.expires_at = claims['exp']
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+def _b64decode(segment):
+    return base64.urlsafe_b64decode(segment + b'=' * (-len(segment) % 4))
+
+
+class RevocationList:
+    """
+    Revoked token ids, plus per-user "issued before" cutoffs set when a user's role or
+    active flag changes. Each entry is kept only until the tokens it covers have expired,
+    so the list stays as small as the number of live revoked tokens.
+    """
+
+    def __init__(self, max_ttl=900):
+        self.max_ttl = max_ttl # Longest token lifetime: how long a user cutoff must be kept
+        self._lock = threading.Lock()
+        self._tokens = {} # jti -> exp
+        self._users = {} # user_id -> tokens issued at or before this are revoked
+        self._all_before = 0.0
+
+    def revoke(self, jti, expires_at):
+        with self._lock:
+            self._tokens[jti] = expires_at
+            self._prune(time.time())
+
+    def revoke_user(self, user_ids, before=None):
+        before = before or time.time()
+        with self._lock:
+            if user_ids is ALL_USERS:
+                self._all_before = before
+                self._users.clear()
+            else:
+                for user_id in user_ids:
+                    self._users[user_id] = before
+            self._prune(before)
+
+    def is_revoked(self, claims):
+        with self._lock:
+            iat = claims.get('iat', 0)
+            return claims['jti'] in self._tokens or iat <= self._all_before \
+                or iat <= self._users.get(int(claims['sub']), 0)
+
+    def _prune(self, now):
+        self._tokens = {jti: exp for jti, exp in self._tokens.items() if exp > now}
+        self._users = {user_id: before for user_id, before in self._users.items() if before > now - self.max_ttl}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._tokens) + len(self._users)
+
+
+class TokenService:
+    """
+    Short-lived HS256 JSON Web Tokens for machine clients (monitor gateways, lab interfaces).
+
+    Tokens carry the user id, username and role, so verifying one is an HMAC check in
+    constant time (hmac.compare_digest) plus a lookup in the in-memory revocation list,
+    with no database access. The format is standard compact JWS, so clients can use any
+    JWT library to read the claims. Revocations are per process; the short lifetime
+    bounds how long a token revoked elsewhere keeps working.
+    """
+
+    def __init__(self, secret=None, ttl=900):
+        self.secret = secret
+        self.ttl = ttl
+        self.revocations = RevocationList(ttl)
+        self._lock = threading.Lock()
+        self.issued = 0
+        self.verified = 0
+        self.rejected = {}
+
+    def init_app(self, app):
+        self.secret = (app.config.get('JWT_SECRET_KEY') or app.config['SECRET_KEY']).encode()
+        self.ttl = int(app.config.get('JWT_ACCESS_TOKEN_EXPIRES', self.ttl))
+        self.revocations.max_ttl = self.ttl
+        app.extensions['access_tokens'] = self
+
+    def _sign(self, signing_input):
+        return _b64encode(hmac.new(self.secret, signing_input, hashlib.sha256).digest())
+
+    def issue(self, identity, now=None):
+        """Signed token for 'identity' (User or UserIdentity). Returns (token, claims)."""
+        now = now or time.time()
+        claims = {"sub": str(identity.id), "name": identity.username, "role": identity.role,
+                  "iat": round(now, 3), "exp": int(now + self.ttl), "jti": secrets.token_urlsafe(12)}
+        signing_input = _HEADER + b'.' + _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+        with self._lock:
+            self.issued += 1
+        return (signing_input + b'.' + self._sign(signing_input)).decode(), claims
+
+    def _reject(self, reason, message):
+        with self._lock:
+            self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        raise TokenError(reason, message)
+
+    def decode(self, token, now=None):
+        """Verified claims of 'token'. Raises TokenError."""
+        try:
+            header, payload, signature = token.encode('ascii').split(b'.')
+        except (UnicodeEncodeError, ValueError):
+            self._reject('malformed', "Token is not a compact JWS")
+        if not hmac.compare_digest(self._sign(header + b'.' + payload), signature):
+            self._reject('bad_signature', "Token signature does not match")
+        try:
+            if json.loads(_b64decode(header)).get('alg') != ALGORITHM:
+                self._reject('bad_algorithm', f"Only {ALGORITHM} tokens are accepted")
+            claims = json.loads(_b64decode(payload))
+            int(claims['sub']), claims['exp'], claims['jti']
+        except (ValueError, TypeError, KeyError, AttributeError):
+            self._reject('malformed', "Token payload is invalid")
+        if claims['exp'] <= (now or time.time()):
+            self._reject('expired', "Token has expired")
+        if self.revocations.is_revoked(claims):
+            self._reject('revoked', "Token has been revoked")
+        with self._lock:
+            self.verified += 1
+        return claims
+
+    def identity_from_header(self, authorization):
+        """TokenIdentity for an 'Authorization: Bearer <token>' value, or None if absent/invalid."""
+        if not authorization or not authorization.startswith('Bearer '):
+            return None
+        try:
+            return TokenIdentity(self.decode(authorization[7:].strip()))
+        except TokenError:
+            return None
+
+    def snapshot(self):
+        with self._lock:
+            return {"issued": self.issued, "verified": self.verified, "rejected": dict(self.rejected),
+                    "revocation_entries": len(self.revocations), "ttl_seconds": self.ttl}
+
+
+access_tokens = TokenService()
+# A user's role or active flag changed: tokens issued before now carry stale claims
+user_identities.subscribe(lambda user_ids: access_tokens.revocations.revoke_user(user_ids))
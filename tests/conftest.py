@@ -0,0 +1,92 @@
+# tests/conftest.py
+#
+# The app is configured from the environment at import time (run.py), so the test
+# environment is set up before run is imported: a throwaway SQLite file, temporary
+# blob/upload directories, immediate read receipts and a cheap password hash.
+
+import os
+import sys
+import tempfile
+
+import pytest
+from flask.testing import FlaskClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.mkdtemp(prefix='hospital-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ['SECRET_KEY'] = 'test'
+os.environ['BLOB_STORE_PATH'] = os.path.join(_tmp, 'blobs')
+os.environ['UPLOAD_TMP_PATH'] = os.path.join(_tmp, 'uploads')
+os.environ['READ_RECEIPT_FLUSH_SECONDS'] = '0'
+os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+
+from datetime import date, datetime # noqa: E402
+from run import app as flask_app, db # noqa: E402
+from models.models import Admission, Patient, User # noqa: E402
+from services.delta_checks import delta_rules # noqa: E402
+from services.identity import ALL_USERS, user_identities # noqa: E402
+from services.reference_ranges import reference_ranges # noqa: E402
+
+PASSWORD = 'password123'
+
+
+class RequestClient(FlaskClient):
+    """
+    Test client giving every request its own app context, as a server does. Requests would
+    otherwise share the test's context, and with it g (and Flask-Login's current user).
+    """
+
+    def open(self, *args, **kwargs):
+        with self.application.app_context():
+            return super().open(*args, **kwargs)
+
+
+@pytest.fixture
+def app():
+    """App context over empty tables; every row is deleted again after the test."""
+    flask_app.test_client_class = RequestClient
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        with db.engine.begin() as conn:
+            for table in reversed(db.metadata.sorted_tables):
+                conn.execute(table.delete())
+        # Rows were deleted behind the ORM: drop process caches keyed by ids the next test reuses
+        user_identities.invalidate(ALL_USERS)
+        reference_ranges.invalidate()
+        delta_rules.invalidate()
+
+
+@pytest.fixture
+def make_user(app):
+    def make(username='admin', role='Admin'):
+        user = User(username=username, email=f"{username}@example.org", role=role, is_active=True)
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def login(app):
+    """Test client logged in as 'user'."""
+    def client_for(user):
+        client = app.test_client()
+        response = client.post('/api/auth/login', json={"email": user.email, "password": PASSWORD})
+        assert response.status_code == 200, response.get_json()
+        return client
+    return client_for
+
+
+@pytest.fixture
+def admission(app):
+    """An active admission of a new patient."""
+    patient = Patient(mrn='MRN0001', first_name='Ada', last_name='Test', dob=date(1970, 1, 1), sex='F')
+    db.session.add(patient)
+    db.session.flush()
+    admission = Admission(patient_id=patient.id, admission_date=datetime.utcnow())
+    db.session.add(admission)
+    db.session.commit()
+    return admission
@@ -0,0 +1,45 @@
+# tests/test_imaging_list.py
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert, update
+
+from extensions import db
+from models.models import Imaging
+
+
+def _page_bytes(client):
+    response = client.get('/api/imaging?page=1&per_page=20')
+    assert response.status_code == 200, response.get_json()
+    assert len(response.get_json()["results"]) == 20
+    return len(response.get_data())
+
+
+def test_page_size_does_not_grow_with_image_size(app, admission, make_user, login):
+    client = login(make_user('doctor', 'Doctor'))
+    base = datetime(2025, 1, 1)
+    db.session.execute(insert(Imaging), [
+        {"admission_id": admission.id, "image_type": "CT", "image_date": base + timedelta(minutes=i),
+         "image_file": b"x" * 16, "image_report": f"Report {i}"}
+        for i in range(30)
+    ])
+    db.session.commit()
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        small = _page_bytes(client)
+        db.session.execute(update(Imaging).values(image_file=b"x" * (2 * 1024 * 1024)))
+        db.session.commit()
+        large = _page_bytes(client)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    assert small == large
+    reads = [s for s in statements if s.lstrip().upper().startswith('SELECT')]
+    assert any('imaging' in s for s in reads)
+    assert not any('image_file' in s for s in reads)
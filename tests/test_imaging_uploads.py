@@ -0,0 +1,30 @@
+# tests/test_imaging_uploads.py
+
+from services.imaging_uploads import upload_manager
+
+
+def _initiate(client, admission, total_size=1024):
+    return client.post('/api/imaging/uploads', json={"admission_id": admission.id, "image_type": "CT",
+                                                      "total_size": total_size})
+
+
+def test_upload_larger_than_limit_is_rejected(app, admission, make_user, login, monkeypatch):
+    monkeypatch.setattr(upload_manager, 'max_size', 10 * 1024 * 1024)
+    client = login(make_user('radiologist', 'Radiologist'))
+
+    assert _initiate(client, admission, total_size=10 * 1024 * 1024 + 1).status_code == 413
+    assert _initiate(client, admission, total_size=10 * 1024 * 1024).status_code == 201
+
+
+def test_open_sessions_per_user_are_capped(app, admission, make_user, login, monkeypatch):
+    monkeypatch.setattr(upload_manager, 'max_open_per_user', 2)
+    client = login(make_user('radiologist', 'Radiologist'))
+    other = login(make_user('tech', 'LabTech'))
+
+    first = _initiate(client, admission).get_json()["upload_id"]
+    assert _initiate(client, admission).status_code == 201
+    assert _initiate(client, admission).status_code == 429
+    assert _initiate(other, admission).status_code == 201 # The cap is per user
+
+    assert client.delete(f'/api/imaging/uploads/{first}').status_code == 204
+    assert _initiate(client, admission).status_code == 201
@@ -0,0 +1,40 @@
+# tests/test_order_states.py
+
+from sqlalchemy import insert, select
+
+from extensions import db
+from models.models import Order, OrderTransition
+
+
+def _legacy_order(admission, status):
+    # Core insert: rows written before the state machine never went through its flush check
+    return db.session.execute(insert(Order).returning(Order.id), {
+        "admission_id": admission.id, "order_type": "Lab", "order_name": "CBC", "status": status
+    }).scalar()
+
+
+def test_order_with_legacy_status_can_be_closed(app, admission, make_user, login):
+    order_id = _legacy_order(admission, 'Active')
+    db.session.commit()
+    client = login(make_user('doctor', 'Doctor'))
+
+    response = client.put(f'/api/orders/{order_id}', json={"status": "InProgress"})
+    assert response.status_code == 409
+    assert 'Cancelled, Completed' in response.get_json()["error"]
+
+    response = client.put(f'/api/orders/{order_id}', json={"status": "Cancelled"})
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()["order"]["status"] == 'Cancelled'
+    logged = db.session.execute(
+        select(OrderTransition.from_status, OrderTransition.to_status).where(OrderTransition.order_id == order_id)
+    ).all()
+    assert logged == [('Active', 'Cancelled')]
+
+
+def test_known_final_status_stays_final(app, admission, make_user, login):
+    order_id = _legacy_order(admission, 'Completed')
+    db.session.commit()
+    client = login(make_user('doctor', 'Doctor'))
+
+    response = client.put(f'/api/orders/{order_id}', json={"status": "Cancelled"})
+    assert response.status_code == 409
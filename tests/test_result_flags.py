@@ -0,0 +1,65 @@
+# tests/test_result_flags.py
+
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from extensions import db
+from models.models import CriticalNotification, ReferenceRange, Result
+from services.reference_ranges import backfill_result_values
+
+
+def _potassium_range():
+    db.session.add(ReferenceRange(test_name='Potassium', unit='mmol/L', low=3.5, high=5.1,
+                                  critical_low=2.5, critical_high=6.5))
+    db.session.commit()
+
+
+def test_correcting_a_critical_value_clears_the_flag(app, admission, make_user, login):
+    _potassium_range()
+    client = login(make_user('lab', 'LabTech'))
+    response = client.post('/api/results', json={"admission_id": admission.id, "test_name": "Potassium",
+                                                 "result_value": "7.2 mmol/L"})
+    assert response.status_code == 201, response.get_json()
+    result = response.get_json()["result"]
+    assert result["is_critical"] is True
+
+    response = client.put(f"/api/results/{result['id']}", json={"result_value": "4.1 mmol/L"})
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()["result"]["is_critical"] is False
+    assert response.get_json()["result"]["abnormal_flag"] == 'N'
+
+
+def test_client_sent_critical_flag_is_kept(app, admission, make_user, login):
+    _potassium_range()
+    client = login(make_user('lab', 'LabTech'))
+    response = client.post('/api/results', json={"admission_id": admission.id, "test_name": "Potassium",
+                                                 "result_value": "4.1 mmol/L"})
+    result_id = response.get_json()["result"]["id"]
+
+    response = client.put(f"/api/results/{result_id}", json={"result_value": "4.3 mmol/L", "is_critical": True})
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()["result"]["is_critical"] is True
+
+
+def test_backfill_enqueues_notifications_for_newly_critical_rows(app, admission):
+    _potassium_range()
+    db.session.execute(insert(Result), [
+        {"admission_id": admission.id, "test_name": "Potassium", "result_value": value,
+         "result_date": datetime(2025, 1, 1, hour)}
+        for hour, value in enumerate(["7.0 mmol/L", "4.0 mmol/L", "2.1 mmol/L"])
+    ])
+    db.session.commit()
+
+    assert sum(updated for updated, _ in backfill_result_values(chunk_size=2)) == 3
+
+    critical = set(db.session.execute(select(Result.id).where(Result.is_critical)).scalars())
+    assert len(critical) == 2
+    queued = db.session.execute(
+        select(CriticalNotification.source_id).where(CriticalNotification.source_type == 'result')
+    ).scalars().all()
+    assert sorted(queued) == sorted(critical)
+
+    # A re-run over every row does not queue the same rows again
+    list(backfill_result_values(only_missing=False))
+    assert len(db.session.execute(select(CriticalNotification.id)).scalars().all()) == 2